@@ -0,0 +1,67 @@
+"""This file compares peak memory usage of convert_file() with and without memory mapping.
+
+Usage: "python benchmarks/memory_map.py [size_in_megabytes]", defaults to 1024.
+A Markdown file of the given size is generated, then converted in a separate
+process for each mode, so peak resident set sizes do not affect each other.
+Only works on Unix-like systems, since it relies on the "resource" module.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).joinpath("../..").resolve()
+SAMPLE = """
+This is a level 1 heading.
+==========================
+
+This is a paragraph with **bold** text, *italic* text and `code`.
+It also has a [link](URL "Title.") and a [reference-style link][1].
+
+> This is a level 1 blockquote.
+>> This is a level 2 blockquote.
+
+1. This is a level 1 ordered list item.
+  - This is a level 2 unordered list item.
+
+    This is a code block.
+
+[1]: Link URL. "This is a title."
+"""
+CHILD = """
+import resource, sys, time
+sys.path.insert(0, sys.argv[1])
+import quickhtml
+start = time.perf_counter()
+html = quickhtml.convert_file(sys.argv[2], memory_map=sys.argv[3] == "1")
+elapsed = time.perf_counter() - start
+# "ru_maxrss" is in kilobytes on Linux, and in bytes on macOS.
+divisor = 1024 ** 2 if sys.platform == "darwin" else 1024
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+print(f"{peak:.1f} {elapsed:.1f} {len(html) / 1024 ** 2:.1f}")
+"""
+
+
+def main():
+    """Generate a Markdown file and print peak memory usage of each mode."""
+    size = int(sys.argv[1]) * 1024 ** 2 if len(sys.argv) > 1 else 1024 ** 3
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.md")
+        with open(path, "w") as f:
+            for _ in range(size // len(SAMPLE) + 1):
+                f.write(SAMPLE)
+
+        print(f"Input: {os.path.getsize(path) / 1024 ** 2:.1f} MiB")
+        for name, memory_map in (("read()", "0"), ("memory_map", "1")):
+            output = subprocess.run(
+                (sys.executable, "-c", CHILD, str(ROOT), path, memory_map),
+                check=True, stdout=subprocess.PIPE, universal_newlines=True)
+            peak, elapsed, output_size = output.stdout.split()
+            print(f"{name:>10}: peak RSS {peak} MiB, output {output_size} MiB,"
+                  f" {elapsed} s")
+
+
+if __name__ == "__main__":
+    main()
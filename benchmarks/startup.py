@@ -0,0 +1,66 @@
+"""This file measures how long importing QuickHTML, and running it from the terminal, takes to start.
+
+Usage: "python benchmarks/startup.py [runs]", defaults to 20.
+Each command is run in a new process, as scripts calling QuickHTML many times
+do, and the median and minimum times of all runs are printed, along with the
+time spent importing QuickHTML, as reported by "python -X importtime".
+Starting Python without importing anything is measured as well, for reference.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).joinpath("../..").resolve()
+COMMANDS = {
+    "python": ("-c", "pass"),
+    "import": ("-c", "import quickhtml"),
+    "help": ("-m", "quickhtml", "-h"),
+    "string": ("-m", "quickhtml", "# This is a level 1 heading."),
+}
+
+
+def get_import_time(stderr):
+    """
+    Get the time spent importing QuickHTML from the output of "-X importtime".
+
+    Args:
+        stderr (str): Output of a process run with "-X importtime".
+
+    Returns:
+        float: Time spent importing QuickHTML and every module it imports, in
+            milliseconds, or 0.0 if it was not imported.
+    """
+    for line in stderr.splitlines():
+        if line.startswith("import time:"):
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if name.strip() == "quickhtml":
+                return int(cumulative) / 1000
+    return 0.0
+
+
+def main():
+    """Run each command many times and print how long they take to start."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    environment = dict(os.environ, PYTHONPATH=str(ROOT))
+    print(f"{'command':<10}{'p50 ms':>9}{'min ms':>9}{'import ms':>11}")
+    for name, args in COMMANDS.items():
+        times = []
+        import_times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            output = subprocess.run(
+                (sys.executable, "-X", "importtime") + args, check=True,
+                env=environment, stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE, universal_newlines=True)
+            times.append((time.perf_counter() - start) * 1000)
+            import_times.append(get_import_time(output.stderr))
+        print(f"{name:<10}{statistics.median(times):>9.1f}{min(times):>9.1f}"
+              f"{statistics.median(import_times):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,51 @@
 """This file ensures Python treats this directory as a package."""
 
+import importlib
+
+__version__ = "2.0.17"
+
 # Make functions available to import from core quickhtml module.
-from quickhtml.quickhtml import convert, convert_file
+from quickhtml.quickhtml import (ConversionCache, Reference, ReferenceRegistry,
+                                 StageTimer, StreamingConverter, convert,
+                                 convert_bytes, convert_file, convert_into,
+                                 set_default_cache, tracing)
+
+# Make functions available to import from other quickhtml modules. These
+# modules import asyncio, multiprocessing or sqlite3, which take longer to
+# import than QuickHTML itself, so they are only imported once one of their
+# functions is used, see __getattr__().
+LAZY_IMPORTS = {
+    "AsyncConverter": "quickhtml.aio",
+    "aconvert": "quickhtml.aio",
+    "aconvert_file": "quickhtml.aio",
+    "convert_many": "quickhtml.batch",
+    "Document": "quickhtml.document",
+    "parse": "quickhtml.document",
+    "render": "quickhtml.document",
+    "IncrementalDocument": "quickhtml.incremental",
+    "SQLiteCache": "quickhtml.sqlite_cache",
+}
+
+
+def __getattr__(name):
+    """
+    Import a function of another quickhtml module the first time it is used.
+
+    Args:
+        name (str): Name of function.
+
+    Returns:
+        Any: Function.
+
+    Raises:
+        AttributeError: If there is no such function.
+    """
+    if name not in LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_IMPORTS))
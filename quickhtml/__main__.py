@@ -3,24 +3,208 @@
 import os
 import sys
 
-from quickhtml import convert, convert_file
+from quickhtml import StreamingConverter, convert, convert_file
 
+# Commands import what they need themselves, e.g. argparse, or servers and
+# worker processes, since scripts may run QuickHTML thousands of times, and
+# converting a single file or string uses none of them.
 ARGS = sys.argv[1:]
 MESSAGES = {
     "NO_ARGUMENT": "No file or string was provided. Use \"python -m quickhtml -h\" or \"python -m quickhtml --help\" to print a help message.",
-    "HELP": "To convert Markdown into HTML, use \"python -m quickhtml [args]\", where [args] is a list of arguments, and each argument is either a file or a string.\nE.g.: \"python -m quickhtml FILE.md \"# This is a level 1 heading\" FILE_2.md\".\nTo export results to a file, use \"python -m quickhtml [args] > [out_file]\".\nTo see this message, run \"python -m quickhtml -h\" or \"python -m quickhtml --help\".",
+    "HELP": "To convert Markdown into HTML, use \"python -m quickhtml [args]\", where [args] is a list of arguments, and each argument is either a file or a string.\nE.g.: \"python -m quickhtml FILE.md \"# This is a level 1 heading\" FILE_2.md\".\nTo convert Markdown read from stdin, use \"-\" as an argument, HTML is then written as soon as it is ready, e.g.: \"cat FILE.md | python -m quickhtml -\". Since the document is never seen as a whole, reference-style link definitions only apply to links after them, so links defined at the end of a document are left as they are, unlike when converting FILE.md itself.\nTo export results to a file, use \"python -m quickhtml [args] > [out_file]\".\nTo convert a directory of Markdown files into a directory of HTML files, use \"python -m quickhtml build SRC_DIR -o OUT_DIR\", run \"python -m quickhtml build -h\" for more information.\nTo convert them again whenever they change, use \"python -m quickhtml watch SRC_DIR -o OUT_DIR\", run \"python -m quickhtml watch -h\" for more information.\nTo serve a directory of Markdown files as HTML, converting them on request, use \"python -m quickhtml serve DIR --port N\", run \"python -m quickhtml serve -h\" for more information.\nTo find which regular expressions, documents and lines conversion spends time in, use \"python -m quickhtml --profile FILE_OR_DIR [...]\", run \"python -m quickhtml --profile -h\" for more information.\nTo see this message, run \"python -m quickhtml -h\" or \"python -m quickhtml --help\".",
 }
 
 
+def convert_stdin():
+    """Convert Markdown read from stdin, writing HTML to stdout as it is ready."""
+    converter = StreamingConverter()
+    for line in sys.stdin:
+        html = converter.feed(line)
+        if html:
+            sys.stdout.write(html)
+            sys.stdout.flush()
+    print(converter.close())
+
+
+def read_file_list(file):
+    """Read a list of NUL-separated paths from a file, or stdin if it is "-"."""
+    if file == "-":
+        data = sys.stdin.buffer.read()
+    else:
+        with open(file, "rb") as f:
+            data = f.read()
+    return [os.fsdecode(path) for path in data.split(b"\0") if path]
+
+
+def build_command(args):
+    """Convert a directory of Markdown files into a directory of HTML files."""
+    import argparse
+
+    from quickhtml.batch import ConversionError
+    from quickhtml.build import PathError, build
+
+    parser = argparse.ArgumentParser(
+        prog="python -m quickhtml build",
+        description="Convert Markdown files in SRC_DIR, recursively, into HTML "
+                    "files in OUT_DIR, mirroring the directory tree.")
+    parser.add_argument("source", metavar="SRC_DIR",
+                        help="directory containing Markdown files")
+    parser.add_argument("-o", "--output", metavar="OUT_DIR", required=True,
+                        help="directory to write HTML files into")
+    parser.add_argument(
+        "-j", "--jobs", metavar="N", type=int,
+        help="number of worker processes, defaults to number of processors")
+    parser.add_argument(
+        "--files-from", metavar="FILE",
+        help="convert only NUL-separated paths read from FILE, or stdin if "
+             "FILE is \"-\", e.g.: \"find SRC_DIR -name '*.md' -print0 | "
+             "python -m quickhtml build SRC_DIR -o OUT_DIR --files-from -\"")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="convert every file, even if unchanged since the last build")
+    args = parser.parse_args(args)
+
+    files = None
+    if args.files_from:
+        try:
+            files = read_file_list(args.files_from)
+        except OSError as e:
+            parser.error(f"can't read \"{args.files_from}\": {e.strerror}")
+        for file in files:
+            if not os.path.isfile(file):
+                parser.error(f"\"{file}\" is not a file.")
+    try:
+        written = build(args.source, args.output, args.jobs, files,
+                        args.force)
+    except PathError as e:
+        parser.error(str(e))
+    except ConversionError as e:
+        sys.exit(str(e))
+    print(f"Converted {len(written)} files.")
+
+
+def watch_command(args):
+    """Convert a directory of Markdown files again whenever they change."""
+    import argparse
+
+    from quickhtml.watch import watch
+
+    parser = argparse.ArgumentParser(
+        prog="python -m quickhtml watch",
+        description="Convert Markdown files in SRC_DIR, recursively, into HTML "
+                    "files in OUT_DIR, then convert them again whenever they "
+                    "change, until interrupted.")
+    parser.add_argument("source", metavar="SRC_DIR",
+                        help="directory containing Markdown files")
+    parser.add_argument("-o", "--output", metavar="OUT_DIR", required=True,
+                        help="directory to write HTML files into")
+    parser.add_argument("--interval", metavar="SECONDS", type=float,
+                        default=0.25, help="seconds between polls, defaults "
+                                           "to 0.25")
+    parser.add_argument("--delay", metavar="SECONDS", type=float, default=0.1,
+                        help="seconds without changes to wait for before "
+                             "converting files, defaults to 0.1")
+    args = parser.parse_args(args)
+
+    if not os.path.isdir(args.source):
+        parser.error(f"\"{args.source}\" is not a directory.")
+    def report_error(file, error):
+        print(f"Could not convert \"{file}\": {error}", file=sys.stderr,
+              flush=True)
+
+    print(f"Watching \"{args.source}\", press Ctrl+C to stop.", flush=True)
+    try:
+        for written, removed in watch(args.source, args.output, args.interval,
+                                      args.delay, on_error=report_error):
+            print(f"Converted {len(written)} files, removed {len(removed)} "
+                  f"files.", flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_command(args):
+    """Serve a directory of Markdown files as HTML, converting them on request."""
+    import argparse
+
+    from quickhtml.serve import make_server
+
+    parser = argparse.ArgumentParser(
+        prog="python -m quickhtml serve",
+        description="Serve Markdown files in DIR as HTML, converting them on "
+                    "request, until interrupted. \"/guide.html\" serves "
+                    "\"DIR/guide.md\", and \"/\" serves \"DIR/index.md\".")
+    parser.add_argument("directory", metavar="DIR",
+                        help="directory containing Markdown files")
+    parser.add_argument("-p", "--port", metavar="N", type=int, default=8000,
+                        help="port to listen on, defaults to 8000")
+    parser.add_argument("--host", metavar="ADDRESS", default="127.0.0.1",
+                        help="address to listen on, defaults to 127.0.0.1")
+    args = parser.parse_args(args)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"\"{args.directory}\" is not a directory.")
+    with make_server(args.directory, args.host, args.port) as server:
+        host, port = server.server_address[:2]
+        print(f"Serving \"{args.directory}\" at http://{host}:{port}/, press "
+              f"Ctrl+C to stop.", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def profile_command(args):
+    """Convert files and print where conversion spends time."""
+    import argparse
+
+    from quickhtml.build import find_files
+    from quickhtml.profiling import format_report, profile_files
+
+    parser = argparse.ArgumentParser(
+        prog="python -m quickhtml --profile",
+        description="Convert Markdown files, then print how many times each "
+                    "regular expression was tried, how many times it matched, "
+                    "and the time spent in it, along with the slowest "
+                    "documents and lines.")
+    parser.add_argument("paths", metavar="FILE_OR_DIR", nargs="+",
+                        help="Markdown file, or directory to search for "
+                             "Markdown files in, recursively")
+    parser.add_argument("--top", metavar="N", type=int, default=10,
+                        help="number of slowest documents and lines to print, "
+                             "defaults to 10")
+    args = parser.parse_args(args)
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(find_files(path))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            parser.error(f"\"{path}\" is not a file or directory.")
+    print(format_report(profile_files(files, args.top)))
+
+
 def main():
     """Convert Markdown into HTML and print it to the terminal."""
     if not ARGS or all(arg.strip() == "" for arg in ARGS):
         print(MESSAGES["NO_ARGUMENT"])
     elif len(ARGS) == 1 and ARGS[0] in ("--help", "-h"):
         print(MESSAGES["HELP"])
+    elif ARGS[0] == "build":
+        build_command(ARGS[1:])
+    elif ARGS[0] == "watch":
+        watch_command(ARGS[1:])
+    elif ARGS[0] == "serve":
+        serve_command(ARGS[1:])
+    elif ARGS[0] == "--profile":
+        profile_command(ARGS[1:])
     else:
         for arg in ARGS:
-            print(convert_file(arg) if os.path.isfile(arg) else convert(arg))
+            if arg == "-":
+                convert_stdin()
+            else:
+                print(convert_file(arg) if os.path.isfile(arg) else convert(arg))
 
 
 if __name__ == "__main__":
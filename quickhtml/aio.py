@@ -0,0 +1,170 @@
+"""This file contains functionality to convert Markdown from asyncio coroutines, without blocking the event loop."""
+
+import asyncio
+import os
+import weakref
+
+from quickhtml.quickhtml import TRACER, convert, convert_file
+
+
+class AsyncConverter:
+    """
+    Convert Markdown from coroutines, running conversions in an executor.
+
+    Conversions, and reading files, run in the executor, so the event loop
+    keeps serving other tasks while a large document is converted. The number
+    of conversions running at the same time is bounded, so a burst of large
+    documents can not take every thread of the executor, or keep the event
+    loop waiting for the interpreter lock. Conversions waiting for their turn
+    wait in the event loop, without taking a thread.
+
+    E.g.:
+        converter = AsyncConverter(ProcessPoolExecutor(), concurrency=4)
+        html = await converter.convert(string)
+        html = await converter.convert_file("README.md")
+
+    Args:
+        executor (concurrent.futures.Executor, optional): Executor to run
+            conversions in. A process pool runs conversions in parallel, but
+            then caches, references and tracers must be picklable, and the
+            default cache is the one of each worker process. Defaults to None,
+            which uses the default executor of the event loop.
+        concurrency (int, optional): Maximum number of conversions running at
+            the same time, for each event loop. Defaults to None, which uses
+            the number of processors in the machine.
+    """
+
+    def __init__(self, executor=None, concurrency=None):
+        self.executor = executor
+        self.concurrency = concurrency or os.cpu_count() or 1
+
+        # A semaphore can only be used by the event loop it was first used
+        # by, so one is kept for each event loop.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def _run(self, function, *args):
+        """
+        Run a function in the executor, once fewer conversions than the
+        concurrency limit are running.
+
+        Args:
+            function (Callable): Function to run.
+            *args (Any): Arguments to pass to function.
+
+        Returns:
+            Any: Value returned by function.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(
+                self.concurrency)
+        async with semaphore:
+            return await loop.run_in_executor(self.executor, function, *args)
+
+    async def convert(self, string, cache=None, tracer=None, references=None):
+        """
+        Convert Markdown into HTML, see convert().
+
+        Args:
+            string (str): Markdown code to be converted.
+            cache (ConversionCache | bool, optional): Cache to store results in
+                and reuse them from, or False to not use a cache. Defaults to
+                None, which uses the cache set by set_default_cache(), if any.
+            tracer (Any, optional): Tracer notified of each stage of
+                conversion, see tracing(). Defaults to None, which uses the
+                tracer installed by tracing() in the calling task, if any.
+            references (ReferenceRegistry, optional): Reference-style link
+                definitions shared by many documents, see ReferenceRegistry.
+                Defaults to None.
+
+        Returns:
+            str: HTML code.
+        """
+        # The executor does not run in the context of the calling task, so
+        # the tracer installed in it is passed along.
+        if tracer is None:
+            tracer = TRACER.get()
+        return await self._run(convert, string, cache, tracer, references)
+
+    async def convert_file(self, file, memory_map=False, references=None,
+                           encoding=None):
+        """
+        Open a Markdown file and return converted results, see
+        convert_file().
+
+        The file is read in the executor as well, so only its path is sent to
+        it, and reading a file on a slow disk does not block the event loop.
+
+        Args:
+            file (str): Path to Markdown file to be converted.
+            memory_map (bool, optional): Whether or not the file should be
+                mapped into memory and converted one line at a time. Defaults
+                to False.
+            references (ReferenceRegistry, optional): Reference-style link
+                definitions shared by many documents, see ReferenceRegistry.
+                Defaults to None.
+            encoding (str, optional): Encoding of file. Defaults to None,
+                which uses the preferred encoding of the locale.
+
+        Returns:
+            str: HTML code.
+        """
+        return await self._run(convert_file, file, memory_map, references,
+                               encoding)
+
+
+# Converter used by aconvert() and aconvert_file().
+DEFAULT_CONVERTER = AsyncConverter()
+
+
+async def aconvert(string, cache=None, tracer=None, references=None):
+    """
+    Convert Markdown into HTML from a coroutine, using the default executor
+    of the event loop, see AsyncConverter.
+
+    E.g.:
+        html = await aconvert("# This is a heading.")
+
+    Args:
+        string (str): Markdown code to be converted.
+        cache (ConversionCache | bool, optional): Cache to store results in
+            and reuse them from, or False to not use a cache. Defaults to
+            None, which uses the cache set by set_default_cache(), if any.
+        tracer (Any, optional): Tracer notified of each stage of conversion,
+            see tracing(). Defaults to None, which uses the tracer installed
+            by tracing() in the calling task, if any.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+
+    Returns:
+        str: HTML code.
+    """
+    return await DEFAULT_CONVERTER.convert(string, cache, tracer, references)
+
+
+async def aconvert_file(file, memory_map=False, references=None,
+                        encoding=None):
+    """
+    Open a Markdown file and return converted results from a coroutine,
+    using the default executor of the event loop, see AsyncConverter.
+
+    E.g.:
+        html = await aconvert_file("README.md")
+
+    Args:
+        file (str): Path to Markdown file to be converted.
+        memory_map (bool, optional): Whether or not the file should be mapped
+            into memory and converted one line at a time. Defaults to False.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+        encoding (str, optional): Encoding of file. Defaults to None, which
+            uses the preferred encoding of the locale.
+
+    Returns:
+        str: HTML code.
+    """
+    return await DEFAULT_CONVERTER.convert_file(file, memory_map, references,
+                                                encoding)
@@ -0,0 +1,142 @@
+"""This file contains functionality to convert many files in parallel."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from quickhtml.quickhtml import convert_file
+
+
+class ConversionError(ValueError):
+    """Raised when a Markdown file can not be converted, naming the file."""
+
+
+def convert_named_file(file):
+    """
+    Convert a Markdown file, naming it in the error raised if it can not be
+    decoded, since decoding errors only describe its content.
+
+    Args:
+        file (str): Path to Markdown file.
+
+    Returns:
+        str: HTML code.
+
+    Raises:
+        ConversionError: If the file can not be decoded.
+    """
+    try:
+        return convert_file(file)
+    except UnicodeDecodeError as e:
+        raise ConversionError(f"Could not convert \"{file}\": {e}") from e
+
+
+def convert_files(files):
+    """
+    Convert a list of Markdown files.
+
+    This is the unit of work sent to each worker process.
+
+    Args:
+        files (list[tuple[int, str]]): A list of tuples, each containing the
+            index of a file in the input, and its path.
+
+    Returns:
+        list[tuple[int, str]]: A list of tuples, each containing the index of
+            a file in the input, and its converted content.
+    """
+    return [(index, convert_named_file(file)) for index, file in files]
+
+
+def schedule(files, workers):
+    """
+    Split files into units of work, so they can be converted in parallel.
+
+    Larger files are scheduled first, so a large file is not left running on
+    its own at the end, and smaller files are packed together, so the cost of
+    sending work to a worker process is not paid once per file.
+
+    Args:
+        files (list[str]): Paths to Markdown files.
+        workers (int): Number of worker processes.
+
+    Returns:
+        list[list[tuple[int, str]]]: Units of work, largest first, each being a
+            list of tuples containing the index of a file in the input, and
+            its path.
+    """
+    sizes = sorted(
+        ((os.path.getsize(file), index, file)
+         for index, file in enumerate(files)), reverse=True)
+
+    # Aim for a few units of work per worker, so work can be balanced between
+    # workers as they finish.
+    target_size = sum(size for size, _, _ in sizes) // (workers * 4)
+
+    units = []
+    unit = []
+    unit_size = 0
+    for size, index, file in sizes:
+        unit.append((index, file))
+        unit_size += size
+        if unit_size >= target_size:
+            units.append(unit)
+            unit = []
+            unit_size = 0
+    if unit:
+        units.append(unit)
+    return units
+
+
+def convert_many(files, workers=None, ordered=True):
+    """
+    Convert many Markdown files in parallel, using multiple processes.
+
+    E.g.:
+        for file, html in convert_many(("a.md", "b.md"), workers=2):
+            ...
+
+    Args:
+        files (Iterable[str]): Paths to Markdown files to be converted.
+        workers (int, optional): Maximum number of worker processes, fewer
+            being used when there are fewer units of work, and none when
+            there is only one. Defaults to None, which uses the number of
+            processors in the machine.
+        ordered (bool, optional): Whether results should be returned in the
+            same order as input files, or as soon as they are converted.
+            Defaults to True.
+
+    Yields:
+        tuple[str, str]: Path to a Markdown file, and its converted content.
+
+    Raises:
+        ConversionError: If a file can not be decoded.
+    """
+    files = list(files)
+    workers = workers or os.cpu_count() or 1
+    units = schedule(files, workers) if workers > 1 else []
+
+    # A single unit of work is converted in this process, since starting a
+    # worker process would only delay it.
+    if len(units) <= 1:
+        for file in files:
+            yield file, convert_named_file(file)
+        return
+
+    # Worker processes may all be started upfront, so no more are started
+    # than there are units of work.
+    with ProcessPoolExecutor(min(workers, len(units))) as executor:
+        futures = [executor.submit(convert_files, unit) for unit in units]
+
+        # Results that arrive before results of files that come before them
+        # are held until they can be returned in order.
+        results = {}
+        next_index = 0
+        for future in as_completed(futures):
+            for index, html in future.result():
+                if not ordered:
+                    yield files[index], html
+                    continue
+                results[index] = html
+                while next_index in results:
+                    yield files[next_index], results.pop(next_index)
+                    next_index += 1
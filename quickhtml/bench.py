@@ -0,0 +1,389 @@
+"""This file contains a benchmark of convert(), using generated Markdown documents.
+
+Usage: "python -m quickhtml.bench [-h]", run with "-h" for more information.
+Documents are generated from a seed, for each construct convert() handles, so
+results of different runs, or of different versions, can be compared.
+"""
+
+import argparse
+import functools
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+from quickhtml import __version__
+from quickhtml.quickhtml import convert
+
+WORDS = ("the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog",
+         "markdown", "converter", "paragraph", "heading", "link", "image",
+         "text", "with", "some", "words", "and", "a", "few", "more", "of",
+         "them", "to", "make", "lines", "longer", "than", "usual")
+ESCAPABLE_CHARACTERS = "\\`*_{}[]()#+-.!|"
+# Depths of deeply nested blockquotes and lists, each benchmarked separately.
+DEEP_NESTING_DEPTHS = (50, 200, 800)
+
+
+def get_words(rng, count):
+    """
+    Get a string of random words.
+
+    Args:
+        rng (random.Random): Random number generator.
+        count (int): Number of words.
+
+    Returns:
+        str: Words separated by spaces.
+    """
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def get_url(rng):
+    """
+    Get a random URL.
+
+    Args:
+        rng (random.Random): Random number generator.
+
+    Returns:
+        str: URL.
+    """
+    return f"https://example.com/{rng.choice(WORDS)}/{rng.randrange(1000)}"
+
+
+def generate_nesting(rng):
+    """Generate a block of deeply nested blockquotes and lists."""
+    lines = []
+    depth = 1
+    for _ in range(rng.randint(4, 12)):
+        depth = max(1, min(6, depth + rng.choice((-1, 0, 1, 1))))
+        kind = rng.choice(("blockquote", "ordered", "unordered"))
+        if kind == "blockquote":
+            lines.append(f"{'>' * depth} {get_words(rng, rng.randint(3, 12))}")
+        elif kind == "ordered":
+            lines.append(f"{'  ' * (depth - 1)}{rng.randint(1, 9)}. "
+                         f"{get_words(rng, rng.randint(3, 12))}")
+        else:
+            lines.append(f"{'  ' * (depth - 1)}{rng.choice('-*+')} "
+                         f"{get_words(rng, rng.randint(3, 12))}")
+    return "\n".join(lines)
+
+
+def generate_deep_nesting(rng, depth):
+    """
+    Generate a blockquote or list nested depth levels deep, one level per
+    line, going all the way down and back up.
+
+    It is registered once for each of DEEP_NESTING_DEPTHS, and the time spent
+    on each line, compared between depths, shows whether the cost of each line
+    grows with depth.
+    """
+    kind = rng.choice(("blockquote", "ordered", "unordered"))
+    levels = list(range(1, depth + 1)) + list(range(depth - 1, 0, -1))
+    if kind == "blockquote":
+        return "\n".join(f"{'>' * level} {get_words(rng, 2)}"
+                         for level in levels)
+    marker = "1." if kind == "ordered" else "-"
+    return "\n".join(f"{' ' * (level - 1)}{marker} {get_words(rng, 2)}"
+                     for level in levels)
+
+
+def generate_paragraphs(rng):
+    """Generate a long paragraph with inline formatting."""
+    lines = []
+    for _ in range(rng.randint(3, 8)):
+        words = get_words(rng, rng.randint(20, 60)).split()
+        for _ in range(rng.randint(0, 4)):
+            index = rng.randrange(len(words))
+            delimiter = rng.choice(("**", "*", "__", "_", "`", "***"))
+            words[index] = f"{delimiter}{words[index]}{delimiter}"
+        lines.append(" ".join(words) + rng.choice((".", ".", ".  ")))
+    return "\n".join(lines)
+
+
+def generate_prose(rng):
+    """
+    Generate paragraphs of plain text, wrapped into short lines, with only
+    the punctuation of prose, as most documents mostly contain.
+    """
+    lines = []
+    for _ in range(rng.randint(2, 5)):
+        words = get_words(rng, rng.randint(40, 120)).split()
+        for index in rng.sample(range(len(words) - 1), 3):
+            words[index] += rng.choice((",", ";", ":", "?"))
+        text = " ".join(words) + "."
+        while len(text) > 72:
+            end = text.rfind(" ", 0, 72)
+            lines.append(text[:end])
+            text = text[end + 1:]
+        lines += (text, "")
+    return "\n".join(lines)
+
+
+def generate_links(rng):
+    """Generate lines dense with links and images."""
+    lines = []
+    for _ in range(rng.randint(2, 6)):
+        parts = []
+        for _ in range(rng.randint(4, 10)):
+            kind = rng.randrange(5)
+            if kind == 0:
+                parts.append(f"[{get_words(rng, 2)}]({get_url(rng)})")
+            elif kind == 1:
+                parts.append(f"[{get_words(rng, 2)}]({get_url(rng)} "
+                             f"\"{get_words(rng, 3)}\")")
+            elif kind == 2:
+                parts.append(f"![{get_words(rng, 2)}]({get_url(rng)})")
+            elif kind == 3:
+                parts.append(f"<{get_url(rng)}>")
+            else:
+                parts.append(get_words(rng, rng.randint(1, 5)))
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+def generate_references(rng):
+    """Generate reference-style links, along with many definitions."""
+    labels = [f"{rng.choice(WORDS)}-{index}"
+              for index in range(rng.randint(10, 30))]
+    lines = [f"Some [{get_words(rng, 2)}][{rng.choice(labels)}] and "
+             f"[{get_words(rng, 2)}][{rng.choice(labels)}] in a line."
+             for _ in range(rng.randint(2, 6))]
+    lines.append("")
+    lines.extend(f"[{label}]: {get_url(rng)} \"{get_words(rng, 3)}\""
+                 for label in labels)
+    return "\n".join(lines)
+
+
+def generate_code_blocks(rng):
+    """Generate an indented code block, with Markdown-like characters."""
+    lines = []
+    for _ in range(rng.randint(4, 16)):
+        indentation = " " * (4 + 2 * rng.randrange(3))
+        lines.append(f"{indentation}{rng.choice(('#', '*', '-', '>', ''))} "
+                     f"{get_words(rng, rng.randint(2, 8))} "
+                     f"{rng.choice(('**x**', '[a](b)', '`c`', '_d_', ''))}")
+    return "\n".join(lines)
+
+
+def generate_alternative_headings(rng):
+    """Generate alternate-style headings, each followed by a paragraph."""
+    lines = []
+    for _ in range(rng.randint(1, 4)):
+        heading = get_words(rng, rng.randint(2, 8))
+        lines.extend((heading, rng.choice("=-") * rng.randint(2, len(heading)),
+                      "", get_words(rng, rng.randint(5, 20)), ""))
+    return "\n".join(lines)
+
+
+def generate_escapes(rng):
+    """Generate text full of escaped characters."""
+    lines = []
+    for _ in range(rng.randint(2, 6)):
+        parts = []
+        for _ in range(rng.randint(10, 30)):
+            if rng.random() < 0.5:
+                parts.append(f"\\{rng.choice(ESCAPABLE_CHARACTERS)}"
+                             f"{rng.choice(WORDS)}")
+            else:
+                parts.append(rng.choice(WORDS))
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+GENERATORS = {
+    "nesting": generate_nesting,
+    **{f"deep_nesting_{depth}": functools.partial(generate_deep_nesting,
+                                                  depth=depth)
+       for depth in DEEP_NESTING_DEPTHS},
+    "paragraphs": generate_paragraphs,
+    "prose": generate_prose,
+    "links": generate_links,
+    "references": generate_references,
+    "code_blocks": generate_code_blocks,
+    "alternative_headings": generate_alternative_headings,
+    "escapes": generate_escapes,
+}
+
+
+def generate(name, seed, size):
+    """
+    Generate a Markdown document made of blocks of a single construct.
+
+    The same name, seed and size always generate the same document.
+
+    Args:
+        name (str): Name of construct, a key of GENERATORS.
+        seed (int): Seed of random number generator.
+        size (int): Minimum size of document, in characters.
+
+    Returns:
+        str: Markdown code.
+    """
+    rng = random.Random(f"{name}:{seed}")
+    blocks = []
+    length = 0
+    while length < size:
+        blocks.append(GENERATORS[name](rng))
+        length += len(blocks[-1]) + 2
+    return "\n\n".join(blocks)
+
+
+def get_percentile(values, percentile):
+    """
+    Get a percentile of a list of values, using the nearest-rank method.
+
+    Args:
+        values (list[float]): Values, sorted.
+        percentile (float): Percentile, between 0 and 100.
+
+    Returns:
+        float: Percentile of values.
+    """
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+def run(names=None, documents=20, size=8192, seed=0):
+    """
+    Run the benchmark, converting generated documents of each construct.
+
+    The conversion cache is bypassed, so every document is converted.
+
+    Args:
+        names (Iterable[str], optional): Names of constructs to benchmark.
+            Defaults to None, which benchmarks every construct.
+        documents (int, optional): Number of documents of each construct.
+            Defaults to 20.
+        size (int, optional): Minimum size of each document, in characters.
+            Defaults to 8192.
+        seed (int, optional): Seed of first document, each other document
+            using the next seed. Defaults to 0.
+
+    Returns:
+        dict[str, dict[str, float]]: Dictionary mapping names of constructs to
+            results, containing throughput in megabytes per second, time
+            spent on each line in microseconds, and latency percentiles in
+            milliseconds.
+    """
+    results = {}
+    for name in names or GENERATORS:
+        latencies = []
+        total_size = 0
+        total_lines = 0
+        for index in range(documents):
+            document = generate(name, seed + index, size)
+            total_size += len(document.encode())
+            total_lines += document.count("\n") + 1
+            start = time.perf_counter()
+            convert(document, cache=False)
+            latencies.append(time.perf_counter() - start)
+
+        latencies.sort()
+        results[name] = {
+            "documents": documents,
+            "bytes": total_size,
+            "mb_per_s": total_size / 1e6 / sum(latencies),
+            "us_per_line": sum(latencies) * 1e6 / total_lines,
+            "p50_ms": get_percentile(latencies, 50) * 1000,
+            "p90_ms": get_percentile(latencies, 90) * 1000,
+            "p99_ms": get_percentile(latencies, 99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        }
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Compare results of the benchmark with results of a previous run.
+
+    A construct regressed if its throughput dropped, or its 90th percentile
+    latency rose, by more than the threshold.
+
+    Args:
+        results (dict[str, dict[str, float]]): Results, as returned by run().
+        baseline (dict[str, dict[str, float]]): Results of a previous run.
+        threshold (float, optional): Relative change allowed. Defaults to 0.1.
+
+    Returns:
+        list[str]: Messages describing each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]
+        if result["mb_per_s"] < previous["mb_per_s"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput dropped from {previous['mb_per_s']:.3f} "
+                f"to {result['mb_per_s']:.3f} MB/s.")
+        if result["p90_ms"] > previous["p90_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p90 latency rose from {previous['p90_ms']:.2f} to "
+                f"{result['p90_ms']:.2f} ms.")
+    return regressions
+
+
+def main(args=None):
+    """Run the benchmark, print results, and compare them if requested."""
+    parser = argparse.ArgumentParser(
+        prog="python -m quickhtml.bench",
+        description="Benchmark convert() using generated Markdown documents, "
+                    "one set of documents for each construct.")
+    parser.add_argument("names", metavar="NAME", nargs="*",
+                        help="constructs to benchmark, defaults to all of: "
+                             f"{', '.join(GENERATORS)}")
+    parser.add_argument("-n", "--documents", metavar="N", type=int, default=20,
+                        help="number of documents of each construct, "
+                             "defaults to 20")
+    parser.add_argument("-s", "--size", metavar="CHARS", type=int, default=8192,
+                        help="minimum size of each document, defaults to 8192")
+    parser.add_argument("--seed", metavar="N", type=int, default=0,
+                        help="seed of generated documents, defaults to 0")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write results to FILE, as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare results with a previous JSON output, "
+                             "exiting with status 1 if any regressed")
+    parser.add_argument("--threshold", metavar="RATIO", type=float,
+                        default=0.1, help="relative change allowed when "
+                                          "comparing, defaults to 0.1")
+    args = parser.parse_args(args)
+    for name in args.names:
+        if name not in GENERATORS:
+            parser.error(f"Unknown construct \"{name}\".")
+
+    results = run(args.names, args.documents, args.size, args.seed)
+    print(f"{'construct':<22}{'MB/s':>8}{'us/line':>9}{'p50 ms':>9}"
+          f"{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['mb_per_s']:>8.3f}"
+              f"{result['us_per_line']:>9.2f}{result['p50_ms']:>9.2f}"
+              f"{result['p90_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['max_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "version": __version__,
+                "python": platform.python_version(),
+                "documents": args.documents,
+                "size": args.size,
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
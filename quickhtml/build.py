@@ -0,0 +1,268 @@
+"""This file contains functionality to convert directories of Markdown files."""
+
+import hashlib
+import json
+import os
+
+from quickhtml import __version__
+from quickhtml.batch import convert_many
+
+MARKDOWN_EXTENSION = ".md"
+HTML_EXTENSION = ".html"
+MANIFEST_NAME = ".quickhtml-manifest.json"
+
+
+class PathError(ValueError):
+    """Raised when a Markdown file is not inside the source directory."""
+
+
+def find_files(source):
+    """
+    Find Markdown files in a directory, recursively.
+
+    Args:
+        source (str): Directory to search in.
+
+    Returns:
+        list[str]: Paths to Markdown files, sorted.
+    """
+    files = []
+    for directory, _, names in os.walk(source):
+        files.extend(os.path.join(directory, name) for name in names
+                     if name.endswith(MARKDOWN_EXTENSION))
+    return sorted(files)
+
+
+def get_output_path(source, output, file):
+    """
+    Get the path a Markdown file should be converted into, mirroring the
+    source directory tree in the output directory.
+
+    E.g.:
+        get_output_path("docs", "site", "docs/guide/index.md")
+        Returns:
+        "site/guide/index.html"
+
+    Args:
+        source (str): Source directory.
+        output (str): Output directory.
+        file (str): Path to a Markdown file inside the source directory.
+
+    Returns:
+        str: Path to HTML file.
+
+    Raises:
+        PathError: If the file is not inside the source directory.
+    """
+    relative_path = os.path.relpath(file, source)
+    if relative_path in (os.curdir, os.pardir) or relative_path.startswith(
+            os.pardir + os.sep):
+        raise PathError(f"\"{file}\" is not inside \"{source}\".")
+
+    root, extension = os.path.splitext(relative_path)
+    if extension != MARKDOWN_EXTENSION:
+        root = relative_path
+    return os.path.join(output, root + HTML_EXTENSION)
+
+
+def get_stale_output_path(output, entry):
+    """
+    Get the path of the output file recorded in a manifest entry, so it can
+    be removed once its Markdown file no longer exists.
+
+    Manifests may have been edited or come from elsewhere, so only HTML files
+    inside the output directory are ever returned, never absolute paths or
+    paths leading outside of it, even through symbolic links.
+
+    Args:
+        output (str): Output directory.
+        entry (dict[str, Any]): Information about a Markdown file, as read by
+            read_manifest().
+
+    Returns:
+        str: Path to HTML file, or None if there is no file that can be
+            removed.
+    """
+    path = entry.get("output") if isinstance(entry, dict) else None
+    if (not isinstance(path, str) or os.path.isabs(path)
+            or not path.endswith(HTML_EXTENSION)):
+        return None
+
+    path = os.path.join(output, path)
+    directory = os.path.realpath(output)
+    if (os.path.commonpath((directory, os.path.realpath(path))) != directory
+            or not os.path.isfile(path)):
+        return None
+    return path
+
+
+def get_file_hash(file):
+    """
+    Get a hash of a file content.
+
+    Args:
+        file (str): Path to file.
+
+    Returns:
+        str: Hexadecimal SHA-256 digest of file content.
+    """
+    file_hash = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def read_manifest(output):
+    """
+    Read the manifest of a previous build from an output directory.
+
+    The manifest records, for each Markdown file converted, its content hash,
+    size, modification time and output path, along with the QuickHTML version
+    used. Entries are discarded if the version changed, since the same input
+    may then produce a different output.
+
+    Args:
+        output (str): Output directory.
+
+    Returns:
+        dict[str, dict[str, Any]]: Dictionary mapping paths of Markdown files,
+            relative to the source directory, to information about them.
+    """
+    try:
+        with open(os.path.join(output, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(manifest, dict) or manifest.get("version") != __version__:
+        return {}
+    return manifest.get("files", {})
+
+
+def write_manifest(output, entries):
+    """
+    Write the manifest of a build into an output directory.
+
+    The manifest is written into a temporary file first, then moved into
+    place, so an interrupted build never leaves a partial manifest behind.
+
+    Args:
+        output (str): Output directory.
+        entries (dict[str, dict[str, Any]]): Dictionary mapping paths of
+            Markdown files, relative to the source directory, to information
+            about them.
+
+    Returns:
+        None.
+    """
+    os.makedirs(output, exist_ok=True)
+    path = os.path.join(output, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"version": __version__, "files": entries}, f, indent=1,
+                  sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_output(path, html):
+    """
+    Write HTML code into a file, creating directories as needed.
+
+    Args:
+        path (str): Path to HTML file.
+        html (str): HTML code.
+
+    Returns:
+        None.
+    """
+    os.makedirs(os.path.dirname(path) or os.curdir, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(html)
+
+
+def build(source, output, workers=None, files=None, force=False):
+    """
+    Convert Markdown files in a directory into HTML files in another one,
+    mirroring the directory tree.
+
+    Files are only converted if they changed since the last build into the
+    same output directory, according to its manifest. A file is considered
+    unchanged if its size and modification time did not change, or if its
+    content hash did not change, and its output file still exists. When
+    every Markdown file in the source directory is built, outputs of files
+    that no longer exist are removed.
+
+    Args:
+        source (str): Source directory.
+        output (str): Output directory.
+        workers (int, optional): Number of worker processes. Defaults to None,
+            which uses the number of processors in the machine.
+        files (Iterable[str], optional): Paths to Markdown files inside the
+            source directory to convert. Defaults to None, which converts
+            every Markdown file in the source directory.
+        force (bool, optional): Whether or not every file should be
+            converted, even if unchanged. Defaults to False.
+
+    Returns:
+        list[str]: Paths to HTML files written.
+
+    Raises:
+        PathError: If a file is not inside the source directory, in which case
+            nothing is converted.
+        ConversionError: If a file can not be decoded.
+    """
+    full_build = files is None
+    files = find_files(source) if full_build else list(files)
+
+    # Check every path before converting anything.
+    output_paths = {file: get_output_path(source, output, file)
+                    for file in files}
+
+    entries = {} if force else read_manifest(output)
+    new_entries = {}
+    changed_files = []
+    for file in files:
+        key = os.path.relpath(file, source)
+        entry = entries.get(key)
+        stat = os.stat(file)
+        new_entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "output": os.path.relpath(output_paths[file], output),
+        }
+        new_entries[key] = new_entry
+
+        # The content hash is only computed if size or modification time
+        # changed, as reading every file would defeat the purpose.
+        unchanged = (
+            entry is not None
+            and entry.get("output") == new_entry["output"]
+            and os.path.exists(output_paths[file]))
+        if unchanged and (entry.get("size"), entry.get("mtime")) == (
+                new_entry["size"], new_entry["mtime"]):
+            new_entry["hash"] = entry.get("hash")
+            continue
+        new_entry["hash"] = get_file_hash(file)
+        if not unchanged or entry.get("hash") != new_entry["hash"]:
+            changed_files.append(file)
+
+    written = []
+    for file, html in convert_many(changed_files, workers, ordered=False):
+        path = output_paths[file]
+        write_output(path, html)
+        written.append(path)
+
+    # Remove outputs of files that no longer exist, and keep entries of files
+    # that were not part of this build.
+    for key, entry in entries.items():
+        if key in new_entries:
+            continue
+        if full_build:
+            path = get_stale_output_path(output, entry)
+            if path is not None:
+                os.remove(path)
+        else:
+            new_entries[key] = entry
+
+    write_manifest(output, new_entries)
+    return written
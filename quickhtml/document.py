@@ -0,0 +1,685 @@
+"""This file contains functionality to parse Markdown into a document tree, and render it into HTML."""
+
+import re
+
+from quickhtml.quickhtml import (REGEX_QUICK_EMAIL, REGEX_QUICK_LINK,
+                                 LazyPattern, Reference, ReferenceRegistry,
+                                 StreamingConverter, check_paragraph,
+                                 split_document)
+
+# Characters each "<" of HTML written inside Markdown can be replaced with
+# while parsing, so it is kept apart from tags added by conversion. They are
+# noncharacters, which are not meant to be used in text, and the first one a
+# document does not contain is used.
+HTML_MARKS = tuple(map(chr, range(0xFDD0, 0xFDF0)))
+
+# Tags a document tree is built from. Every other piece of HTML, such as tags
+# written inside Markdown, is kept as text.
+REGEX_TAG = LazyPattern(r"""
+    <                       # Match "<" once.
+    (/?)                    # CAPTURE GROUP (1) | Match "/" either 0 or 1
+                            # times.
+    (                       # CAPTURE GROUP (2) | Open capture group.
+        h[1-6]              # Match "h" once, followed by a digit between 1
+                            # and 6.
+        |p|blockquote|ol|ul # OR match any of these names.
+        |li|pre|code|strong
+        |em
+    )                       # CAPTURE GROUP (2) | Close and match capture
+                            # group.
+    >                       # Match ">" once.
+    |                       # OR
+    <\/a>                   # Match "</a>" once.
+    |                       # OR
+    <a\ href="              # Match '<a href="' once.
+    ([^"]*)                 # CAPTURE GROUP (3) | Match any character that is
+                            # not '"', between 0 and ∞ times.
+    "                       # Match '"' once.
+    (?:                     # Open non-capturing group.
+        \ title="           # Match ' title="' once.
+        ([^"]+)             # CAPTURE GROUP (4) | Match any character that is
+                            # not '"', between 1 and ∞ times.
+        "                   # Match '"' once.
+    )?                      # Close non-capturing group and match it either 0
+                            # or 1 times.
+    >                       # Match ">" once.
+    |                       # OR
+    <img\ src="             # Match '<img src="' once.
+    ([^"]*)                 # CAPTURE GROUP (5) | Match any character that is
+                            # not '"', between 0 and ∞ times.
+    "\ alt="                # Match '" alt="' once.
+    ([^"]*)                 # CAPTURE GROUP (6) | Match any character that is
+                            # not '"', between 0 and ∞ times.
+    "                       # Match '"' once.
+    (?:                     # Open non-capturing group.
+        \ title="           # Match ' title="' once.
+        ([^"]+)             # CAPTURE GROUP (7) | Match any character that is
+                            # not '"', between 1 and ∞ times.
+        "                   # Match '"' once.
+    )?                      # Close non-capturing group and match it either 0
+                            # or 1 times.
+    >                       # Match ">" once.
+    |                       # OR
+    <(br|hr)>               # CAPTURE GROUP (8) | Match either "<br>" or
+                            # "<hr>".""", re.VERBOSE)
+
+
+class Node:
+    """
+    Base class of every node of a document tree.
+
+    Nodes are stored without a dictionary for each, since a document has as
+    many of them as it has pieces of text and tags.
+    """
+
+    __slots__ = ()
+
+    def _fields(self):
+        """
+        Get the name and value of every attribute of the node.
+
+        Args:
+            None.
+
+        Returns:
+            tuple[tuple[str, Any]]: Names and values, in the order slots are
+                declared, from the base class to the node class.
+        """
+        return tuple((name, getattr(self, name))
+                     for cls in reversed(type(self).__mro__)
+                     for name in getattr(cls, "__slots__", ()))
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in
+                           self._fields())
+        return f"{type(self).__name__}({fields})"
+
+
+class Text(Node):
+    """
+    Text, or HTML that is not part of a tag of the tree.
+
+    Args:
+        text (str): Text, as it is rendered.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Element(Node):
+    """
+    Base class of nodes rendered as an opening tag, followed by their
+    children, and a closing tag.
+
+    Args:
+        children (list[Node], optional): Child nodes. Defaults to None.
+    """
+
+    __slots__ = ("children",)
+    name = None
+
+    def __init__(self, children=None):
+        self.children = children if children is not None else []
+
+    def opening_tag(self):
+        """
+        Get the opening tag of the node.
+
+        Args:
+            None.
+
+        Returns:
+            str: Opening tag.
+        """
+        return f"<{self.name}>"
+
+    def closing_tag(self):
+        """
+        Get the closing tag of the node.
+
+        Args:
+            None.
+
+        Returns:
+            str: Closing tag.
+        """
+        return f"</{self.name}>"
+
+
+class Heading(Element):
+    """
+    Heading.
+
+    Args:
+        level (int): Level of heading, between 1 and 6.
+        children (list[Node], optional): Child nodes. Defaults to None.
+    """
+
+    __slots__ = ("level",)
+
+    def __init__(self, level, children=None):
+        super().__init__(children)
+        self.level = level
+
+    @property
+    def name(self):
+        """str: Name of tag."""
+        return f"h{self.level}"
+
+
+class Paragraph(Element):
+    """Paragraph."""
+
+    __slots__ = ()
+    name = "p"
+
+
+class Blockquote(Element):
+    """Blockquote."""
+
+    __slots__ = ()
+    name = "blockquote"
+
+
+class OrderedList(Element):
+    """Ordered list."""
+
+    __slots__ = ()
+    name = "ol"
+
+
+class UnorderedList(Element):
+    """Unordered list."""
+
+    __slots__ = ()
+    name = "ul"
+
+
+class ListItem(Element):
+    """Item of an ordered or unordered list."""
+
+    __slots__ = ()
+    name = "li"
+
+
+class CodeBlock(Element):
+    """Code block, which usually contains a single Code node."""
+
+    __slots__ = ()
+    name = "pre"
+
+
+class Code(Element):
+    """Code snippet, or content of a code block."""
+
+    __slots__ = ()
+    name = "code"
+
+
+class Strong(Element):
+    """Bold text."""
+
+    __slots__ = ()
+    name = "strong"
+
+
+class Emphasis(Element):
+    """Italic text."""
+
+    __slots__ = ()
+    name = "em"
+
+
+class Link(Element):
+    """
+    Link, including reference-style links and quick links.
+
+    Args:
+        url (str): URL of link.
+        title (str, optional): Title of link. Defaults to "".
+        children (list[Node], optional): Child nodes. Defaults to None.
+    """
+
+    __slots__ = ("url", "title")
+    name = "a"
+
+    def __init__(self, url, title="", children=None):
+        super().__init__(children)
+        self.url = url
+        self.title = title
+
+    def opening_tag(self):
+        title = f' title="{self.title}"' if self.title else ""
+        return f'<a href="{self.url}"{title}>'
+
+
+class Image(Node):
+    """
+    Image.
+
+    Args:
+        url (str): URL of image.
+        alt_text (str): Alternative text of image.
+        title (str, optional): Title of image. Defaults to "".
+    """
+
+    __slots__ = ("url", "alt_text", "title")
+
+    def __init__(self, url, alt_text, title=""):
+        self.url = url
+        self.alt_text = alt_text
+        self.title = title
+
+    def tag(self):
+        """
+        Get the tag of the image.
+
+        Args:
+            None.
+
+        Returns:
+            str: Image tag.
+        """
+        title = f' title="{self.title}"' if self.title else ""
+        return f'<img src="{self.url}" alt="{self.alt_text}"{title}>'
+
+
+class LineBreak(Node):
+    """Line break."""
+
+    __slots__ = ()
+
+    def tag(self):
+        """Get the tag of the line break."""
+        return "<br>"
+
+
+class HorizontalRule(Node):
+    """Horizontal rule."""
+
+    __slots__ = ()
+
+    def tag(self):
+        """Get the tag of the horizontal rule."""
+        return "<hr>"
+
+
+# Classes of elements, by name of their tags.
+ELEMENTS = {cls.name: cls for cls in (
+    Paragraph, Blockquote, OrderedList, UnorderedList, ListItem, CodeBlock,
+    Code, Strong, Emphasis)}
+
+
+class Document:
+    """
+    Tree of a converted Markdown document.
+
+    Rendering a document gives exactly the HTML convert() gives for the same
+    Markdown code, so a document can be stored and rendered any number of
+    times, or walked to find its headings or links, without converting the
+    Markdown code again.
+
+    Args:
+        children (list[Node], optional): Top-level nodes. Defaults to None.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions of the document. Defaults to None.
+    """
+
+    __slots__ = ("children", "references")
+
+    def __init__(self, children=None, references=None):
+        self.children = children if children is not None else []
+        self.references = references
+
+    def walk(self):
+        """
+        Iterate over every node of the document, depth-first, in the order
+        they are rendered.
+
+        Args:
+            None.
+
+        Yields:
+            Node: Node.
+        """
+        # An explicit stack is used, since nesting can be deeper than the
+        # recursion limit.
+        stack = [iter(self.children)]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                continue
+            yield node
+            if isinstance(node, Element):
+                stack.append(iter(node.children))
+
+
+def add_text(children, text):
+    """
+    Add text to a list of nodes, merging it into the last node if it is text
+    as well.
+
+    Args:
+        children (list[Node]): Nodes to add text to.
+        text (str): Text to add.
+
+    Returns:
+        None.
+    """
+    if children and type(children[-1]) is Text:
+        children[-1].text += text
+    elif text:
+        children.append(Text(text))
+
+
+def mark_html(line, mark):
+    """
+    Replace each "<" of HTML written inside a line of Markdown with a mark.
+
+    The "<" starting a quick link, or a quick link to an email address, is
+    left as it is, since conversion turns it into a link.
+
+    Args:
+        line (str): Line of Markdown code.
+        mark (str): Character to replace "<" with, one of HTML_MARKS.
+
+    Returns:
+        str: Marked line.
+    """
+    start = line.find("<")
+    if start == -1:
+        return line
+
+    pieces = []
+    position = 0
+    while start != -1:
+        if not (REGEX_QUICK_LINK.match(line, start)
+                or REGEX_QUICK_EMAIL.match(line, start)):
+            pieces += (line[position:start], mark)
+            position = start + 1
+        start = line.find("<", start + 1)
+    return "".join(pieces) + line[position:]
+
+
+class MarkedReferences(ReferenceRegistry):
+    """
+    Registry looking up labels marked by mark_html() as they were before
+    being marked, in its parent registry, and marking the URL and title of
+    definitions found.
+
+    Args:
+        parent (ReferenceRegistry): Registry to look up labels in.
+        mark (str): Character "<" is replaced with, one of HTML_MARKS.
+    """
+
+    def __init__(self, parent, mark):
+        super().__init__(parent=parent)
+        self.mark = mark
+
+    def get(self, label):
+        reference = super().get(label.replace(self.mark, "<"))
+        if reference is None:
+            return None
+        return Reference(reference.label,
+                         reference.url.replace("<", self.mark),
+                         reference.title.replace("<", self.mark))
+
+
+class CheckedReferences(ReferenceRegistry):
+    """
+    Registry looking up labels in its parent registry, and recording whether
+    or not a definition found has a URL or title containing "<".
+
+    Args:
+        parent (ReferenceRegistry): Registry to look up labels in.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent=parent)
+        self.found_html = False
+
+    def get(self, label):
+        reference = super().get(label)
+        if reference is not None and (
+                "<" in reference.url or "<" in reference.title):
+            self.found_html = True
+        return reference
+
+
+class MarkedConverter(StreamingConverter):
+    """
+    Converter of lines marked by mark_html(), which converts them as it
+    would without marks, except marks are kept in its output.
+
+    Args:
+        references (ReferenceRegistry): Reference-style link definitions.
+        sink (Any): Where converted HTML should be passed to.
+        mark (str): Character "<" is replaced with, one of HTML_MARKS.
+    """
+
+    def __init__(self, references, sink, mark):
+        super().__init__(MarkedReferences(references, mark), sink)
+        self.mark = mark
+
+    def check_paragraph(self, line):
+        return check_paragraph(line.replace(self.mark, "<"))
+
+
+def convert_marked(lines, references, mark):
+    """
+    Convert lines of Markdown as convert() does, with each "<" of HTML written
+    inside Markdown replaced with a mark in the output.
+
+    Each line containing "<" which does not start a quick link, or linking to
+    a definition whose URL or title contains "<", is converted again once
+    marked by mark_html(), from the same state. Conversion matches some
+    patterns by searching the line for text, so marks can change how a line
+    is converted, in which case every "<" of the line is marked instead,
+    including those of tags added by conversion.
+
+    Args:
+        lines (list[str]): Lines to convert, as returned by split_document().
+        references (ReferenceRegistry): Reference-style link definitions.
+        mark (str): Character to replace "<" with, one of HTML_MARKS.
+
+    Returns:
+        str: Marked HTML code.
+    """
+    output = []
+    marked_output = []
+    checked_references = CheckedReferences(references)
+    converter = StreamingConverter(checked_references, output)
+    marked_converter = MarkedConverter(references, marked_output, mark)
+    for line in lines:
+        start = len(output)
+        if "<" not in line and "[" not in line:
+            converter.convert_line(line)
+            continue
+
+        state = converter.get_state()
+        checked_references.found_html = False
+        converter.convert_line(line)
+
+        # Lines whose only "<" start quick links are converted the same once
+        # marked.
+        marked_line = mark_html(line, mark)
+        if marked_line == line and not checked_references.found_html:
+            continue
+
+        marked_converter.set_state(state)
+        marked_converter.convert_line(marked_line)
+        html = "".join(output[start:])
+        marked_html = "".join(marked_output)
+        marked_output.clear()
+        if marked_html.replace(mark, "<") != html:
+            marked_html = html.replace("<", mark)
+        output[start:] = [marked_html]
+    converter.close()
+    return "".join(output)
+
+
+def build_tree(html, mark=None):
+    """
+    Build a tree of nodes from HTML code returned by conversion.
+
+    Tags that are not closed, and closing tags that close nothing, are kept as
+    text, so rendering the nodes always gives back the exact same HTML code.
+
+    Args:
+        html (str): HTML code.
+        mark (str, optional): Character "<" of HTML written inside Markdown
+            was replaced with by convert_marked(), in which case that HTML is
+            kept as text, and marks are replaced back by "<". Defaults to
+            None.
+
+    Returns:
+        list[Node]: Top-level nodes.
+    """
+    def unmark(string):
+        return string.replace(mark, "<") if mark and string else string
+
+    children = []
+
+    # Elements open, and the lists of nodes each of them was added to.
+    stack = []
+    position = 0
+    for match in REGEX_TAG.finditer(html):
+        add_text(children, unmark(html[position:match.start()]))
+        position = match.end()
+        closing, name, url, title, src, alt_text, image_title, void = (
+            match.groups())
+
+        if void:
+            children.append(LineBreak() if void == "br" else HorizontalRule())
+        elif src is not None:
+            children.append(Image(unmark(src), unmark(alt_text),
+                                  unmark(image_title) or ""))
+        elif url is not None or (name and not closing):
+            if url is not None:
+                element = Link(unmark(url), unmark(title) or "")
+            elif name[0] == "h":
+                element = Heading(int(name[1]))
+            else:
+                element = ELEMENTS[name]()
+            children.append(element)
+            stack.append((element, children))
+            children = element.children
+        else:
+            name = name or "a"
+            if not any(element.name == name for element, _ in stack):
+                add_text(children, match[0])
+                continue
+
+            # Elements left open inside the element closed are kept as text.
+            while True:
+                element, children = stack.pop()
+                if element.name == name:
+                    break
+                dissolve(element, children)
+
+    add_text(children, unmark(html[position:]))
+    while stack:
+        element, children = stack.pop()
+        dissolve(element, children)
+    return children
+
+
+def dissolve(element, children):
+    """
+    Replace an element that is not closed, which is the last node of a list,
+    by its opening tag as text, followed by its children.
+
+    Args:
+        element (Element): Element to replace.
+        children (list[Node]): Nodes the element is the last of.
+
+    Returns:
+        None.
+    """
+    children.pop()
+    add_text(children, element.opening_tag())
+    for index, child in enumerate(element.children):
+        if type(child) is Text:
+            add_text(children, child.text)
+        else:
+            children.extend(element.children[index:])
+            break
+
+
+def parse(string, references=None):
+    """
+    Parse Markdown into a document tree.
+
+    Markdown is converted as convert() does, then tags added by conversion
+    are turned into nodes, so the tree always renders into the same HTML.
+    HTML written inside Markdown, including inside code, is always kept as
+    text, see convert_marked(). Lines whose conversion depends on such HTML
+    are kept as text as a whole, along with tags added by conversion.
+
+    Args:
+        string (str): Markdown code to be parsed.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+
+    Returns:
+        Document: Document tree.
+    """
+    references, lines = split_document(string, references=references)
+    if not lines:
+        return Document([], references)
+
+    mark = next((mark for mark in HTML_MARKS if mark not in string), None)
+    if mark is None:
+        # There is no way to tell HTML written inside Markdown apart, so the
+        # whole document is kept as text.
+        output = []
+        converter = StreamingConverter(references, output)
+        for line in lines:
+            converter.convert_line(line)
+        converter.close()
+        html = "".join(output)
+        return Document([Text(html)] if html else [], references)
+    return Document(build_tree(convert_marked(lines, references, mark), mark),
+                    references)
+
+
+def render(document):
+    """
+    Render a document tree into HTML.
+
+    Args:
+        document (Document | Node): Document, or a single node.
+
+    Returns:
+        str: HTML code.
+    """
+    output = []
+    nodes = document.children if isinstance(document, Document) else [
+        document]
+
+    # An explicit stack is used, since nesting can be deeper than the
+    # recursion limit. Each entry holds nodes left to render, and the
+    # closing tag of the element they are children of.
+    stack = [(iter(nodes), "")]
+    while stack:
+        node = next(stack[-1][0], None)
+        if node is None:
+            output.append(stack.pop()[1])
+        elif type(node) is Text:
+            output.append(node.text)
+        elif isinstance(node, Element):
+            output.append(node.opening_tag())
+            stack.append((iter(node.children), node.closing_tag()))
+        else:
+            output.append(node.tag())
+    return "".join(output)
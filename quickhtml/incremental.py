@@ -0,0 +1,164 @@
+"""This file contains functionality to convert documents incrementally, as they are edited."""
+
+from quickhtml.quickhtml import StreamingConverter, split_document
+
+
+class IncrementalDocument:
+    """
+    Keep a Markdown document converted into HTML while it is edited, only
+    converting again the blocks affected by each edit.
+
+    The state carried from one line to the next, such as tags left open, is
+    stored for every line. After an edit, conversion starts from the state
+    before the first line that changed, and stops as soon as lines after the
+    edit are unchanged and reach the same state as before, since the rest of
+    the output can not change then. Reference-style link definitions and
+    alternate-style headings are still handled for the whole document, and a
+    change in definitions converts the whole document again.
+
+    Changes are returned as block spans, each being a tuple containing the
+    start and end offsets of the previous HTML that should be replaced, and
+    the HTML to replace it with. Spans always start and end between top-level
+    blocks, where no tags are left open, so each replacement is well-formed.
+
+    E.g.:
+        document = IncrementalDocument("# Heading.\n\nParagraph.")
+        document.html       # Returns "<h1>Heading.</h1><p>Paragraph.</p>".
+        document.edit(2, 3, "Edited paragraph.")
+        Returns:
+        ("<h1>Heading.</h1><p>Edited paragraph.</p>",
+         [(17, 34, "<p>Edited paragraph.</p>")])
+
+    Args:
+        string (str, optional): Markdown code. Defaults to "".
+    """
+
+    def __init__(self, string=""):
+        self.lines = string.splitlines()
+        self.html = ""
+        self._convert_all()
+
+    @property
+    def text(self):
+        """
+        str: Markdown code of the document, with lines joined by newlines.
+        """
+        return "\n".join(self.lines)
+
+    def edit(self, start, end, string):
+        """
+        Replace a range of lines, and convert the blocks affected.
+
+        Args:
+            start (int): Index of first line to replace.
+            end (int): Index of line after last line to replace. Lines are
+                inserted if it is equal to start.
+            string (str): Markdown code to replace lines with. Lines are
+                removed if it is an empty string.
+
+        Returns:
+            tuple[str, list[tuple[int, int, str]]]: HTML code of the whole
+                document, and list of block spans that changed.
+        """
+        self.lines[start:end] = string.splitlines()
+        references, lines = split_document(self.text)
+
+        old_html = self.html
+        if references != self._references:
+            self._convert_all()
+            return self.html, [(0, len(old_html), self.html)]
+
+        old_lines, old_pieces, old_states = (
+            self._processed_lines, self._pieces, self._states)
+
+        # Find the first and last lines that changed. Since alternate-style
+        # headings may merge lines, this is done on processed lines.
+        first = 0
+        limit = min(len(lines), len(old_lines))
+        while first < limit and lines[first] == old_lines[first]:
+            first += 1
+        shift = len(lines) - len(old_lines)
+        unchanged_from = len(lines)
+        while (unchanged_from > first and unchanged_from - shift > first
+               and lines[unchanged_from - 1]
+               == old_lines[unchanged_from - 1 - shift]):
+            unchanged_from -= 1
+
+        # Start from the start of the block containing the first change.
+        while first > 0 and not self._is_block_boundary(old_states[first]):
+            first -= 1
+
+        output = []
+        converter = StreamingConverter(references, output)
+        converter.set_state(old_states[first])
+        pieces = []
+        states = []
+        last = len(lines)
+        for index in range(first, len(lines)):
+            converter.convert_line(lines[index])
+            pieces.append("".join(output))
+            output.clear()
+            state = converter.get_state()
+            states.append(state)
+
+            # Stop once an unchanged line reaches the same state it had
+            # before, at the end of a block.
+            if (index >= unchanged_from
+                    and state == old_states[index + 1 - shift]
+                    and self._is_block_boundary(state)):
+                last = index + 1
+                break
+
+        old_start = sum(map(len, old_pieces[:first]))
+        old_end = old_start + sum(map(len, old_pieces[first:last - shift]))
+
+        self._processed_lines = lines
+        self._pieces[first:last - shift] = pieces
+        self._states[first + 1:last - shift + 1] = states
+        self._references = references
+
+        fragment = "".join(pieces)
+        self.html = "".join((old_html[:old_start], fragment,
+                             old_html[old_end:]))
+
+        if fragment == old_html[old_start:old_end]:
+            return self.html, []
+        return self.html, [(old_start, old_end, fragment)]
+
+    def _convert_all(self):
+        """
+        Convert the whole document, storing the state after every line.
+
+        Args:
+            None.
+
+        Returns:
+            None.
+        """
+        self._references, self._processed_lines = split_document(self.text)
+        output = []
+        converter = StreamingConverter(self._references, output)
+        self._pieces = []
+        self._states = [converter.get_state()]
+        for line in self._processed_lines:
+            converter.convert_line(line)
+            self._pieces.append("".join(output))
+            output.clear()
+            self._states.append(converter.get_state())
+        self.html = "".join(self._pieces)
+
+    @staticmethod
+    def _is_block_boundary(state):
+        """
+        Check whether or not a state is between top-level blocks, that is,
+        whether or not no tags are left open in it.
+
+        Args:
+            state (tuple): State of a converter.
+
+        Returns:
+            bool: Whether or not state is between top-level blocks.
+        """
+        open_tags, open_paragraph, open_code_block, add_line_break = state[:4]
+        return not (open_tags or open_paragraph or open_code_block
+                    or add_line_break)
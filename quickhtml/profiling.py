@@ -0,0 +1,218 @@
+"""This file contains functionality to find which regular expressions conversion spends time in."""
+
+import contextlib
+import re
+import time
+
+from quickhtml import quickhtml
+from quickhtml.quickhtml import StreamingConverter, split_document
+
+
+class ProfiledPattern:
+    """
+    Wrap a compiled regular expression, counting how many times it is tried,
+    how many times it matches, and the total time spent in it.
+
+    Args:
+        name (str): Name of the regular expression, used in reports.
+        pattern (re.Pattern | LazyPattern): Regular expression.
+    """
+
+    def __init__(self, name, pattern):
+        self.name = name
+        self.pattern = pattern
+        self.tries = 0
+        self.matches = 0
+        self.time = 0.0
+
+    def __getattr__(self, name):
+        # Attributes other than methods profiled are read from the regular
+        # expression itself.
+        return getattr(self.pattern, name)
+
+    def _call(self, method, args, kwargs):
+        """
+        Call a method of the regular expression, and record it.
+
+        Args:
+            method (str): Name of method.
+            args (tuple): Positional arguments.
+            kwargs (dict): Keyword arguments.
+
+        Returns:
+            Any: Result of method.
+        """
+        start = time.perf_counter()
+        result = getattr(self.pattern, method)(*args, **kwargs)
+        self.time += time.perf_counter() - start
+        self.tries += 1
+        return result
+
+    def match(self, *args, **kwargs):
+        """Call "match()" of the regular expression, recording it."""
+        result = self._call("match", args, kwargs)
+        self.matches += result is not None
+        return result
+
+    def fullmatch(self, *args, **kwargs):
+        """Call "fullmatch()" of the regular expression, recording it."""
+        result = self._call("fullmatch", args, kwargs)
+        self.matches += result is not None
+        return result
+
+    def search(self, *args, **kwargs):
+        """Call "search()" of the regular expression, recording it."""
+        result = self._call("search", args, kwargs)
+        self.matches += result is not None
+        return result
+
+    def findall(self, *args, **kwargs):
+        """Call "findall()" of the regular expression, recording it."""
+        result = self._call("findall", args, kwargs)
+        self.matches += bool(result)
+        return result
+
+    def finditer(self, *args, **kwargs):
+        """Call "finditer()" of the regular expression, recording it."""
+        result = list(self._call("finditer", args, kwargs))
+        self.matches += bool(result)
+        return iter(result)
+
+    def sub(self, *args, **kwargs):
+        """Call "sub()" of the regular expression, recording it."""
+        result, count = self._call("subn", args, kwargs)
+        self.matches += bool(count)
+        return result
+
+    def subn(self, *args, **kwargs):
+        """Call "subn()" of the regular expression, recording it."""
+        result = self._call("subn", args, kwargs)
+        self.matches += bool(result[1])
+        return result
+
+
+@contextlib.contextmanager
+def profile_patterns():
+    """
+    Replace every regular expression used in conversion by a ProfiledPattern,
+    restoring them at the end of a "with" block.
+
+    Regular expressions are replaced in the module, so this affects every
+    conversion running at the same time, and should only be used for
+    profiling.
+
+    Yields:
+        list[ProfiledPattern]: Regular expressions being profiled.
+    """
+    module_patterns = {
+        name: value for name, value in vars(quickhtml).items()
+        if name.startswith("REGEX_")
+        and isinstance(value, (re.Pattern, quickhtml.LazyPattern))}
+    independent_tags = quickhtml.REGEX_INDEPENDENT_TAGS
+    nested_tags = [tag.regex for tag in quickhtml.NESTED_TAGS]
+
+    profiled = {name: ProfiledPattern(name, pattern)
+                for name, pattern in module_patterns.items()}
+    profiled_independent_tags = tuple(
+        (ProfiledPattern(f"check_paragraph {pattern.pattern}", pattern),
+         closing)
+        for pattern, closing in independent_tags)
+
+    # Nested tags refer to the same regular expressions as the module.
+    names = {id(pattern): name for name, pattern in module_patterns.items()}
+
+    try:
+        for name, pattern in profiled.items():
+            setattr(quickhtml, name, pattern)
+        quickhtml.REGEX_INDEPENDENT_TAGS = profiled_independent_tags
+        for tag in quickhtml.NESTED_TAGS:
+            tag.regex = profiled[names[id(tag.regex)]]
+        yield list(profiled.values()) + [
+            pattern for pattern, _ in profiled_independent_tags]
+    finally:
+        for name, pattern in module_patterns.items():
+            setattr(quickhtml, name, pattern)
+        quickhtml.REGEX_INDEPENDENT_TAGS = independent_tags
+        for tag, pattern in zip(quickhtml.NESTED_TAGS, nested_tags):
+            tag.regex = pattern
+
+
+def profile_files(files, top=10):
+    """
+    Convert files, recording time spent in each regular expression, and the
+    slowest documents and lines.
+
+    Args:
+        files (Iterable[str]): Paths to Markdown files.
+        top (int, optional): Number of slowest documents and lines to keep.
+            Defaults to 10.
+
+    Returns:
+        dict[str, list]: Dictionary containing "patterns", a list of
+            ProfiledPattern, sorted by time, "documents", a list of tuples
+            containing time, path and size of the slowest documents, and
+            "lines", a list of tuples containing time, path and content of
+            the slowest lines, after reference-style link definitions are
+            removed and alternate-style headings are converted.
+    """
+    documents = []
+    lines = []
+    with profile_patterns() as patterns:
+        for file in files:
+            with open(file) as f:
+                string = f.read()
+
+            # Conversion is done as in convert_into(), timing every line.
+            start = time.perf_counter()
+            references, document_lines = split_document(string)
+            converter = StreamingConverter(references, [])
+            for line in document_lines:
+                line_start = time.perf_counter()
+                converter.convert_line(line)
+                lines.append((time.perf_counter() - line_start, file, line))
+            converter.close()
+            documents.append((time.perf_counter() - start, file, len(string)))
+
+            # Only the slowest lines are kept, so memory usage does not grow
+            # with the number of lines.
+            if len(lines) > top * 100:
+                lines = sorted(lines, reverse=True)[:top]
+
+    return {
+        "patterns": sorted(patterns, key=lambda pattern: pattern.time,
+                           reverse=True),
+        "documents": sorted(documents, reverse=True)[:top],
+        "lines": sorted(lines, reverse=True)[:top],
+    }
+
+
+def format_report(report):
+    """
+    Format a report returned by profile_files() as tables.
+
+    Args:
+        report (dict[str, list]): Report returned by profile_files().
+
+    Returns:
+        str: Report, as text.
+    """
+    total = sum(pattern.time for pattern in report["patterns"]) or 1
+    rows = [f"{'regex':<40}{'tries':>10}{'matches':>10}{'time ms':>11}"
+            f"{'%':>7}"]
+    for pattern in report["patterns"]:
+        name = pattern.name if len(pattern.name) <= 38 else (
+            pattern.name[:37] + "…")
+        rows.append(f"{name:<40}{pattern.tries:>10}{pattern.matches:>10}"
+                    f"{pattern.time * 1000:>11.2f}"
+                    f"{pattern.time / total * 100:>7.1f}")
+
+    rows.extend(("", "Slowest documents:", f"{'time ms':>10}  {'size':>10}  "
+                                           f"path"))
+    for elapsed, file, size in report["documents"]:
+        rows.append(f"{elapsed * 1000:>10.2f}  {size:>10}  {file}")
+
+    rows.extend(("", "Slowest lines:", f"{'time ms':>10}  path: line"))
+    for elapsed, file, line in report["lines"]:
+        line = line if len(line) <= 60 else line[:59] + "…"
+        rows.append(f"{elapsed * 1000:>10.2f}  {file}: {line!r}")
+    return "\n".join(rows)
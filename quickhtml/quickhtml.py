@@ -1,17 +1,86 @@
 """This file contains the main program functionality."""
 
+import codecs
+import contextlib
+import contextvars
+import hashlib
+import locale
+import mmap
+import os
 import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
 
-REGEX_BLOCKQUOTE = re.compile(r"""
+
+class LazyPattern:
+    """
+    A regular expression compiled the first time it is used, instead of when
+    the module is imported.
+
+    Compiling every regular expression of the module takes most of the time
+    spent importing it, while running QuickHTML from the terminal, e.g. to
+    print a help message, may use none of them. Once compiled, every method or
+    attribute read from the regular expression is stored in the object itself,
+    so using it again costs the same as using the compiled regular expression.
+
+    Args:
+        pattern (str): Regular expression.
+        flags (int, optional): Flags to compile regular expression with.
+            Defaults to 0.
+    """
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self._flags = flags
+        self._compiled = None
+
+    def __getattr__(self, name):
+        # Private attributes are always set by __init__(), so they are only
+        # missing while unpickling, before it runs.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = getattr(self.compile(), name)
+        setattr(self, name, value)
+        return value
+
+    def __reduce__(self):
+        return LazyPattern, (self.pattern, self._flags)
+
+    def __repr__(self):
+        return f"LazyPattern({self.pattern!r}, {self._flags!r})"
+
+    def compile(self):
+        """
+        Compile the regular expression, if it is not compiled yet.
+
+        Args:
+            None.
+
+        Returns:
+            re.Pattern: Compiled regular expression.
+        """
+        if self._compiled is None:
+            self._compiled = re.compile(self.pattern, self._flags)
+        return self._compiled
+
+
+REGEX_BLOCKQUOTE = LazyPattern(r"""
     \s*         # Match between 0 and ∞ whitespaces.
     (>+)        # CAPTURE GROUP (1) | Match between 1 and ∞ ">".
     \s*         # Match between 0 and ∞ whitespaces.
-    ([^>].*?)   # CAPTURE GROUP (2) | Match first character that is not ">",
-                # then match between 0 and ∞ characters, as few times as
+    (           # CAPTURE GROUP (2) | Open capture group.
+        [^>]    # Match first character that is not ">".
+        (?:     # Open non-capturing group.
+            .*  # Match between 0 and ∞ characters, as many times as
                 # possible.
+            \S  # Match a character that is not a whitespace once.
+        )?      # Close non-capturing group and match it either 0 or 1 times.
+    )           # CAPTURE GROUP (2) | Close and match capture group.
     \s*         # Match between 0 and ∞ whitespaces.""", re.VERBOSE)
 
-REGEX_BOLD = re.compile(r"""
+REGEX_BOLD = LazyPattern(r"""
     (?<!\\)         # Ensure there's no escaping backslash.
     \*{2}           # Match "*" twice.
     ([^\s*].*?)     # CAPTURE GROUP (1) | Match first character that is not "*"
@@ -28,49 +97,88 @@ REGEX_BOLD = re.compile(r"""
     (?<![\\\s_])    # Ensure there's no escaping backslash, whitespace, or "_".
     _{2}            # Match "_" twice.""", re.VERBOSE)
 
-REGEX_CODE = re.compile(r"""
-    (?<!\\)     # Ensure there's no escaping backslash.
-    (?:         # Open non-capturing group.
-        `{2}    # Match "`" twice.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (.+?)   # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
-                # times as possible.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (?<!\\) # Ensure there's no escaping backslash.
-        `{2}    # Match "`" twice.
-    )           # Close and match non-capturing group.
-    |           # OR
-    (?:         # Open non-capturing group.
-        `       # Match "`" once.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (.+?)   # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-                # times as possible.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (?<!\\) # Ensure there's no escaping backslash.
-        `       # Match "`" once.
-    )           # Close and match non-capturing group.
-    (?=[^`]|$)  # Make sure there is a line end or a character other than "`"
-                # ahead.""", re.VERBOSE)
-
-REGEX_ESCAPED_CHARACTER = re.compile(r"""
+REGEX_CODE = LazyPattern(r"""
+    (?<!\\)          # Ensure there's no escaping backslash.
+    (?:              # Open non-capturing group.
+        `{2}         # Match "`" twice.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (            # CAPTURE GROUP (1) | Open capture group.
+            .        # Match any character once.
+            (?:      # Open non-capturing group.
+                .*?  # Match between 0 and ∞ characters, as few times as
+                     # possible.
+                \S   # Match a character that is not a whitespace once.
+            )??      # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        )            # CAPTURE GROUP (1) | Close and match capture group.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (?<!\\)      # Ensure there's no escaping backslash.
+        `{2}         # Match "`" twice.
+    )                # Close and match non-capturing group.
+    |                # OR
+    (?:              # Open non-capturing group.
+        `            # Match "`" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (            # CAPTURE GROUP (2) | Open capture group.
+            .        # Match any character once.
+            (?:      # Open non-capturing group.
+                .*?  # Match between 0 and ∞ characters, as few times as
+                     # possible.
+                \S   # Match a character that is not a whitespace once.
+            )??      # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        )            # CAPTURE GROUP (2) | Close and match capture group.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (?<!\\)      # Ensure there's no escaping backslash.
+        `            # Match "`" once.
+    )                # Close and match non-capturing group.
+    (?=[^`]|$)       # Make sure there is a line end or a character other than
+                     # "`" ahead.""", re.VERBOSE)
+
+REGEX_ESCAPED_CHARACTER = LazyPattern(r"""
     \\  # Match "\" once.
     (.) # CAPTURE GROUP (1) | Match any character once.""", re.VERBOSE)
 
-REGEX_HEADING = re.compile(r"""
-    ((?:^|>|-|\d+[.\)])\s*) # CAPTURE GROUP (1) | Match either line start, ">",
-                            # "-", or a digit followed by either "." or ")",
-                            # then match between 0 and ∞ whitespaces.
+REGEX_HEADING = LazyPattern(r"""
+    (                       # CAPTURE GROUP (1) | Open capture group.
+        (?:                 # Open non-capturing group.
+            ^               # Match line start.
+            |               # OR
+            >               # Match ">" once.
+            |               # OR
+            -               # Match "-" once.
+            |               # OR
+            (?<!\d)         # Ensure there's no digit before, so a run of
+                            # digits is only tried from its start.
+            \d+             # Match between 1 and ∞ digits.
+            [.\)]           # Match either "." or ")" once.
+        )                   # Close and match non-capturing group.
+        \s*                 # Match between 0 and ∞ whitespaces.
+    )                       # CAPTURE GROUP (1) | Close and match capture
+                            # group.
     (\#{1,6})               # CAPTURE GROUP (2) | Match "#" between 1 and 6
                             # times.
     \s+                     # Match between 1 and ∞ whitespaces.
-    ([^\s].*?)              # CAPTURE GROUP (3) | Match first character that is
-                            # not a whitespace, then match between 0 and ∞
-                            # characters, as few times as possible.
+    (                       # CAPTURE GROUP (3) | Open capture group.
+        [^\s]               # Match first character that is not a whitespace.
+        (?:                 # Open non-capturing group.
+            .*              # Match between 0 and ∞ characters, as many times
+                            # as possible.
+            \S              # Match a character that is not a whitespace once.
+        )?                  # Close non-capturing group and match it either 0
+                            # or 1 times.
+    )                       # CAPTURE GROUP (3) | Close and match capture
+                            # group.
     (\s*)                   # CAPTURE GROUP (4) | Match between 0 and ∞
                             # whitespaces.
     $                       # Match line end.""", re.VERBOSE)
 
-REGEX_HEADING__ALTERNATIVE_LEVEL_1 = re.compile(r"""
+REGEX_HEADING__ALTERNATIVE_LEVEL_1 = LazyPattern(r"""
+    ^       # Match line start.
     (.+?)   # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
             # times as possible.
     \n      # Match a newline.
@@ -79,7 +187,8 @@ REGEX_HEADING__ALTERNATIVE_LEVEL_1 = re.compile(r"""
     $       # Match line end.
 """, re.VERBOSE | re.MULTILINE)
 
-REGEX_HEADING__ALTERNATIVE_LEVEL_2 = re.compile(r"""
+REGEX_HEADING__ALTERNATIVE_LEVEL_2 = LazyPattern(r"""
+    ^       # Match line start.
     (.+?)   # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
             # times as possible.
     \n      # Match a newline.
@@ -88,39 +197,111 @@ REGEX_HEADING__ALTERNATIVE_LEVEL_2 = re.compile(r"""
     $       # Match line end.
 """, re.VERBOSE | re.MULTILINE)
 
-REGEX_HORIZONTAL_RULE = re.compile(r"""
+REGEX_HORIZONTAL_RULE = LazyPattern(r"""
     ^               # Match line start.
     \s*             # Match between 0 and ∞ whitespaces.
     (?:\*|-|_){3,}  # Match either "*", "-" or "_", at least 3 times.
     \s*             # Match between 0 and ∞ whitespaces.
     $               # Match line end.""", re.VERBOSE)
 
-REGEX_IMAGE = re.compile(r"""
-    (?<!\\)     # Ensure there's no escaping backslash.
-    !           # Match "!" once.
-    \[          # Match "[" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \]          # Match "]" once.
-    \(          # Match "(" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (?:         # Open non-capturing group.
-        [\"']   # Match either "'" or '"' once.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (.+?)   # CAPTURE GROUP (3) | Match between 1 and ∞ characters, as few
-                # times as possible.
-        \s*     # Match between 0 and ∞ whitespaces.
-        [\"']   # Match either "'" or '"' once.
-    )?          # Close non-capturing group and match it either 0 or 1 times.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \)          # Match ")" once.""", re.VERBOSE)
-
-REGEX_ITALIC = re.compile(r"""
+REGEX_IMAGE = LazyPattern(r"""
+    (?<!\\)          # Ensure there's no escaping backslash.
+    !                # Match "!" once.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \(               # Match "(" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (2) | Open capture group.
+        .            # Match any character once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+    )                # CAPTURE GROUP (2) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        [\"']        # Match either "'" or '"' once.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (            # CAPTURE GROUP (3) | Open capture group.
+            .        # Match any character once.
+            (?:      # Open non-capturing group.
+                .*?  # Match between 0 and ∞ characters, as few times as
+                     # possible.
+                \S   # Match a character that is not a whitespace once.
+            )??      # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        )            # CAPTURE GROUP (3) | Close and match capture group.
+        \s*          # Match between 0 and ∞ whitespaces.
+        [\"']        # Match either "'" or '"' once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    \)               # Match ")" once.""", re.VERBOSE)
+
+REGEX_IMAGE__WITHOUT_TITLE = LazyPattern(r"""
+    (?<!\\)          # Ensure there's no escaping backslash.
+    !                # Match "!" once.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \(               # Match "(" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (2) | Open capture group.
+        .            # Match any character once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+    )                # CAPTURE GROUP (2) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    ()               # CAPTURE GROUP (3) | Match an empty string, as
+                     # there is no title.
+    \)               # Match ")" once.""", re.VERBOSE)
+
+REGEX_ITALIC = LazyPattern(r"""
     (?<!\\)         # Ensure there's no escaping backslash.
     \*              # Match "*" once.
     ([^\s*].*?)     # CAPTURE GROUP (1) | Match first character that is not "*"
@@ -137,91 +318,300 @@ REGEX_ITALIC = re.compile(r"""
     (?<![\\\s_])    # Ensure there's no escaping backslash, whitespace, or "_".
     _               # Match "_" once.""", re.VERBOSE)
 
-REGEX_LINK = re.compile(r"""
-    (?<!\\)     # Ensure there's no escaping backslash.
-    \[          # Match "[" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \]          # Match "]" once.
-    \(          # Match "(" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (?:         # Open non-capturing group.
-        [\"']   # Match either "'" or '"' once.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (.+?)   # CAPTURE GROUP (3) | Match between 1 and ∞ characters, as few
-                # times as possible.
-        \s*     # Match between 0 and ∞ whitespaces.
-        [\"']   # Match either "'" or '"' once.
-    )?          # Close non-capturing group and match it either 0 or 1 times.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \)          # Match ")" once.""", re.VERBOSE)
-
-REGEX_REFERENCE_DEFINITION = re.compile(r"""
-    ^           # Match line start.
-    (?<!\\)     # Ensure there's no escaping backslash.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \[          # Match "[" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \]          # Match "]" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    :           # Match ":" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    <?          # Match "<" either 0 or 1 times.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    >?          # Match ">" either 0 or 1 times.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (?:         # Open non-capturing group.
-        [\"'(]  # Match '"', "'", or "(" once.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (.+?)   # CAPTURE GROUP (3) | Match between 1 and ∞ characters, as few
-                # times as possible.
-        \s*     # Match between 0 and ∞ whitespaces.
-        [\"')]  # Match '"', "'", or ")" once.
-    )?          # Close non-capturing group and match it either 0 or 1 times.
-    \s*         # Match between 0 and ∞ whitespaces.
-    $           # Match line end.""", re.VERBOSE | re.MULTILINE)
-
-REGEX_REFERENCE_LINK = re.compile(r"""
-    (?<!\\)     # Ensure there's no escaping backslash.
-    \[          # Match "[" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (.+?)       # CAPTURE GROUP (1) | Match between 1 and ∞ characters, as few
-                # times as possible.
-    \s*         # Match between 0 and ∞ whitespaces.
-    \]          # Match "]" once.
-    \s*         # Match between 0 and ∞ whitespaces.
-    (?:         # Open non-capturing group.
-        \[      # Match "[" once.
-        \s*     # Match between 0 and ∞ whitespaces.
-        (.+?)   # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-                # times as possible.
-        \s*     # Match between 0 and ∞ whitespaces.
-        \]      # Match "]" once.
-    )?          # Close non-capturing group and match it either 0 or 1
-                # times.""", re.VERBOSE)
-
-REGEX_ORDERED_LIST = re.compile(r"""
-    (\s*)   # CAPTURE GROUP (1) | Match between 0 and ∞ whitespaces, as many
-            # times as possible.
-    \d+     # Match between 1 and ∞ digits.
-    [.)]    # Match either "." or ")" once.
-    \s+     # Match between 1 and ∞ whitespaces.
-    (.+?)   # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-            # times as possible.
-    \s*     # Match between 0 and ∞ whitespaces.""", re.VERBOSE)
+REGEX_LINK = LazyPattern(r"""
+    (?<!\\)          # Ensure there's no escaping backslash.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \(               # Match "(" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (2) | Open capture group.
+        .            # Match any character once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+    )                # CAPTURE GROUP (2) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        [\"']        # Match either "'" or '"' once.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (            # CAPTURE GROUP (3) | Open capture group.
+            .        # Match any character once.
+            (?:      # Open non-capturing group.
+                .*?  # Match between 0 and ∞ characters, as few times as
+                     # possible.
+                \S   # Match a character that is not a whitespace once.
+            )??      # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        )            # CAPTURE GROUP (3) | Close and match capture group.
+        \s*          # Match between 0 and ∞ whitespaces.
+        [\"']        # Match either "'" or '"' once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    \)               # Match ")" once.""", re.VERBOSE)
+
+REGEX_LINK__WITHOUT_TITLE = LazyPattern(r"""
+    (?<!\\)          # Ensure there's no escaping backslash.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \(               # Match "(" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (2) | Open capture group.
+        .            # Match any character once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+    )                # CAPTURE GROUP (2) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    ()               # CAPTURE GROUP (3) | Match an empty string, as
+                     # there is no title.
+    \)               # Match ")" once.""", re.VERBOSE)
+
+REGEX_REFERENCE_DEFINITION = LazyPattern(r"""
+    ^                # Match line start.
+    (?<!\\)          # Ensure there's no escaping backslash.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    :                # Match ":" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        <            # Match "<" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    (                # CAPTURE GROUP (2) | Open capture group.
+        .            # Match any character once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+    )                # CAPTURE GROUP (2) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        >            # Match ">" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    (?:              # Open non-capturing group.
+        [\"'(]       # Match '"', "'", or "(" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (            # CAPTURE GROUP (3) | Open capture group.
+            .        # Match any character once.
+            (?:      # Open non-capturing group.
+                .*?  # Match between 0 and ∞ characters, as few times as
+                     # possible.
+                \S   # Match a character that is not a whitespace once.
+            )??      # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        )            # CAPTURE GROUP (3) | Close and match capture group.
+        \s*          # Match between 0 and ∞ whitespaces.
+        [\"')]       # Match '"', "'", or ")" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    $                # Match line end.""", re.VERBOSE | re.MULTILINE)
+
+REGEX_REFERENCE_DEFINITION__WITHOUT_TITLE = LazyPattern(r"""
+    ^                # Match line start.
+    (?<!\\)          # Ensure there's no escaping backslash.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    :                # Match ":" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        <            # Match "<" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    (                # CAPTURE GROUP (2) | Open capture group.
+        .            # Match any character once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+    )                # CAPTURE GROUP (2) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        >            # Match ">" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.
+    ()               # CAPTURE GROUP (3) | Match an empty string, as
+                     # there is no title.
+    $                # Match line end.""", re.VERBOSE | re.MULTILINE)
+
+REGEX_REFERENCE_LINK = LazyPattern(r"""
+    (?<!\\)          # Ensure there's no escaping backslash.
+    \[               # Match "[" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (                # CAPTURE GROUP (1) | Open capture group.
+        \S           # Match a character that is not a whitespace once.
+        (?:          # Open non-capturing group.
+            .*?      # Match between 0 and ∞ characters, as few times as
+                     # possible.
+            \S       # Match a character that is not a whitespace once.
+        )??          # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+        |            # OR
+        [^\S\n]      # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+        (?=\n*\])    # Make sure there are only line breaks and "]" ahead.
+    )                # CAPTURE GROUP (1) | Close and match capture group.
+    \s*              # Match between 0 and ∞ whitespaces.
+    \]               # Match "]" once.
+    \s*              # Match between 0 and ∞ whitespaces.
+    (?:              # Open non-capturing group.
+        \[           # Match "[" once.
+        \s*          # Match between 0 and ∞ whitespaces.
+        (            # CAPTURE GROUP (2) | Open capture group.
+            \S       # Match a character that is not a whitespace once.
+            (?:      # Open non-capturing group.
+                .*?  # Match between 0 and ∞ characters, as few times as
+                     # possible.
+                \S   # Match a character that is not a whitespace once.
+            )??      # Close non-capturing group and match it either 0 or 1
+                     # times, as few times as possible. Past its first
+                     # character, the capture group only ends after a character
+                     # that is not a whitespace.
+            |        # OR
+            [^\S\n]  # Match a whitespace that is not a line break once.
+                     # Only matched when there is nothing else before "]".
+            (?=\n*\])# Make sure there are only line breaks and "]" ahead.
+        )            # CAPTURE GROUP (2) | Close and match capture group.
+        \s*          # Match between 0 and ∞ whitespaces.
+        \]           # Match "]" once.
+    )?               # Close non-capturing group and match it either 0 or 1
+                     # times.""", re.VERBOSE)
+
+# Marker of a nested tag, along with whitespace after it. Groups matched tell
+# which kind of tag it belongs to, in the same order as NESTED_TAGS.
+REGEX_NESTED_TAG_MARKER = LazyPattern(r"""
+    \s*             # Match between 0 and ∞ whitespaces.
+    (?:             # Open non-capturing group.
+        (>+)        # CAPTURE GROUP (1) | Match between 1 and ∞ ">".
+        (\s*)       # CAPTURE GROUP (2) | Match between 0 and ∞ whitespaces.
+        |           # OR
+        \d+         # Match between 1 and ∞ digits.
+        [.)]        # Match either "." or ")" once.
+        (\s+)       # CAPTURE GROUP (3) | Match between 1 and ∞ whitespaces.
+        |           # OR
+        [-*+]+      # Match between 1 and ∞ "-", "*", or "+".
+        (\s+)       # CAPTURE GROUP (4) | Match between 1 and ∞ whitespaces.
+    )               # Close non-capturing group.""", re.VERBOSE)
+
+REGEX_ORDERED_LIST = LazyPattern(r"""
+    (\s*)       # CAPTURE GROUP (1) | Match between 0 and ∞ whitespaces, as
+                # many times as possible.
+    \d+         # Match between 1 and ∞ digits.
+    [.)]        # Match either "." or ")" once.
+    \s+         # Match between 1 and ∞ whitespaces.
+    (           # CAPTURE GROUP (2) | Open capture group.
+        .       # Match any character once.
+        (?:     # Open non-capturing group.
+            .*  # Match between 0 and ∞ characters, as many times as
+                # possible.
+            \S  # Match a character that is not a whitespace once.
+        )?      # Close non-capturing group and match it either 0 or 1 times.
+    )           # CAPTURE GROUP (2) | Close and match capture group.
+    \s*         # Match between 0 and ∞ whitespaces.""", re.VERBOSE)
 
-REGEX_QUICK_EMAIL = re.compile(r"""
+REGEX_QUICK_EMAIL = LazyPattern(r"""
     (?<!\\)         # Ensure there's no escaping backslash.
     <               # Match "<" once.
     (               # CAPTURE GROUP (1) | Open capture group.
@@ -236,7 +626,7 @@ REGEX_QUICK_EMAIL = re.compile(r"""
     )               # CAPTURE GROUP (1) | Close and match capture group.
     >               # Match ">" once.""", re.VERBOSE)
 
-REGEX_QUICK_LINK = re.compile(r"""
+REGEX_QUICK_LINK = LazyPattern(r"""
     (?<!\\)                 # Ensure there's no escaping backslash.
     <                       # Match "<" once.
     (                       # CAPTURE GROUP (1) | Open capture group.
@@ -247,13 +637,19 @@ REGEX_QUICK_LINK = re.compile(r"""
             \.              # Match "." once.
         )?                  # Close non-capturing group and match it either 0
                             # or 1 times.
+        [^\s/?.#->]+        # Match any character that is not a whitespace,
+                            # "/", "?", ".", or between "#" and ">", between 1
+                            # and ∞ times.
         (?:                 # Open non-capturing group.
+            \.              # Match "." once.
             [^\s/?.#->]+    # Match any character that is not a whitespace,
-                            # "/", "?", ".", "#", "-", or ">", between 1 and ∞
-                            # times.
-            \.?             # Match ".", either 0 or 1 times.
-        )+                  # Close non-capturing group and match it between 1
+                            # "/", "?", ".", or between "#" and ">", between 1
                             # and ∞ times.
+        )*                  # Close non-capturing group and match it between 0
+                            # and ∞ times. Each "." must be followed by
+                            # another character, so a run of characters can
+                            # only be matched in one way.
+        \.?                 # Match ".", either 0 or 1 times.
         (?:                 # Open non-capturing group.
             /               # Match "/" once.
             [^\s]*          # Match any character that is not a whitespace,
@@ -264,43 +660,260 @@ REGEX_QUICK_LINK = re.compile(r"""
                             # group.
     >                       # Match ">" once.""", re.VERBOSE)
 
-REGEX_UNORDERED_LIST = re.compile(r"""
-    (\s*)   # CAPTURE GROUP (1) | Match between 0 and ∞ whitespaces, as many
-            # times as possible.
-    [-*+]+  # Match between 1 and ∞ "-", "*", or "+".
-    \s+     # Match between 1 and ∞ whitespaces.
-    (.+?)   # CAPTURE GROUP (2) | Match between 1 and ∞ characters, as few
-            # times as possible.
-    \s*     # Match between 0 and ∞ whitespaces.""", re.VERBOSE)
+REGEX_UNORDERED_LIST = LazyPattern(r"""
+    (\s*)       # CAPTURE GROUP (1) | Match between 0 and ∞ whitespaces, as
+                # many times as possible.
+    [-*+]+      # Match between 1 and ∞ "-", "*", or "+".
+    \s+         # Match between 1 and ∞ whitespaces.
+    (           # CAPTURE GROUP (2) | Open capture group.
+        .       # Match any character once.
+        (?:     # Open non-capturing group.
+            .*  # Match between 0 and ∞ characters, as many times as
+                # possible.
+            \S  # Match a character that is not a whitespace once.
+        )?      # Close non-capturing group and match it either 0 or 1 times.
+    )           # CAPTURE GROUP (2) | Close and match capture group.
+    \s*         # Match between 0 and ∞ whitespaces.""", re.VERBOSE)
+
+REGEX_WHITESPACE = LazyPattern(r"""
+    (\s+)   # CAPTURE GROUP (1) | Match between 1 and ∞ whitespaces, as
+            # many times as possible.""", re.VERBOSE)
+
+# Styles of alternate-style headings, each as the character underlining a
+# heading, and the conventional style it is converted to, in the order they are
+# converted.
+ALTERNATIVE_HEADING_STYLES = (("=", "# "), ("-", "## "))
+
+# Tags that do not need be enclosed in <p> tags, each along with the start of
+# its closing tag, if it has one.
+REGEX_INDEPENDENT_TAGS = tuple(
+    (LazyPattern(regex), closing) for regex, closing in (
+        (r"""<h[1-6]>.+<\/h[1-6]>""", "</h"),
+        (r"""<a\s+href="[^"]+?"\s*(?:title="[^"]+?")?>.+?<\/a>""", "</a>"),
+        (r"""<img\s+src="[^"]+?"\s*alt="[^"]+?"(?:\s*title="[^"]+?")?>""",
+         None),
+        (r"""<code>.+</code>""", "</code>"),
+        (r"""<blockquote>.+""", None),
+        (r"""<ol>.+""", None),
+        (r"""<ul>.+""", None),
+        (r"""<pre><code>.+""", None),
+    ))
+
+# Features of a line, each set in the bitmap returned by get_line_features()
+# when the line contains characters a stage of conversion needs to match
+# anything. Stages are skipped for lines without their feature, and most
+# lines of prose have none.
+FEATURE_HORIZONTAL_RULE = 1 << 0    # Starts with "*", "-" or "_".
+FEATURE_NESTED_TAG = 1 << 1         # Starts with ">", "-", "*", "+", or a
+                                    # digit.
+FEATURE_HEADING = 1 << 2            # Contains "#".
+FEATURE_CODE = 1 << 3               # Contains "`".
+FEATURE_EMPHASIS = 1 << 4           # Contains "*" or "_".
+FEATURE_LINK = 1 << 5               # Contains "[".
+FEATURE_IMAGE = 1 << 6              # Contains "!".
+
+# Characters setting a feature anywhere in a line, along with the feature.
+FEATURE_CHARACTERS = (
+    ("#", FEATURE_HEADING),
+    ("`", FEATURE_CODE),
+    ("*", FEATURE_EMPHASIS),
+    ("_", FEATURE_EMPHASIS),
+    ("[", FEATURE_LINK),
+    ("!", FEATURE_IMAGE),
+)
+
+# Characters setting features at the start of a line, along with the features
+# they set. Digits, which are any character regular expressions match "\d"
+# with, set FEATURE_NESTED_TAG as well.
+FEATURE_LEADING_CHARACTERS = {
+    ">": FEATURE_NESTED_TAG,
+    "+": FEATURE_NESTED_TAG,
+    "-": FEATURE_HORIZONTAL_RULE | FEATURE_NESTED_TAG,
+    "*": FEATURE_HORIZONTAL_RULE | FEATURE_NESTED_TAG,
+    "_": FEATURE_HORIZONTAL_RULE,
+}
+
+
+class NestedTag:
+    """
+    A kind of tag that can be nested, such as a blockquote or a list.
+
+    Kinds of tags are only ever compared by identity, since there is exactly
+    one object for each of them, see NESTED_TAGS.
+
+    Args:
+        regex (LazyPattern): Regular expression matching a line containing the
+            tag, which captures the indentation or markers setting its level,
+            and its content.
+        outer_opening_tag (str): Opening tag of the tag itself.
+        outer_closing_tag (str): Closing tag of the tag itself.
+        inner_opening_tag (str): Opening tag of each line of content.
+        inner_closing_tag (str): Closing tag of each line of content.
+        minimum_level (int): Level of the tag when it is not nested.
+    """
+
+    __slots__ = ("regex", "outer_opening_tag", "outer_closing_tag",
+                 "inner_opening_tag", "inner_closing_tag", "minimum_level")
+
+    def __init__(self, regex, outer_opening_tag, outer_closing_tag,
+                 inner_opening_tag, inner_closing_tag, minimum_level):
+        self.regex = regex
+        self.outer_opening_tag = outer_opening_tag
+        self.outer_closing_tag = outer_closing_tag
+        self.inner_opening_tag = inner_opening_tag
+        self.inner_closing_tag = inner_closing_tag
+        self.minimum_level = minimum_level
+
+    def __repr__(self):
+        return f"NestedTag({self.outer_opening_tag!r})"
+
 
 NESTED_TAGS = (
-    {
-        "regex": REGEX_BLOCKQUOTE,
-        "outer_opening_tag": "<blockquote>",
-        "outer_closing_tag": "</blockquote>",
-        "inner_opening_tag": "<p>",
-        "inner_closing_tag": "</p>",
-        "minimum_level": 1
-    },
-    {
-        "regex": REGEX_ORDERED_LIST,
-        "outer_opening_tag": "<ol>",
-        "outer_closing_tag": "</ol>",
-        "inner_opening_tag": "<li>",
-        "inner_closing_tag": "</li>",
-        "minimum_level": 0
-    },
-    {
-        "regex": REGEX_UNORDERED_LIST,
-        "outer_opening_tag": "<ul>",
-        "outer_closing_tag": "</ul>",
-        "inner_opening_tag": "<li>",
-        "inner_closing_tag": "</li>",
-        "minimum_level": 0
-    }
+    NestedTag(REGEX_BLOCKQUOTE, "<blockquote>", "</blockquote>", "<p>", "</p>",
+              1),
+    NestedTag(REGEX_ORDERED_LIST, "<ol>", "</ol>", "<li>", "</li>", 0),
+    NestedTag(REGEX_UNORDERED_LIST, "<ul>", "</ul>", "<li>", "</li>", 0),
 )
 
 
+class NestingStack:
+    """
+    Tags left open by nested tags, along with their levels.
+
+    The last tag open is always at the top of the stack, and the lowest level
+    of all tags open is kept for each position of the stack, so opening a
+    tag, closing the last one, and finding the lowest level open all take
+    constant time, however deep tags are nested.
+
+    Args:
+        open_tags (Iterable[tuple[NestedTag, int]], optional): Tags open, each
+            along with its level, from the first to the last opened. Defaults
+            to None.
+    """
+
+    __slots__ = ("_tags", "_levels", "_minimum_levels")
+
+    def __init__(self, open_tags=None):
+        self._tags = []
+        self._levels = []
+        self._minimum_levels = []
+        for tag, level in open_tags or ():
+            self.push(tag, level)
+
+    def push(self, tag, level):
+        """
+        Open a tag.
+
+        Args:
+            tag (NestedTag): Kind of tag.
+            level (int): Level of tag.
+
+        Returns:
+            None.
+        """
+        self._tags.append(tag)
+        self._levels.append(level)
+        self._minimum_levels.append(
+            min(level, self._minimum_levels[-1]) if self._minimum_levels
+            else level)
+
+    def pop(self):
+        """
+        Close the last tag open.
+
+        Args:
+            None.
+
+        Returns:
+            str: Closing tag of tag closed.
+        """
+        self._levels.pop()
+        self._minimum_levels.pop()
+        return self._tags.pop().outer_closing_tag
+
+    def close_above(self, level):
+        """
+        Close the last tags open, as long as their level is greater than a
+        level.
+
+        Args:
+            level (int): Level tags left open should not be greater than.
+
+        Returns:
+            str: Closing tags of tags closed.
+        """
+        closing_tags = []
+        levels = self._levels
+        while levels and levels[-1] > level:
+            closing_tags.append(self.pop())
+        return "".join(closing_tags)
+
+    def close_all(self):
+        """
+        Close every tag open.
+
+        Args:
+            None.
+
+        Returns:
+            str: Closing tags of tags closed, from the last to the first
+                opened.
+        """
+        return self.close_above(float("-inf"))
+
+    @property
+    def last_tag(self):
+        """NestedTag | None: Last tag open, or None if no tag is open."""
+        return self._tags[-1] if self._tags else None
+
+    @property
+    def last_level(self):
+        """int: Level of last tag open, or 0 if no tag is open."""
+        return self._levels[-1] if self._levels else 0
+
+    @property
+    def minimum_level(self):
+        """int | None: Lowest level of tags open, or None if no tag is open."""
+        return self._minimum_levels[-1] if self._minimum_levels else None
+
+    def __iter__(self):
+        return zip(self._tags, self._levels)
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __bool__(self):
+        return bool(self._tags)
+
+
+def get_line_features(line):
+    """
+    Get which stages of conversion a line needs, from the characters it
+    contains.
+
+    Tags added to a line by conversion contain none of the characters that
+    set features, and stages using features run before URLs of reference-style
+    link definitions are added to the line, except for nested tags, which only
+    use features of its start. So features of a line stay valid for every part
+    of it, throughout conversion. E.g.: a line without "#" never contains a
+    heading.
+
+    Args:
+        line (str): Line to check.
+
+    Returns:
+        int: Bitmap of FEATURE_* flags set by the line.
+    """
+    start = line.lstrip()[:1]
+    features = FEATURE_LEADING_CHARACTERS.get(start, 0)
+    if start.isdecimal():
+        features = FEATURE_NESTED_TAG
+    for character, feature in FEATURE_CHARACTERS:
+        if character in line:
+            features |= feature
+    return features
+
+
 def check_paragraph(line):
     """
     Check whether or not a line should be enclosed in paragraph tags.
@@ -313,29 +926,30 @@ def check_paragraph(line):
     """
     line = line.strip()
 
+    # Every tag that does not need to be enclosed starts with "<".
+    if "<" not in line:
+        return line != ""
+
     # A paragraph can start with a "<br>", but not just be a "<br>".
-    if line in ("", "<br>", "<hr>"):
+    if line in ("<br>", "<hr>"):
         return False
 
-    # Tags that do not need be enclosed in <p> tags:
-    INDEPENDENT_TAG_REGEXES = (
-        r"""<h[1-6]>.+<\/h[1-6]>""",
-        r"""<a\s+href="[^"]+?"\s*(?:\s*title="[^"]+?")?>.+?<\/a>""",
-        r"""<img\s+src="[^"]+?"\s*alt="[^"]+?"(?:\s*title="[^"]+?")?>""",
-        r"""<code>.+</code>""",
-        r"""<blockquote>.+""",
-        r"""<ol>.+""",
-        r"""<ul>.+""",
-        r"""<pre><code>.+""",
-    )
-
-    for regex in INDEPENDENT_TAG_REGEXES:
-        line = re.sub(regex, "", line)
+    for regex, closing in REGEX_INDEPENDENT_TAGS:
+        if closing is None:
+            line = regex.sub("", line)
+            continue
+
+        # A tag can only end at its last closing tag, so the line is only
+        # searched up to it. Otherwise, each opening tag that is never
+        # closed would be scanned up to the end of the line.
+        if closing in line:
+            end = line.find(">", line.rfind(closing)) + 1 or len(line)
+            line = regex.sub("", line[:end]) + line[end:]
 
     return line != ""
 
 
-def convert_nested_tag(line, cur_tag, open_tags):
+def convert_nested_tag(line, cur_tag, open_tags, is_paragraph=check_paragraph):
     """
     Convert one or more nested tags in a line.
 
@@ -376,11 +990,13 @@ def convert_nested_tag(line, cur_tag, open_tags):
 
     Args:
         line (str): Line to convert.
-        cur_tag (dict[str, Any]): Dictionary containing data about type of tag
-            used in conversion.
-        open_tags (list[tuple[dict[str, Any], int]]): A list of tuples which
-            represent tags left open, where each tuple contains a dictionary
-            representing a tag, and its respective level.
+        cur_tag (NestedTag): Kind of tag used in conversion.
+        open_tags (NestingStack): Tags left open, along with their levels,
+            which is updated in place.
+        is_paragraph (Callable[[str], bool], optional): Function checking
+            whether or not a string should be enclosed in paragraph tags.
+            Defaults to check_paragraph().
+
     Returns:
         new_line (str) : Converted line.
     """
@@ -395,23 +1011,23 @@ def convert_nested_tag(line, cur_tag, open_tags):
 
         Args:
             string (str): String to add tags to.
-            tag (tuple[dict[str, Any]]): A dictionary representing a tag.
+            tag (NestedTag): Kind of tag.
 
         Returns:
             string: Resulting string.
         """
-        if tag["inner_opening_tag"] == "<p>":
-            return f"<p>{string}</p>" if check_paragraph(string) else string
+        if tag.inner_opening_tag == "<p>":
+            return f"<p>{string}</p>" if is_paragraph(string) else string
 
         return "".join((
-            tag["inner_opening_tag"],
+            tag.inner_opening_tag,
             string,
-            tag["inner_closing_tag"]
+            tag.inner_closing_tag
         ))
 
     def convert_inline(string):
         """
-        Recursively convert nested tags present in a string.
+        Convert nested tags present in a string.
 
         This function should only be used to convert nested tags present in the
         content of another nested tag. That is, it is only useful for nested
@@ -429,31 +1045,80 @@ def convert_nested_tag(line, cur_tag, open_tags):
                 </li>
             </ol>
 
+        Markers are matched one after the other, each from where the last one
+        ended, instead of matching what is left of the string as a whole for
+        each of them, so a string is converted in linear time, however many
+        markers it starts with.
+
         Args:
             string (str): String to convert.
 
         Returns:
             string: Converted string.
         """
-        for tag in NESTED_TAGS:
-            match = tag["regex"].fullmatch(string)
-            if match:
-                content = match[2]
-                string = "".join((
-                    tag["outer_opening_tag"],
-                    inner_tags(convert_inline(content.strip()), tag),
-                    tag["outer_closing_tag"]
-                ))
-        return string
+        tags = []
+
+        # Content of the last tag matched is string[start:end]. Whitespace
+        # around it is only stripped once a tag is matched, as the string
+        # itself is matched as it is.
+        start = 0
+        end = len(string)
+        while True:
+            match = REGEX_NESTED_TAG_MARKER.match(string, start, end)
+            if match is None:
+                break
+
+            # The last group matched tells which tag the marker belongs to,
+            # and holds whitespace after the marker. Blockquote markers can be
+            # followed by no whitespace, but their content can not start with
+            # ">", while list markers must be followed by whitespace.
+            tag = NESTED_TAGS[match.lastindex - 2]
+            blockquote = tag is NESTED_TAGS[0]
+            position = match.end()
+            if position == end or (blockquote and string[position] == ">"):
+                # The last whitespace after the marker is then the first
+                # character of content, as long as the marker is still
+                # followed by as much whitespace as it requires.
+                if len(match[match.lastindex]) <= (0 if blockquote else 1):
+                    break
+                position -= 1
+            tags.append(tag)
+            start = position
+
+            # Content is at least one character long, and ends at the last
+            # character that is not a whitespace. Then, whitespace around it
+            # is stripped.
+            while end > start + 1 and string[end - 1].isspace():
+                end -= 1
+            while start < end and string[start].isspace():
+                start += 1
+            while end > start and string[end - 1].isspace():
+                end -= 1
+
+        if not tags:
+            return string
+
+        # Content of every tag but the last is another tag, which is never
+        # enclosed in paragraph tags, so only list items are opened.
+        opening_tags = []
+        closing_tags = []
+        for tag in tags[:-1]:
+            if tag.inner_opening_tag == "<p>":
+                opening_tags.append(tag.outer_opening_tag)
+                closing_tags.append(tag.outer_closing_tag)
+            else:
+                opening_tags += (tag.outer_opening_tag, tag.inner_opening_tag)
+                closing_tags += (tag.outer_closing_tag, tag.inner_closing_tag)
+        tag = tags[-1]
+        opening_tags += (tag.outer_opening_tag,
+                         inner_tags(string[start:end], tag),
+                         tag.outer_closing_tag)
+        return "".join(opening_tags) + "".join(reversed(closing_tags))
 
     new_line = ""
-    match = cur_tag["regex"].fullmatch(line)
-
-    try:
-        last_tag = open_tags[-1][0]
-        last_tag_level = open_tags[-1][1]
-    except IndexError:
-        last_tag_level = 0
+    match = cur_tag.regex.fullmatch(line)
+    last_tag = open_tags.last_tag
+    last_tag_level = open_tags.last_level
     try:
         # 1 is added to ensure level is never less than 1. This prevents
         # inconsistent behavior from arising due to lists minimum level being
@@ -466,305 +1131,1731 @@ def convert_nested_tag(line, cur_tag, open_tags):
     # Tag minimum level is removed from the current level due to the same
     # reason as above. This mainly addresses inconsistencies when tags are
     # mixed.
-    cur_tag_level -= cur_tag["minimum_level"]
+    cur_tag_level -= cur_tag.minimum_level
 
     content = convert_inline(match[2])
 
-    # If current level is greater than last level, open a new tag, then append
-    # tag and level to the list of open tags.
+    # If current level is greater than last level, open a new tag, then push
+    # it to the stack of open tags.
     if cur_tag_level > last_tag_level:
         new_line = "".join((
-            cur_tag["outer_opening_tag"],
+            cur_tag.outer_opening_tag,
             inner_tags(content, cur_tag)
         ))
-        open_tags.append((cur_tag, cur_tag_level))
+        open_tags.push(cur_tag, cur_tag_level)
+        return new_line
+
+    # If current level is lesser than last level, and none of the open tags
+    # have a level equal to or lesser than current level, the last tag is
+    # replaced by a new one. This is checked mainly to account for edge cases.
+    if open_tags.minimum_level > cur_tag_level:
+        last_tag = None
 
-    # If current level is lesser than last level:
+    # If not, close open tags until a tag's level is equal to or lesser than
+    # current level.
     elif cur_tag_level < last_tag_level:
-        # If none of the open tags have a level equal to or lesser than current
-        # level, close the last tag, remove it from the list of open tags, open
-        # a new tag, and add it to the list of open tags. This is checked
-        # mainly to account for edge cases.
-        if not any(open_tag[1] <= cur_tag_level for open_tag in open_tags):
-            new_line = "".join((
-                last_tag["outer_closing_tag"],
-                cur_tag["outer_opening_tag"],
-                inner_tags(content, cur_tag)
-            ))
-            open_tags.remove(open_tags[-1])
-            open_tags.append((cur_tag, cur_tag_level))
+        new_line = open_tags.close_above(cur_tag_level)
+        last_tag = open_tags.last_tag
+
+    # If this tag is the same type as current tag, open inner tags only.
+    if last_tag is cur_tag:
+        return new_line + inner_tags(content, cur_tag)
+
+    # If not, then close it, pop it from the stack of open tags, open a new
+    # tag and push it to the stack of open tags.
+    new_line += "".join((
+        open_tags.pop(),
+        cur_tag.outer_opening_tag,
+        inner_tags(content, cur_tag)
+    ))
+    open_tags.push(cur_tag, cur_tag_level)
+    return new_line
+
+
+def find_last_closing(string, closing, character):
+    """
+    Find the last occurrence of a closing delimiter in a string, which is not
+    preceded by an escaping backslash, a whitespace, or a given character.
+
+    Args:
+        string (str): String to search in.
+        closing (str): Closing delimiter, such as "**".
+        character (str): Character that can not precede the delimiter, such as
+            "*".
+
+    Returns:
+        int: Index of the delimiter, or -1 if there is none.
+    """
+    index = string.rfind(closing)
+    while index > 0 and (string[index - 1] in ("\\", character)
+                         or string[index - 1].isspace()):
+        index = string.rfind(closing, 0, index + len(closing) - 1)
+    return index
+
+
+def find_matches(match, string, limits):
+    """
+    Find every match of a regular expression in a string, as finditer() does,
+    only trying to match where a match can start.
+
+    Every match must start with one of the keys of limits, and can not start
+    after its respective value, usually found from the last position a match
+    could end at. Otherwise, every opening character that is never closed,
+    such as each "[" or "*" of a line, would be tried, scanning up to the end
+    of the string, which takes time quadratic in the length of the string.
+
+    Args:
+        match (Callable[[str, int], re.Match]): Function matching the regular
+            expression at an index of a string, such as its match() method.
+        string (str): String to search in.
+        limits (dict[str, int]): Dictionary mapping strings matches start with
+            to the last index matches starting with them can start at.
+
+    Yields:
+        re.Match: Match found.
+    """
+    # Index of the next occurrence of each string matches start with.
+    starts = {}
+    for opening, limit in limits.items():
+        if limit >= 0:
+            start = string.find(opening, 0, limit + len(opening))
+            if start != -1:
+                starts[opening] = start
+
+    while starts:
+        opening = min(starts, key=starts.get)
+        start = starts[opening]
+        result = match(string, start)
+        if result is not None:
+            yield result
+            position = result.end()
         else:
-            # Go through open tags, closing them until a tag's level is equal
-            # to or lesser than current level.
-            for open_tag in reversed(open_tags):
-                tag, level = open_tag
-                if level > cur_tag_level:
-                    new_line += tag["outer_closing_tag"]
-                    open_tags.remove(open_tag)
+            position = start + 1
+
+        # Find the next occurrences of strings that are now behind.
+        for opening, start in list(starts.items()):
+            if start < position:
+                start = string.find(opening, position,
+                                    limits[opening] + len(opening))
+                if start == -1:
+                    del starts[opening]
                 else:
-                    # If this tag is the same type as current tag, open inner
-                    # tags only.
-                    if tag == cur_tag:
-                        new_line += inner_tags(content, cur_tag)
-
-                    # If not, then close it, remove it from the list of open
-                    # tags, open a new tag and add it to the list of open tags.
-                    else:
-                        new_line += "".join((
-                            tag["outer_closing_tag"],
-                            cur_tag["outer_opening_tag"],
-                            inner_tags(content, cur_tag)
-                        ))
-                        open_tags.remove(open_tag)
-                        open_tags.append((cur_tag, cur_tag_level))
-                    break
+                    starts[opening] = start
 
-    # If current level is the same as last level:
-    else:
-        # If last tag is the same type as current tag, open inner tags only.
-        if last_tag == cur_tag:
-            new_line = inner_tags(content, cur_tag)
 
-        # If not, then close it, remove it from the list of open tags, open a
-        # new tag, and add it to the list of open tags.
-        else:
-            new_line = "".join((
-                last_tag["outer_closing_tag"],
-                cur_tag["outer_opening_tag"],
-                inner_tags(content, cur_tag)
-            ))
-            open_tags.remove(open_tags[-1])
-            open_tags.append((cur_tag, cur_tag_level))
+def substitute(match, replacement, string, limits):
+    """
+    Replace every match of a regular expression in a string, as sub() does,
+    only trying to match where a match can start. See find_matches().
+
+    Args:
+        match (Callable[[str, int], re.Match]): Function matching the regular
+            expression at an index of a string, such as its match() method.
+        replacement (str | Callable[[re.Match], str]): Replacement, either a
+            template, as accepted by sub(), or a function returning it.
+        string (str): String to replace matches in.
+        limits (dict[str, int]): Dictionary mapping strings matches start with
+            to the last index matches starting with them can start at.
+
+    Returns:
+        str: String, with matches replaced.
+    """
+    pieces = []
+    position = 0
+    for result in find_matches(match, string, limits):
+        pieces.append(string[position:result.start()])
+        pieces.append(replacement(result) if callable(replacement)
+                      else result.expand(replacement))
+        position = result.end()
+
+    if not pieces:
+        return string
+    pieces.append(string[position:])
+    return "".join(pieces)
+
+
+def get_image_tag(match):
+    """
+    Get the tag an image matched by REGEX_IMAGE is replaced with.
+
+    Args:
+        match (re.Match): Match of REGEX_IMAGE.
+
+    Returns:
+        str: Image tag.
+    """
+    alt_text, url, title = match.groups()
+    return "".join((f'<img src="{url}" alt="{alt_text}"',
+                    f' title="{title}"' if title else "", ">"))
+
+
+def get_link_tag(match):
+    """
+    Get the tag a link matched by REGEX_LINK is replaced with.
+
+    Args:
+        match (re.Match): Match of REGEX_LINK.
+
+    Returns:
+        str: Link tag.
+    """
+    text, url, title = match.groups()
+    return "".join((f'<a href="{url}"', f' title="{title}"' if title else "",
+                    f">{text}</a>"))
+
+
+def get_reference_link_tag(match, references):
+    """
+    Get the tag a reference-style link is replaced with.
+
+    Args:
+        match (re.Match): Match of REGEX_REFERENCE_LINK.
+        references (ReferenceRegistry): Reference-style link definitions.
+
+    Returns:
+        str: Link tag, or the link as it is, if its label is not defined.
+    """
+    text, label = match.groups("")
+    reference = references.get(label or text)
+    if reference is None:
+        return match[0]
+    return "".join((f'<a href="{reference.url}"',
+                    f' title="{reference.title}"' if reference.title else "",
+                    f">{text}</a>"))
 
-    return new_line
 
+def add_links(line, opening, regexes, get_tag):
+    """
+    Replace every link, or every image, in a line with its tag.
+
+    A link can only start before the last "](" that is followed by a ")",
+    and a title can only end at a quote followed by a ")". So links are only
+    tried where they can start, and links after the last place a title can
+    end are matched without one. Otherwise, each link that is never closed,
+    or each quote where a title that never ends could start, would be scanned
+    up to the end of the line.
+
+    Args:
+        line (str): Line to add tags to.
+        opening (str): String links start with, either "[", or "![" for
+            images.
+        regexes (tuple[re.Pattern, re.Pattern]): Regular expression matching
+            links, and regular expression matching links without a title.
+        get_tag (Callable[[re.Match], str]): Function returning the tag a
+            link is replaced with.
 
-def add_inline_tags(line, references):
+    Returns:
+        str: Line, with tags added.
+    """
+    last_parenthesis = line.rfind(")")
+    last_bracket = line.rfind("](", 0, max(last_parenthesis - 1, 0))
+
+    # Find the last quote followed by whitespaces and a ")".
+    title_end = -1
+    parenthesis = last_parenthesis
+    while parenthesis != -1:
+        index = parenthesis - 1
+        while index >= 0 and line[index].isspace():
+            index -= 1
+        if index >= 0 and line[index] in "\"'":
+            title_end = index
+            break
+        parenthesis = line.rfind(")", 0, parenthesis)
+
+    def match(string, start):
+        regex = regexes[0] if start < title_end else regexes[1]
+        return regex.match(string, start)
+
+    return substitute(match, get_tag, line,
+                      {opening: last_bracket - len(opening) - 1})
+
+
+def add_inline_tags(line, references, tracer=None, features=None):
     """
     Add inline tags, such as <em> and <strong>, to a line.
 
+    Each kind of tag is added in a single pass over the line, and passes are
+    skipped entirely when the characters every match of them requires are
+    not present in the line.
+
     Args:
         line (str): Line to add tags to.
-        references (List[Dict]): A list of dictionaries, each containing
-            information about a reference-style link definition.
+        references (ReferenceRegistry): Reference-style link definitions.
+        tracer (Any, optional): Tracer notified of each step, see tracing().
+            Defaults to None.
+        features (int, optional): Features of the line, or of a line it is
+            part of, see get_line_features(). Defaults to None, which gets
+            them from the line.
 
     Returns:
         line (str): Converted line.
     """
+    if features is None:
+        features = get_line_features(line)
+
     # Add emphasis.
     # The order here is important, otherwise "**bold**" would be converted to
     # "*<em>bold</em>*", instead of "<strong>bold</strong>".
-    line = REGEX_BOLD.sub("<strong>\\1\\2</strong>", line)
-    line = REGEX_ITALIC.sub("<em>\\1\\2</em>", line)
+    if tracer is not None:
+        tracer.start("inline_emphasis")
+    if features & FEATURE_EMPHASIS:
+        # A match can only start a few characters before the last closing
+        # delimiter, so delimiters after it are not tried.
+        if "**" in line or "__" in line:
+            line = substitute(
+                REGEX_BOLD.match, "<strong>\\1\\2</strong>", line,
+                {"**": find_last_closing(line, "**", "*") - 3,
+                 "__": find_last_closing(line, "__", "_") - 3})
+        line = substitute(
+            REGEX_ITALIC.match, "<em>\\1\\2</em>", line,
+            {"*": find_last_closing(line, "*", "*") - 2,
+             "_": find_last_closing(line, "_", "_") - 2})
 
     # Add images and links.
     # The order here is important, otherwise images wouldn't work.
-    if REGEX_IMAGE.search(line):
-        matches = REGEX_IMAGE.findall(line)
-        for match in matches:
-            alt_text, url, title = match
-            line = REGEX_IMAGE.sub(
-                f'<img src="{url}" alt="{alt_text}"'
-                + (f' title="{title}"' if title else '')
-                + '>', line, 1)
-    if REGEX_LINK.search(line):
-        matches = REGEX_LINK.findall(line)
-        for match in matches:
-            text, url, title = match
-            line = REGEX_LINK.sub(
-                f'<a href="{url}"'
-                + (f' title="{title}"' if title else '')
-                + f'>{text}</a>', line, 1)
+    if tracer is not None:
+        tracer.end("inline_emphasis")
+        tracer.start("inline_images")
+    if features & FEATURE_IMAGE and "](" in line:
+        if "![" in line:
+            line = add_links(line, "![",
+                             (REGEX_IMAGE, REGEX_IMAGE__WITHOUT_TITLE),
+                             get_image_tag)
+    if tracer is not None:
+        tracer.end("inline_images")
+        tracer.start("inline_links")
+    if features & FEATURE_LINK and "](" in line:
+        line = add_links(line, "[", (REGEX_LINK, REGEX_LINK__WITHOUT_TITLE),
+                         get_link_tag)
 
     # Add reference-style links.
-    if references:
-        matches = REGEX_REFERENCE_LINK.findall(line)
-        for match in matches:
-            text, label = match
-            if not label:
-                label = text
-            for reference in references:
-                if label == reference["label"]:
-                    label, url, title = reference.values()
-                    line = REGEX_REFERENCE_LINK.sub(
-                        f'<a href="{url}"'
-                        + (f' title="{title}"' if title else '')
-                        + f'>{text if text else label}</a>', line, 1)
-                    break
+    if tracer is not None:
+        tracer.end("inline_links")
+        tracer.start("inline_reference_links")
+    if features & FEATURE_LINK and references and "[" in line:
+        # A match can only start before the last "]". Links whose label is not
+        # defined are left as they are.
+        line = substitute(
+            REGEX_REFERENCE_LINK.match,
+            lambda match: get_reference_link_tag(match, references), line,
+            {"[": line.rfind("]") - 2})
 
     # Add quick links.
-    if REGEX_QUICK_LINK.search(line):
-        line = REGEX_QUICK_LINK.sub("<a href=\"\\1\">\\1</a>", line)
+    if tracer is not None:
+        tracer.end("inline_reference_links")
+        tracer.start("inline_quick_links")
+    if "<http" in line:
+        # A quick link can not contain whitespaces, and ends with ">", so each
+        # run of characters that are not whitespaces is only searched up to
+        # its last ">". Otherwise, each "<http" that is never closed would be
+        # scanned up to the end of its run.
+        pieces = REGEX_WHITESPACE.split(line)
+        for index, piece in enumerate(pieces):
+            if "<http" in piece:
+                end = piece.rfind(">") + 1
+                pieces[index] = REGEX_QUICK_LINK.sub(
+                    "<a href=\"\\1\">\\1</a>", piece[:end]) + piece[end:]
+        line = "".join(pieces)
 
     # Add quick links to email addresses.
-    if REGEX_QUICK_EMAIL.search(line):
+    if "@" in line:
         line = REGEX_QUICK_EMAIL.sub("<a href=\"mailto:\\1\">\\1</a>", line)
+    if tracer is not None:
+        tracer.end("inline_quick_links")
     return line
 
 
-def convert(string):
+class Reference:
     """
-    Convert Markdown into HTML.
+    A reference-style link definition.
 
     Args:
-        string (str): Markdown code to be converted.
+        label (str): Label links refer to the definition by.
+        url (str): URL of the link.
+        title (str, optional): Title of the link. Defaults to "".
+    """
 
-    Returns:
-        new_string (str): HTML code.
+    # Definitions are stored without a dictionary for each, since documents
+    # and sites can define thousands of them.
+    __slots__ = ("label", "url", "title")
+
+    def __init__(self, label, url, title=""):
+        self.label = label
+        self.url = url
+        self.title = title
+
+    def __eq__(self, other):
+        if not isinstance(other, Reference):
+            return NotImplemented
+        return ((self.label, self.url, self.title)
+                == (other.label, other.url, other.title))
+
+    def __repr__(self):
+        return f"Reference({self.label!r}, {self.url!r}, {self.title!r})"
+
+
+class ReferenceRegistry:
     """
-    # Store reference-style link definitions.
-    KEYS = ("label", "url", "title")
-    references = [
-        dict(zip(KEYS, i)) for i in REGEX_REFERENCE_DEFINITION.findall(string)]
-    string = REGEX_REFERENCE_DEFINITION.sub("", string)
+    Store reference-style link definitions, looked up by their label.
 
-    if string.strip() == "":
-        return ""
+    When a label is defined more than once, the first definition is kept. A
+    registry can be given a parent registry, such as one holding the
+    definitions of a whole site, whose definitions come first, and which is
+    never modified, so it can be shared by many conversions, and only has to
+    be built once.
 
-    # Convert alternate-style headings to conventional style.
-    string = REGEX_HEADING__ALTERNATIVE_LEVEL_1.sub("# \\1", string)
-    string = REGEX_HEADING__ALTERNATIVE_LEVEL_2.sub("## \\1", string)
+    E.g.:
+        site = ReferenceRegistry([{"label": "home", "url": "/"}])
+        convert("[Home][home]", references=site)
+        convert("[Back home][home]", references=site)
 
-    open_tags = []
-    new_string = ""
-    add_line_break = False
-    open_paragraph = False
-    open_code_block = False
+    Args:
+        references (Iterable[Reference | dict[str, str]], optional):
+            Definitions to add, either as Reference objects or as dictionaries
+            containing a "label", a "url" and, optionally, a "title". Defaults
+            to None.
+        parent (ReferenceRegistry, optional): Registry whose definitions come
+            before the ones of this registry. Defaults to None.
+    """
+
+    def __init__(self, references=None, parent=None):
+        self.parent = parent
+        self._references = {}
+        self._digest = None
+        for reference in references or ():
+            if isinstance(reference, Reference):
+                self.add(reference.label, reference.url, reference.title)
+            else:
+                self.add(reference["label"], reference["url"],
+                         reference.get("title", ""))
 
-    def convert_paragraph(line):
+    def add(self, label, url, title=""):
         """
-        Convert a line into a paragraph.
+        Add a definition, unless its label is already defined.
 
         Args:
-            line (str): Line to convert.
+            label (str): Label links refer to the definition by.
+            url (str): URL of the link.
+            title (str, optional): Title of the link. Defaults to "".
 
         Returns:
-            str: Converted line.
+            None.
         """
-        line = f"{line.strip()} "
-        nonlocal open_paragraph
-        if not open_paragraph:
-            open_paragraph = True
-            return f"<p>{line}"
-        return line
+        if label in self._references:
+            return
+        self._references[label] = Reference(label, url, title)
+        self._digest = None
 
-    # Ensure string ends with a newline to prevent inconsistencies.
-    while string.splitlines()[-1] != "":
-        string += "\n"
+    def get(self, label):
+        """
+        Get the definition of a label.
 
-    for line in string.splitlines():
-        # Ensure line made out of only whitespaces is an empty string, as to
-        # prevent inconsistencies.
-        if line.strip() == "":
-            line = ""
+        Args:
+            label (str): Label to look up.
 
-        new_line = ""
+        Returns:
+            Reference | None: Definition, or None if the label is not
+                defined.
+        """
+        if self.parent is not None:
+            reference = self.parent.get(label)
+            if reference is not None:
+                return reference
+        return self._references.get(label)
 
-        # Add horizontal rules.
-        line = REGEX_HORIZONTAL_RULE.sub("<hr>", line)
+    def digest(self):
+        """
+        Get a digest of every definition, including the ones of the parent,
+        used to tell conversions with different definitions apart in caches.
 
-        # Add code blocks.
-        if line.startswith("    ") and not open_tags:
-            # If a code block is already open, a newline should be added, as to
-            # ensure text is formatted as it was in the input string.
-            new_line += "<pre><code>" if not open_code_block else "\n"
+        Args:
+            None.
 
-            # 4 characters are removed from the start of the line to account
-            # for spaces used to denote a code block.
-            new_line += line[4:]
-            open_code_block = True
-        elif open_code_block:
-            new_line = "</code></pre>"
-            open_code_block = False
+        Returns:
+            bytes: Digest of definitions.
+        """
+        # The digest of the definitions of this registry is kept until a
+        # definition is added, since a shared registry is usually large.
+        if self._digest is None:
+            digest = hashlib.blake2b(digest_size=20)
+            for reference in self._references.values():
+                digest.update(repr(reference).encode("utf-8", "surrogatepass"))
+            self._digest = digest.digest()
+
+        if self.parent is None:
+            return self._digest
+        return hashlib.blake2b(self.parent.digest() + self._digest,
+                               digest_size=20).digest()
+
+    def __iter__(self):
+        if self.parent is not None:
+            yield from self.parent
+        for reference in self._references.values():
+            if self.parent is None or self.parent.get(reference.label) is None:
+                yield reference
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        return bool(self._references) or bool(self.parent)
+
+    def __contains__(self, label):
+        return self.get(label) is not None
+
+    def __eq__(self, other):
+        if not isinstance(other, ReferenceRegistry):
+            return NotImplemented
+        return list(self) == list(other)
+
+
+class StreamingConverter:
+    """
+    Incrementally convert Markdown into HTML.
 
-        # Convert string only if a code block is not open.
-        if not open_code_block:
-            # Add headings.
-            if REGEX_HEADING.search(line):
-                level = len(REGEX_HEADING.search(line)[2])
-                line = REGEX_HEADING.sub(
-                    f"\\1<h{level}>\\3</h{level}>\\4", line)
+    Markdown can be fed in chunks of any size, and HTML is returned as soon as
+    it is known to be final, so a document does not have to be held in memory
+    as a whole before it is converted.
 
-            # Store information about code snippets.
-            code_snippets = []
-            if REGEX_CODE.search(line):
-                matches = ("".join(i or "") for i in REGEX_CODE.findall(line))
-                right = REGEX_CODE.sub("\\1\\2", line)
-                for match in matches:
-                    left, right = right.split(match, 1)
+    Since the document is never seen as a whole, reference-style link
+    definitions are matched one line at a time, and only apply to links that
+    have not been converted yet, unless they are given when creating the
+    converter. Alternate-style headings are handled as convert() does, "="
+    underlines first, then "-" underlines, so up to two lines are held back
+    until the lines after them show whether or not they are headings.
+
+    E.g.:
+        converter = StreamingConverter()
+        converter.feed("# This is a ")      # Returns "".
+        converter.feed("heading.\nThis ")   # Returns "".
+        converter.feed("is a paragraph.\n") # Returns "<h1>...</h1>".
+        converter.close()                   # Returns "<p>...</p>".
+
+    Args:
+        references (ReferenceRegistry | Iterable, optional): Reference-style
+            link definitions that should be available from the start, either
+            as a registry, which is never modified, or as anything accepted by
+            ReferenceRegistry. Defaults to None.
+        sink (Any, optional): Where converted HTML should be passed to as soon
+            as it is ready, instead of being returned by feed() and close().
+            See get_sink_write() for accepted sinks. Defaults to None.
+        tracer (Any, optional): Tracer notified of each stage of conversion,
+            see tracing(). Defaults to None, which uses the tracer installed
+            by tracing(), if any.
+    """
+
+    # Function checking whether or not a line should be enclosed in paragraph
+    # tags, which subclasses can replace, see document.parse().
+    check_paragraph = staticmethod(check_paragraph)
+
+    def __init__(self, references=None, sink=None, tracer=None):
+        # Definitions found while converting are kept apart from the ones
+        # given, so a registry can be shared by many converters.
+        if isinstance(references, ReferenceRegistry):
+            self.references = ReferenceRegistry(parent=references)
+        else:
+            self.references = ReferenceRegistry(references)
+        self.tracer = tracer if tracer is not None else TRACER.get()
+        self._open_tags = NestingStack()
+        self._open_paragraph = False
+        self._open_code_block = False
+        self._add_line_break = False
+
+        # Output is kept in a list, unless a sink is used, and whitespace at
+        # its end is held back until it is known whether or not a paragraph is
+        # closed after it.
+        self._output = []
+        self._sink_write = (
+            get_sink_write(sink) if sink is not None else self._output.append)
+        self._trailing_whitespace = ""
+        self._started = False
+
+        # Input that does not end with a newline yet, last line converted, and
+        # for each style of alternate-style headings, a line held back along
+        # with the empty lines after it, which could still turn out to be a
+        # heading.
+        self._pending = ""
+        self._last_line = None
+        self._held_lines = [None] * len(ALTERNATIVE_HEADING_STYLES)
+        self._held_empty_lines = [[] for _ in ALTERNATIVE_HEADING_STYLES]
+
+    def feed(self, string):
+        """
+        Feed a chunk of Markdown into the converter.
+
+        Args:
+            string (str): Markdown code to be converted.
+
+        Returns:
+            str: HTML code that is ready to be output, or an empty string if a
+                sink is used.
+        """
+        lines = (self._pending + string).splitlines(True)
+        self._pending = ""
+
+        # The last line may continue in the next chunk. A carriage return is
+        # held back too, since it may be followed by a newline.
+        if lines and (lines[-1].endswith("\r")
+                      or lines[-1].splitlines()[0] == lines[-1]):
+            self._pending = lines.pop()
+
+        for line in lines:
+            self._feed_line(line.splitlines()[0])
+        return self._collect()
+
+    def close(self):
+        """
+        Close the converter, converting any Markdown left.
+
+        Args:
+            None.
+
+        Returns:
+            str: HTML code that is ready to be output, including tags left
+                open, or an empty string if a sink is used.
+        """
+        if self._pending:
+            self._feed_line(self._pending.splitlines()[0])
+            self._pending = ""
+        for index in range(len(ALTERNATIVE_HEADING_STYLES)):
+            self._release_held_line(index)
+
+        # Ensure input ends with an empty line to close open tags.
+        if self._last_line != "":
+            self.convert_line("")
+
+        self._trailing_whitespace = ""
+        return self._collect()
+
+    def _feed_line(self, line):
+        """
+        Store reference-style link definitions present in a line, then pass
+        it on to be checked for alternate-style headings.
+
+        Args:
+            line (str): Line to convert, without a line ending.
+
+        Returns:
+            None.
+        """
+        tracer = self.tracer
+
+        # Store reference-style link definitions, and handle them as an empty
+        # line, as it is done when converting a whole string.
+        if tracer is not None:
+            tracer.start("references")
+        match = match_reference_definition(line)
+        if match:
+            self.references.add(*match.groups(""))
+            line = ""
+        if tracer is not None:
+            tracer.end("references")
+
+        self._feed_heading_line(0, line)
+
+    def _feed_heading_line(self, index, line):
+        """
+        Convert alternate-style headings of one style to conventional style,
+        one line at a time, then pass lines on to the next style, or convert
+        them after the last style.
+
+        This gives the same result as convert_alternative_headings(), which
+        handles every style over the whole document before the next one, so
+        a line is held back for each style, until the next line which is not
+        made out of only whitespaces shows whether or not it is a heading.
+        A line held back for the next style is released as soon as the line
+        held back after it can not turn out to underline it.
+
+        Args:
+            index (int): Index of style in ALTERNATIVE_HEADING_STYLES.
+            line (str): Line to convert, without a line ending.
+
+        Returns:
+            None.
+        """
+        held_line = self._held_lines[index]
+        if held_line is None:
+            if line:
+                self._hold_line(index, line)
+            else:
+                self._pass_line(index, line)
+            return
+
+        if not line.strip():
+            self._held_empty_lines[index].append(line)
+            return
+
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.start("alternative_headings")
+        character, prefix = ALTERNATIVE_HEADING_STYLES[index]
+        underline = line.lstrip()
+        is_heading = len(underline) >= 2 and not underline.strip(character)
+        if tracer is not None:
+            tracer.end("alternative_headings")
+
+        if is_heading:
+            self._held_lines[index] = None
+            self._held_empty_lines[index] = []
+            self._pass_line(index, prefix + held_line)
+            return
+        self._release_held_line(index)
+        self._hold_line(index, line)
+
+    def _hold_line(self, index, line):
+        """
+        Hold back a line for a style of alternate-style headings.
+
+        Whether it is passed on as it is or as a heading, the line is not made
+        out of only whitespaces, so unless it can underline a heading of the
+        next style, the line held back for that style is not a heading.
+
+        Args:
+            index (int): Index of style in ALTERNATIVE_HEADING_STYLES.
+            line (str): Line to hold back, without a line ending.
+
+        Returns:
+            None.
+        """
+        self._held_lines[index] = line
+        if index + 1 < len(ALTERNATIVE_HEADING_STYLES) and line.strip():
+            character = ALTERNATIVE_HEADING_STYLES[index + 1][0]
+            underline = line.lstrip()
+            if len(underline) < 2 or underline.strip(character):
+                self._release_held_line(index + 1)
+
+    def _pass_line(self, index, line):
+        """
+        Pass a line on to the next style of alternate-style headings, or
+        convert it after the last style.
+
+        Args:
+            index (int): Index of style in ALTERNATIVE_HEADING_STYLES.
+            line (str): Line to pass on, without a line ending.
+
+        Returns:
+            None.
+        """
+        if index + 1 < len(ALTERNATIVE_HEADING_STYLES):
+            self._feed_heading_line(index + 1, line)
+        else:
+            self.convert_line(line)
+
+    def _release_held_line(self, index):
+        """
+        Pass on the line held back for a style of alternate-style headings,
+        and the empty lines after it.
+
+        Args:
+            index (int): Index of style in ALTERNATIVE_HEADING_STYLES.
+
+        Returns:
+            None.
+        """
+        held_line = self._held_lines[index]
+        if held_line is not None:
+            empty_lines = self._held_empty_lines[index]
+            self._held_lines[index] = None
+            self._held_empty_lines[index] = []
+            self._pass_line(index, held_line)
+            for line in empty_lines:
+                self._pass_line(index, line)
+
+    def get_state(self):
+        """
+        Get the state carried from one line to the next, such as tags left
+        open, so conversion can be resumed from it later.
+
+        Args:
+            None.
+
+        Returns:
+            tuple: State of the converter. It should only be compared to other
+                states, or passed to set_state().
+        """
+        return (tuple(self._open_tags), self._open_paragraph,
+                self._open_code_block, self._add_line_break,
+                self._trailing_whitespace, self._started)
+
+    def set_state(self, state):
+        """
+        Resume conversion from a state returned by get_state().
+
+        Args:
+            state (tuple): State of a converter.
+
+        Returns:
+            None.
+        """
+        (open_tags, self._open_paragraph, self._open_code_block,
+         self._add_line_break, self._trailing_whitespace,
+         self._started) = state
+        self._open_tags = NestingStack(open_tags)
+
+    def _collect(self):
+        """
+        Return and clear output that is ready.
+
+        Args:
+            None.
+
+        Returns:
+            str: HTML code.
+        """
+        output = "".join(self._output)
+        self._output.clear()
+        return output
+
+    def _write(self, string):
+        """
+        Add a converted line to the output.
+
+        Args:
+            string (str): Converted line.
+
+        Returns:
+            None.
+        """
+        content = string.rstrip()
+        if not content:
+            self._trailing_whitespace += string
+            return
+
+        if self._started:
+            self._sink_write(self._trailing_whitespace + content)
+        else:
+            self._sink_write(content.lstrip())
+            self._started = True
+        self._trailing_whitespace = string[len(content):]
+
+    def _convert_paragraph(self, line):
+        """
+        Convert a line into a paragraph.
+
+        Args:
+            line (str): Line to convert.
+
+        Returns:
+            str: Converted line.
+        """
+        line = f"{line.strip()} "
+        if not self._open_paragraph:
+            self._open_paragraph = True
+            return f"<p>{line}"
+        return line
+
+    def convert_line(self, line):
+        """
+        Convert a single line, without storing reference-style link
+        definitions or handling alternate-style headings.
+
+        Args:
+            line (str): Line to convert.
+
+        Returns:
+            None.
+        """
+        references = self.references
+        open_tags = self._open_tags
+        tracer = self.tracer
+        is_paragraph = self.check_paragraph
+        self._last_line = line
+
+        # Ensure line made out of only whitespaces is an empty string, as to
+        # prevent inconsistencies.
+        if line.strip() == "":
+            line = ""
+
+        new_line = ""
+        features = get_line_features(line)
+
+        # Add horizontal rules.
+        if tracer is not None:
+            tracer.start("horizontal_rules")
+        if features & FEATURE_HORIZONTAL_RULE:
+            line = REGEX_HORIZONTAL_RULE.sub("<hr>", line)
+
+        # Add code blocks.
+        if tracer is not None:
+            tracer.end("horizontal_rules")
+            tracer.start("code_blocks")
+        if line.startswith("    ") and not open_tags:
+            # If a code block is already open, a newline should be added, as to
+            # ensure text is formatted as it was in the input string.
+            new_line += "<pre><code>" if not self._open_code_block else "\n"
+
+            # 4 characters are removed from the start of the line to account
+            # for spaces used to denote a code block.
+            new_line += line[4:]
+            self._open_code_block = True
+        elif self._open_code_block:
+            new_line = "</code></pre>"
+            self._open_code_block = False
+        if tracer is not None:
+            tracer.end("code_blocks")
+
+        # Convert string only if a code block is not open.
+        if not self._open_code_block:
+            # Add headings.
+            if tracer is not None:
+                tracer.start("headings")
+            if features & FEATURE_HEADING and REGEX_HEADING.search(line):
+                level = len(REGEX_HEADING.search(line)[2])
+                line = REGEX_HEADING.sub(
+                    f"\\1<h{level}>\\3</h{level}>\\4", line)
+
+            # Store information about code snippets.
+            if tracer is not None:
+                tracer.end("headings")
+                tracer.start("code_spans")
+            code_snippets = []
+            if features & FEATURE_CODE:
+                # A code snippet can only start two characters before the
+                # last "`" that is not escaped.
+                last = line.rfind("`")
+                while last > 0 and line[last - 1] == "\\":
+                    last = line.rfind("`", 0, last - 1)
+
+                # Backticks around code snippets are removed from the line.
+                contents = []
+                pieces = []
+                position = 0
+                for match in find_matches(
+                        REGEX_CODE.match, line, {"`": last - 2}):
+                    contents.append("".join(match.groups("")))
+                    pieces += (line[position:match.start()], contents[-1])
+                    position = match.end()
+                right = "".join(pieces) + line[position:]
+
+                # Then the text before each code snippet is stored, searching
+                # from where the last one ended, instead of copying what is
+                # left of the line for each of them.
+                position = 0
+                for content in contents:
+                    index = right.find(content, position)
                     code_snippets.append(
-                        {"left": left, "content": match, "right": right})
+                        {"left": right[position:index], "content": content})
+                    position = index + len(content)
+                right = right[position:]
+            if tracer is not None:
+                tracer.end("code_spans")
 
             # Add code snippets and inline tags.
             if code_snippets:
-                line = ""
-                for block in code_snippets:
-                    left = add_inline_tags(block["left"], references)
-                    line += left + f"<code>{block['content']}</code>"
-                    if block == code_snippets[-1]:
-                        line += add_inline_tags(block["right"], references)
+                line = "".join(
+                    add_inline_tags(block["left"], references, tracer,
+                                    features)
+                    + f"<code>{block['content']}</code>"
+                    for block in code_snippets)
+                line += add_inline_tags(right, references, tracer, features)
             else:
-                line = add_inline_tags(line, references)
+                line = add_inline_tags(line, references, tracer, features)
 
             # Check if line contains nested tags, if so, open tags.
-            if any(tag["regex"].fullmatch(line) for tag in NESTED_TAGS):
-                for tag in NESTED_TAGS:
-                    if tag["regex"].fullmatch(line):
-                        new_line += convert_nested_tag(line, tag, open_tags)
-
-            # If not, check if there are open tags, if so, close them. After
-            # doing so, check whether the line is a paragraph and add it
-            # accordingly.
-            elif open_tags:
-                for tag in reversed(open_tags):
-                    new_line += tag[0]["outer_closing_tag"]
-                    open_tags.remove(tag)
-                if check_paragraph(line):
-                    new_line += convert_paragraph(line)
+            if tracer is not None:
+                tracer.start("nested_tags")
+            nested_tags = [
+                tag for tag in NESTED_TAGS if tag.regex.fullmatch(line)
+            ] if features & FEATURE_NESTED_TAG else []
+            for tag in nested_tags:
+                new_line += convert_nested_tag(line, tag, open_tags,
+                                               is_paragraph)
+
+            # If not, check if there are open tags, if so, close them.
+            if not nested_tags:
+                new_line += open_tags.close_all()
+            if tracer is not None:
+                tracer.end("nested_tags")
+                tracer.start("paragraphs")
+
+            # After doing so, check if line is a paragraph, if so, open a
+            # paragraph. If not, just add the line as it is.
+            if not nested_tags:
+                if is_paragraph(line):
+                    new_line += self._convert_paragraph(line)
                 else:
                     new_line += line
 
-            # If not, check if line is a paragraph, if so, open a paragraph.
-            elif check_paragraph(line):
-                new_line += convert_paragraph(line)
-
-            # If not, just add the line as it is.
-            else:
-                new_line += line
-
             # Escape characters.
-            if REGEX_ESCAPED_CHARACTER.search(new_line):
+            if tracer is not None:
+                tracer.end("paragraphs")
+                tracer.start("escapes")
+            if "\\" in new_line:
                 new_line = REGEX_ESCAPED_CHARACTER.sub("\\1", new_line)
+            if tracer is not None:
+                tracer.end("escapes")
 
             # Add line breaks.
-            if add_line_break:
+            if self._add_line_break:
                 new_line = f"<br>{new_line}"
-                add_line_break = False
+                self._add_line_break = False
 
             # Check if a line break should be added.
             if line.lstrip().endswith("  "):
                 new_line = new_line.rstrip()
-                add_line_break = True
-
-        # Close paragraph.
-        if open_paragraph and not check_paragraph(new_line):
-            open_paragraph = False
-            new_string = new_string.rstrip()
+                self._add_line_break = True
+
+        # Close paragraph. Whitespace held back at the end of the output is
+        # dropped, so the closing tag comes right after the paragraph content.
+        if tracer is not None:
+            tracer.start("paragraphs")
+        if self._open_paragraph and not is_paragraph(new_line):
+            self._open_paragraph = False
+            self._trailing_whitespace = ""
             new_line = f"</p>{new_line}"
+        if tracer is not None:
+            tracer.end("paragraphs")
+
+        self._write(new_line)
+
+
+class ConversionCache:
+    """
+    Store results of conversions in memory, so converting the same Markdown
+    code again does not have to go through the whole conversion.
+
+    Results are keyed by a digest of the Markdown code, which includes any
+    reference-style link definitions, along with a digest of the shared
+    definitions used, if any, so changing them changes the key. The
+    least recently used results are evicted once the total size of results
+    stored would exceed a maximum size. The cache can be shared by multiple
+    threads.
+
+    E.g.:
+        cache = ConversionCache(max_size=16 * 1024 * 1024)
+        convert(string, cache=cache)    # Converts string.
+        convert(string, cache=cache)    # Returns stored result.
+        cache.stats()["hits"]           # Returns 1.
+
+    Args:
+        max_size (int, optional): Maximum total size of results stored, in
+            bytes. Defaults to 64 MiB.
+    """
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(string, references=None):
+        """
+        Get the key a conversion result is stored under.
+
+        Args:
+            string (str | bytes): Markdown code, or Markdown code encoded as
+                UTF-8, which is stored under the same key.
+            references (ReferenceRegistry, optional): Reference-style link
+                definitions shared by many documents. Defaults to None.
+
+        Returns:
+            bytes: Digest of Markdown code and definitions.
+        """
+        if isinstance(string, str):
+            string = string.encode("utf-8", "surrogatepass")
+        digest = hashlib.blake2b(string, digest_size=20)
+        if references:
+            digest.update(references.digest())
+        return digest.digest()
+
+    def get(self, key):
+        """
+        Get a conversion result, marking it as recently used.
+
+        Args:
+            key (bytes): Key the result is stored under.
+
+        Returns:
+            str | None: HTML code, or None if no result is stored under key.
+        """
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """
+        Store a conversion result, evicting least recently used results if
+        required.
 
-        new_string += new_line
-    return new_string.strip()
+        Args:
+            key (bytes): Key to store result under.
+            result (str): HTML code.
+
+        Returns:
+            None.
+        """
+        size = len(key) + sys.getsizeof(result)
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._results:
+                return
+            self._results[key] = result
+            self.size += size
+            while self.size > self.max_size:
+                key, result = self._results.popitem(last=False)
+                self.size -= len(key) + sys.getsizeof(result)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Remove every result stored, and reset counters.
+
+        Args:
+            None.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._results.clear()
+            self.size = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Get counters describing how the cache has been used.
+
+        Args:
+            None.
+
+        Returns:
+            dict[str, int]: Dictionary containing number of hits, misses and
+                evictions, number of results stored, and their total size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "results": len(self._results),
+                "size": self.size,
+            }
+
+
+# Cache used by convert() when no cache is given, see set_default_cache().
+DEFAULT_CACHE = None
+
+
+def set_default_cache(cache):
+    """
+    Set the cache used by convert() when no cache is given.
+
+    E.g.:
+        set_default_cache(ConversionCache())    # Enables caching.
+        set_default_cache(None)                 # Disables caching.
+
+    Args:
+        cache (ConversionCache | None): Cache to use, or None to disable
+            caching by default.
+
+    Returns:
+        None.
+    """
+    global DEFAULT_CACHE
+    DEFAULT_CACHE = cache
+
+
+# Tracer installed by tracing(), kept per context, so installing one in a
+# thread or task does not affect conversions running in others.
+TRACER = contextvars.ContextVar("TRACER", default=None)
+
+
+@contextlib.contextmanager
+def tracing(tracer):
+    """
+    Install a tracer used by conversions that run inside a "with" block, and
+    that are not given a tracer explicitly.
+
+    A tracer is any object with start() and end() methods, which are called
+    with the name of each stage of conversion before and after it runs. The
+    stages are, in order: "references" and "alternative_headings", which run
+    once for the whole document, then, for each line, "horizontal_rules",
+    "code_blocks", "headings", "code_spans", the steps of add_inline_tags(),
+    which are "inline_emphasis", "inline_images", "inline_links",
+    "inline_reference_links" and "inline_quick_links", then "nested_tags",
+    "paragraphs" and "escapes". When no tracer is used, stages are not
+    reported at all, so tracing costs nothing more than a few comparisons.
+
+    E.g.:
+        timer = StageTimer()
+        with tracing(timer):
+            convert(string)
+        timer.totals["headings"]    # Returns [calls, seconds].
+
+    Args:
+        tracer (Any): Tracer to install.
+
+    Yields:
+        Any: The tracer installed.
+    """
+    token = TRACER.set(tracer)
+    try:
+        yield tracer
+    finally:
+        TRACER.reset(token)
+
+
+class StageTimer:
+    """
+    Tracer which measures the time spent in each stage of conversion.
+
+    See tracing() for how tracers are used.
+
+    Attributes:
+        totals (dict[str, list[int | float]]): Dictionary mapping names of
+            stages to a list containing the number of times each ran, and the
+            total time spent in it, in seconds.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._starts = {}
+
+    def start(self, stage):
+        """
+        Mark the start of a stage.
+
+        Args:
+            stage (str): Name of stage.
+
+        Returns:
+            None.
+        """
+        self._starts[stage] = time.perf_counter()
+
+    def end(self, stage):
+        """
+        Mark the end of a stage, adding the time spent in it to its total.
+
+        Args:
+            stage (str): Name of stage.
+
+        Returns:
+            None.
+        """
+        elapsed = time.perf_counter() - self._starts.pop(stage)
+        total = self.totals.setdefault(stage, [0, 0.0])
+        total[0] += 1
+        total[1] += elapsed
+
+
+def get_sink_write(sink):
+    """
+    Get a function that passes converted HTML to a sink.
+
+    Args:
+        sink (Any): Where converted HTML should be passed to. Either a list,
+            which strings are appended to, an object with a write() method
+            that accepts strings, such as an io.StringIO, an open file or a
+            socket file, or any other callable that accepts a string.
+
+    Returns:
+        Callable[[str], Any]: Function that passes a string to the sink.
+    """
+    if isinstance(sink, list):
+        return sink.append
+    if hasattr(sink, "write"):
+        return sink.write
+    return sink
+
+
+def convert_alternative_headings(string):
+    """
+    Convert alternate-style headings in a document to conventional style.
+
+    This gives the same result as replacing every match of
+    REGEX_HEADING__ALTERNATIVE_LEVEL_1 with "# \\1", then every match of
+    REGEX_HEADING__ALTERNATIVE_LEVEL_2 with "## \\1", but in linear time.
+    Done with regular expressions, each line would be scanned again for
+    every whitespace-only line after it, since whitespaces before the "="
+    or "-" characters can span multiple lines.
+
+    E.g.:
+        "Heading\n\n  ==\nParagraph"
+        Becomes:
+        "# Heading\nParagraph"
+
+    Args:
+        string (str): Markdown code.
+
+    Returns:
+        str: Markdown code, with alternate-style headings converted.
+    """
+    lines = string.split("\n")
+    for character, prefix in ALTERNATIVE_HEADING_STYLES:
+        if character * 2 not in string:
+            continue
+
+        # Index of the first line after each line which is not made out of
+        # only whitespaces, found going backwards.
+        next_lines = [None] * len(lines)
+        next_line = None
+        for index in range(len(lines) - 1, -1, -1):
+            next_lines[index] = next_line
+            if lines[index].strip():
+                next_line = index
+
+        new_lines = []
+        index = 0
+        while index < len(lines):
+            line = lines[index]
+            next_line = next_lines[index]
+            if line and next_line is not None:
+                underline = lines[next_line].lstrip()
+                if len(underline) >= 2 and not underline.strip(character):
+                    new_lines.append(prefix + line)
+                    index = next_line + 1
+                    continue
+            new_lines.append(line)
+            index += 1
+        lines = new_lines
+    return "\n".join(lines)
+
+
+def match_reference_definition(string, position=0):
+    """
+    Match a reference-style link definition at an index of a string.
+
+    A title can only end at the last character of a line that is not a
+    whitespace, and a definition spans a few lines at most, so definitions
+    are matched without a title when none of the next lines can end one.
+    Otherwise, each quote where a title that never ends could start would be
+    scanned up to the end of the line.
+
+    Args:
+        string (str): String to match in.
+        position (int, optional): Index to match at, which must be at a line
+            start. Defaults to 0.
+
+    Returns:
+        re.Match: Match, or None if there is no definition at the index.
+    """
+    regex = REGEX_REFERENCE_DEFINITION__WITHOUT_TITLE
+    start = position
+    lines = 0
+    while start <= len(string) and lines < 10:
+        end = string.find("\n", start)
+        if end == -1:
+            end = len(string)
+        line = string[start:end].rstrip()
+        if line:
+            if line[-1] in "\"')":
+                regex = REGEX_REFERENCE_DEFINITION
+                break
+            lines += 1
+        start = end + 1
+    return regex.match(string, position)
+
+
+def find_reference_definitions(string):
+    """
+    Find every reference-style link definition in a string, as finditer()
+    does with REGEX_REFERENCE_DEFINITION.
+
+    A definition can only start at a line start followed by whitespaces and
+    a "[", so only those are tried, each with match_reference_definition().
+
+    Args:
+        string (str): String to search in.
+
+    Yields:
+        re.Match: Match found.
+    """
+    position = 0
+    bracket = string.find("[")
+    while bracket != -1:
+        # Find the first line start before the "[", which is only followed by
+        # whitespaces, not going back past the end of the last match.
+        start = bracket
+        while start > position and string[start - 1].isspace():
+            start -= 1
+        if start != 0 and string[start - 1] != "\n":
+            start = string.find("\n", start, bracket) + 1 or None
+
+        match = None if start is None else match_reference_definition(
+            string, start)
+        if match:
+            yield match
+            position = match.end()
+            bracket = string.find("[", position)
+        else:
+            bracket = string.find("[", bracket + 1)
+
+
+def split_document(string, tracer=None, references=None, close=True):
+    """
+    Split a document into lines ready to be converted one at a time.
+
+    Reference-style link definitions are stored and removed, and
+    alternate-style headings are converted to conventional style, since both
+    require the whole document to be known. An empty line is added to the end
+    of the document, if required, so open tags are closed.
+
+    Args:
+        string (str): Markdown code.
+        tracer (Any, optional): Tracer notified of each stage, see tracing().
+            Defaults to None.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, which come before the ones
+            in the document, and are not modified. Defaults to None.
+        close (bool, optional): Whether or not string is the end of the
+            document, in which case an empty line is added. Defaults to True.
+
+    Returns:
+        tuple[ReferenceRegistry, list[str]]: Reference-style link
+            definitions, and lines to convert, which is an empty list if there
+            is nothing to convert.
+    """
+    # Store reference-style link definitions.
+    if tracer is not None:
+        tracer.start("references")
+    references = ReferenceRegistry(parent=references)
+    pieces = []
+    position = 0
+    for match in find_reference_definitions(string):
+        references.add(*match.groups(""))
+        pieces.append(string[position:match.start()])
+        position = match.end()
+    if pieces:
+        string = "".join(pieces) + string[position:]
+    if tracer is not None:
+        tracer.end("references")
+
+    if string.strip() == "":
+        return references, []
+
+    # Convert alternate-style headings to conventional style.
+    if tracer is not None:
+        tracer.start("alternative_headings")
+    string = convert_alternative_headings(string)
+    if tracer is not None:
+        tracer.end("alternative_headings")
+
+    # Ensure string ends with an empty line to close open tags.
+    lines = string.splitlines()
+    if close and lines[-1] != "":
+        lines.append("")
+    return references, lines
+
+
+def convert_into(string, sink, tracer=None, references=None):
+    """
+    Convert Markdown into HTML, passing HTML to a sink as it is converted.
+
+    Args:
+        string (str): Markdown code to be converted.
+        sink (Any): Where converted HTML should be passed to. See
+            get_sink_write() for accepted sinks.
+        tracer (Any, optional): Tracer notified of each stage of conversion,
+            see tracing(). Defaults to None, which uses the tracer installed
+            by tracing(), if any.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+
+    Returns:
+        None.
+    """
+    if tracer is None:
+        tracer = TRACER.get()
+    references, lines = split_document(string, tracer, references)
+    if not lines:
+        return
+
+    converter = StreamingConverter(references, sink, tracer)
+    for line in lines:
+        converter.convert_line(line)
+    converter.close()
+
+
+def convert(string, cache=None, tracer=None, references=None):
+    """
+    Convert Markdown into HTML.
+
+    Args:
+        string (str): Markdown code to be converted.
+        cache (ConversionCache | bool, optional): Cache to store results in
+            and reuse them from, or False to not use a cache. Defaults to
+            None, which uses the cache set by set_default_cache(), if any.
+        tracer (Any, optional): Tracer notified of each stage of conversion,
+            see tracing(). Defaults to None, which uses the tracer installed
+            by tracing(), if any. Results reused from the cache are not
+            traced.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+
+    Returns:
+        str: HTML code.
+    """
+    if cache is None:
+        cache = DEFAULT_CACHE
+    if cache:
+        key = cache.get_key(string, references)
+        html = cache.get(key)
+        if html is not None:
+            return html
+
+    output = []
+    convert_into(string, output, tracer, references)
+    html = "".join(output)
+
+    if cache:
+        cache.put(key, html)
+    return html
+
+
+def convert_bytes(data, encoding="utf-8", cache=None, tracer=None,
+                  references=None):
+    """
+    Convert encoded Markdown into encoded HTML.
+
+    HTML is encoded using the same encoding as Markdown. When it is UTF-8 and
+    a cache is used, results are looked up in the cache using data as it is,
+    since keys are computed from UTF-8 anyway, so data is not decoded when
+    its result is reused from the cache. Otherwise, without a cache, when the
+    result is not in the cache, or with any other encoding, data is decoded
+    and converted, exactly as with convert(). HTML is encoded either way.
+
+    Args:
+        data (bytes): Markdown code to be converted, or any other bytes-like
+            object, such as a bytearray, a memoryview or an mmap.
+        encoding (str, optional): Encoding of Markdown code, and of HTML
+            code returned. Defaults to "utf-8".
+        cache (ConversionCache | bool, optional): Cache to store results in
+            and reuse them from, or False to not use a cache. Defaults to
+            None, which uses the cache set by set_default_cache(), if any.
+        tracer (Any, optional): Tracer notified of each stage of conversion,
+            see tracing(). Defaults to None, which uses the tracer installed
+            by tracing(), if any.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+
+    Returns:
+        bytes: HTML code.
+    """
+    if cache is None:
+        cache = DEFAULT_CACHE
+    if not cache or codecs.lookup(encoding).name != "utf-8":
+        return convert(str(data, encoding), cache, tracer,
+                       references).encode(encoding)
+
+    key = cache.get_key(data, references)
+    html = cache.get(key)
+    if html is None:
+        html = convert(str(data, encoding), False, tracer, references)
+        cache.put(key, html)
+    return html.encode(encoding)
+
+
+def is_safe_cut(lines, cut):
+    """
+    Check whether a document can be split before a line, as described in
+    split_into_pieces().
+
+    Args:
+        lines (list[str]): Lines of Markdown code, including line breaks,
+            which must include the 10 lines which are not empty after cut.
+        cut (int): Index of line to split before.
+
+    Returns:
+        bool: True if the document can be split before the line, False
+            otherwise.
+    """
+    # Lines which could underline an alternate-style heading, or start a
+    # reference-style link definition, are kept with the lines before them.
+    stripped = lines[cut].strip()
+    if not stripped or not stripped.strip("=") or not stripped.strip("-"):
+        return False
+    if stripped[0] == "[" and match_reference_definition(
+            "".join(lines[cut:])):
+        return False
+
+    # Find where the 10 previous lines which are not empty start, since that
+    # is the most a reference-style link definition spans.
+    first = cut
+    count = 0
+    while first and count < 10:
+        first -= 1
+        if lines[first].strip():
+            count += 1
+    string = "".join(lines[first:])
+    position = 0
+    end = len("".join(lines[first:cut]))
+    for line in lines[first:cut]:
+        if line.lstrip().startswith("["):
+            match = match_reference_definition(string, position)
+            # Definitions also include the empty lines after them.
+            if match and not string[match.end():end].strip():
+                return False
+        position += len(line)
+    return True
+
+
+def split_into_pieces(lines, size=65536):
+    """
+    Join lines of a document into pieces of about a given size, which are
+    split by split_document() exactly as the whole document would be.
+
+    A document is only split before a line which is not empty, is not made
+    out of only "=" or only "-", so no alternate-style heading is split, and
+    does not start a reference-style link definition. Since no definition
+    before that line may reach it either, this is checked once the next 10
+    lines which are not empty are known.
+
+    Args:
+        lines (Iterable[str]): Lines of Markdown code, split at "\n" only,
+            including line breaks.
+        size (int, optional): Minimum length of each piece, except the last
+            one. Pieces are longer if they can not be split earlier. Defaults
+            to 65536.
+
+    Yields:
+        str: Piece of Markdown code, ending with a line break, except the last
+            one.
+    """
+    piece = []
+    length = 0
+    # Indexes of lines which are not empty, which the document could be split
+    # before.
+    cuts = deque()
+    for line in lines:
+        if length >= size and line.strip():
+            cuts.append(len(piece))
+        piece.append(line)
+        length += len(line)
+        if len(cuts) > 10:
+            cut = cuts.popleft()
+            if is_safe_cut(piece, cut):
+                yield "".join(piece[:cut])
+                del piece[:cut]
+                length = sum(map(len, piece))
+                cuts.clear()
+    yield "".join(piece)
+
+
+def convert_lines(lines, references=None):
+    """
+    Convert a document one piece at a time, keeping memory usage close to the
+    size of the output. Results are the same as converting the whole document
+    with convert().
+
+    Converted lines are joined into larger chunks every now and then, since
+    each string stored carries a fixed overhead.
+
+    Args:
+        lines (Callable[[], Iterable[str]]): Function returning lines of
+            Markdown code, split at "\n" only, including line breaks. It is
+            called twice, since reference-style link definitions are collected
+            from the whole document first.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+
+    Returns:
+        str: HTML code.
+    """
+    # Store reference-style link definitions.
+    references = ReferenceRegistry(parent=references)
+    for piece in split_into_pieces(lines()):
+        for match in find_reference_definitions(piece):
+            references.add(*match.groups(""))
+
+    output = []
+    chunk = []
+
+    def write(string):
+        chunk.append(string)
+        if len(chunk) == 4096:
+            output.append("".join(chunk))
+            chunk.clear()
+
+    converter = StreamingConverter(references, write)
+    pieces = split_into_pieces(lines())
+    piece = next(pieces)
+    for next_piece in pieces:
+        for line in split_document(piece, references=references,
+                                   close=False)[1]:
+            converter.convert_line(line)
+        piece = next_piece
+    document_lines = split_document(piece, references=references)[1]
+    if not document_lines:
+        return ""
+    for line in document_lines:
+        converter.convert_line(line)
+    converter.close()
+    return "".join(output) + "".join(chunk)
 
 
-def convert_file(file):
+def convert_file(file, memory_map=False, references=None, encoding=None):
     """
     Open a Markdown file and return converted results.
 
     Args:
         file (TextIO): Markdown file to be converted.
+        memory_map (bool, optional): Whether or not the file should be mapped
+            into memory and converted one piece at a time, instead of being
+            read as a whole. This keeps memory usage close to the size of the
+            output, and is meant for very large files. Results are the same
+            either way, see convert_lines(). Defaults to False.
+        references (ReferenceRegistry, optional): Reference-style link
+            definitions shared by many documents, see ReferenceRegistry.
+            Defaults to None.
+        encoding (str, optional): Encoding of file. Defaults to None, which
+            uses the preferred encoding of the locale, as open() does.
 
     Returns:
         str: HTML code.
     """
-    with open(file) as f:
-        return convert(f.read())
+    if not memory_map:
+        with open(file, encoding=encoding) as f:
+            return convert(f.read(), references=references)
+
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+
+    # Lines can only be found in mapped bytes if "\n" is encoded as it is in
+    # ASCII, so files using other encodings, such as UTF-16, are read one line
+    # at a time instead, which keeps memory usage just as low.
+    if "\n".encode(encoding) != b"\n":
+        with open(file, encoding=encoding) as f:
+            def read_lines():
+                f.seek(0)
+                return f
+
+            return convert_lines(read_lines, references)
+
+    with open(file, "rb") as f:
+        # Empty files can not be mapped into memory.
+        if not os.fstat(f.fileno()).st_size:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            def decode_lines():
+                start = 0
+                while start < len(mapped):
+                    end = mapped.find(b"\n", start) + 1 or len(mapped)
+                    line = mapped[start:end].decode(encoding)
+                    start = end
+                    if "\r" not in line:
+                        yield line
+                        continue
+                    # Translate line breaks as open() does.
+                    *pieces, last = line.replace("\r\n", "\n").replace(
+                        "\r", "\n").split("\n")
+                    for piece in pieces:
+                        yield piece + "\n"
+                    if last:
+                        yield last
+
+            return convert_lines(decode_lines, references)
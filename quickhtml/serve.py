@@ -0,0 +1,339 @@
+"""This file contains functionality to serve a directory of Markdown files as HTML, converting them on request."""
+
+import hashlib
+import io
+import locale
+import os
+import threading
+import urllib.parse
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from quickhtml import __version__
+from quickhtml.quickhtml import convert, convert_into
+
+# Pages whose Markdown code is at least this large are sent in chunks of this
+# size, as they are converted, instead of being converted as a whole first.
+CHUNK_SIZE = 64 * 1024
+
+
+def get_markdown_path(directory, url_path):
+    """
+    Get the path to the Markdown file a URL path refers to.
+
+    Paths ending with ".html" refer to the Markdown file of the same name,
+    paths ending with "/" refer to the "index.md" file of a directory, and
+    paths without an extension refer to a Markdown file as well.
+
+    Args:
+        directory (str): Directory being served.
+        url_path (str): Path part of a URL, which may be percent-encoded.
+
+    Returns:
+        str | None: Path to Markdown file, or None if it would be outside the
+            directory.
+    """
+    relative = urllib.parse.unquote(url_path).lstrip("/")
+    if relative == "" or relative.endswith("/"):
+        relative += "index.md"
+    elif relative.endswith(".html"):
+        relative = relative[:-len(".html")] + ".md"
+    elif not relative.endswith(".md"):
+        relative += ".md"
+
+    directory = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(directory, relative))
+    if os.path.commonpath((directory, path)) != directory:
+        return None
+    return path
+
+
+def get_etag(data):
+    """
+    Get a strong entity tag for the HTML code converted from Markdown code.
+
+    Conversion always gives the same HTML code for the same Markdown code and
+    version of QuickHTML, so the tag is known before converting.
+
+    Args:
+        data (bytes): Markdown code, as read from a file.
+
+    Returns:
+        str: Entity tag, quoted.
+    """
+    digest = hashlib.blake2b(data, digest_size=16)
+    digest.update(__version__.encode())
+    return f"\"{digest.hexdigest()}\""
+
+
+def match_etag(header, etag):
+    """
+    Check whether or not an "If-None-Match" header matches an entity tag.
+
+    Args:
+        header (str | None): Value of header, if sent.
+        etag (str): Entity tag, quoted.
+
+    Returns:
+        bool: Whether or not the header matches the entity tag.
+    """
+    if header is None:
+        return False
+    return any(tag.strip() in ("*", etag, f"W/{etag}")
+               for tag in header.split(","))
+
+
+class Page:
+    """
+    A converted Markdown file.
+
+    Args:
+        mtime (int): Modification time of file, in nanoseconds.
+        size (int): Size of file, in bytes.
+        etag (str): Entity tag of HTML code, see get_etag().
+        html (bytes, optional): HTML code, encoded as UTF-8. Defaults to None,
+            for pages not converted yet.
+    """
+
+    __slots__ = ("mtime", "size", "etag", "html")
+
+    def __init__(self, mtime, size, etag, html=None):
+        self.mtime = mtime
+        self.size = size
+        self.etag = etag
+        self.html = html
+
+
+class PageCache:
+    """
+    Store converted Markdown files, keyed by their paths.
+
+    A file is read again only once its modification time or size changes,
+    and converted again only once its content changes as well, so files that
+    are only touched, or written again with the same content, are not
+    converted again. The cache can be shared by multiple threads.
+    """
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Get the page of a Markdown file.
+
+        Args:
+            path (str): Path to Markdown file.
+
+        Returns:
+            tuple[Page, bytes | None]: Page, and Markdown code read from the
+                file if the page still has to be converted, or None if it is
+                converted already.
+
+        Raises:
+            OSError: If the file can not be read.
+        """
+        stat = os.stat(path)
+        with self._lock:
+            page = self._pages.get(path)
+        if page is not None and (page.mtime, page.size) == (stat.st_mtime_ns,
+                                                            stat.st_size):
+            return page, None
+
+        with open(path, "rb") as f:
+            data = f.read()
+        etag = get_etag(data)
+        if page is not None and page.etag == etag:
+            page = Page(stat.st_mtime_ns, stat.st_size, etag, page.html)
+            self.put(path, page)
+            return page, None
+        return Page(stat.st_mtime_ns, stat.st_size, etag), data
+
+    def put(self, path, page):
+        """
+        Store the page of a Markdown file, once converted.
+
+        Args:
+            path (str): Path to Markdown file.
+            page (Page): Page, including HTML code.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._pages[path] = page
+
+
+def decode(data):
+    """
+    Decode Markdown code read from a file, the same way convert_file() reads
+    it.
+
+    Args:
+        data (bytes): Markdown code, as read from a file.
+
+    Returns:
+        str: Markdown code.
+    """
+    encoding = locale.getpreferredencoding(False)
+    return io.TextIOWrapper(io.BytesIO(data), encoding=encoding).read()
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    Answer requests for pages, converting Markdown files of the directory
+    served, see make_server().
+
+    Every page is sent along with a strong entity tag, so requests carrying
+    it in an "If-None-Match" header are answered with "304 Not Modified".
+    Large pages not converted yet are sent in chunks as they are converted.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_page()
+
+    def do_HEAD(self):
+        self.send_page(head=True)
+
+    def send_page(self, head=False):
+        """
+        Send the page requested.
+
+        Args:
+            head (bool, optional): Whether or not only headers should be sent.
+                Defaults to False.
+
+        Returns:
+            None.
+        """
+        url_path = urllib.parse.urlsplit(self.path).path
+        path = get_markdown_path(self.server.directory, url_path)
+        try:
+            if path is None:
+                raise FileNotFoundError(url_path)
+            page, data = self.server.pages.get(path)
+        except (ValueError, OSError):
+            # Paths outside the directory, or with invalid characters, are
+            # answered as if they did not exist.
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        if match_etag(self.headers.get("If-None-Match"), page.etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_page_headers(page)
+            self.end_headers()
+            return
+
+        try:
+            markdown = decode(data) if data is not None else None
+        except UnicodeDecodeError:
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                            "File could not be decoded.")
+            return
+
+        if (markdown is not None and len(data) >= CHUNK_SIZE and not head
+                and self.request_version == "HTTP/1.1"):
+            self.send_response(HTTPStatus.OK)
+            self.send_page_headers(page)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            page.html = self.stream(markdown)
+            self.server.pages.put(path, page)
+            return
+
+        if markdown is not None:
+            page.html = convert(markdown, cache=False).encode("utf-8")
+            self.server.pages.put(path, page)
+        self.send_response(HTTPStatus.OK)
+        self.send_page_headers(page)
+        self.send_header("Content-Length", str(len(page.html)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(page.html)
+
+    def send_page_headers(self, page):
+        """
+        Send headers describing a page.
+
+        Args:
+            page (Page): Page.
+
+        Returns:
+            None.
+        """
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", page.etag)
+
+        # Clients should store pages, but check whether or not they changed
+        # before using them again.
+        self.send_header("Cache-Control", "no-cache")
+
+    def stream(self, markdown):
+        """
+        Convert Markdown code, sending HTML code in chunks as it is ready.
+
+        Args:
+            markdown (str): Markdown code.
+
+        Returns:
+            bytes: HTML code, encoded as UTF-8.
+        """
+        pieces = []
+        chunk = []
+        chunk_size = 0
+
+        def write(string):
+            nonlocal chunk_size
+            chunk.append(string.encode("utf-8"))
+            chunk_size += len(chunk[-1])
+            if chunk_size >= CHUNK_SIZE:
+                send_chunk()
+
+        def send_chunk():
+            nonlocal chunk_size
+            data = b"".join(chunk)
+            chunk.clear()
+            chunk_size = 0
+            if data:
+                pieces.append(data)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        try:
+            convert_into(markdown, write)
+            send_chunk()
+        except Exception:
+            # Headers were sent already, so the response can only be cut
+            # short, by closing the connection without the last chunk.
+            self.close_connection = True
+            raise
+        self.wfile.write(b"0\r\n\r\n")
+        return b"".join(pieces)
+
+
+def make_server(directory, host="127.0.0.1", port=8000):
+    """
+    Create a server converting Markdown files of a directory on request.
+
+    Requests are answered in their own threads, and converted pages are
+    shared by every thread, see PageCache.
+
+    E.g.:
+        server = make_server("docs", port=8080)
+        server.serve_forever()  # Serves "docs/guide.md" at "/guide.html".
+
+    Args:
+        directory (str): Directory to serve.
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on, or 0 to use any free port.
+            Defaults to 8000.
+
+    Returns:
+        ThreadingHTTPServer: Server, not yet serving.
+    """
+    server = ThreadingHTTPServer((host, port), RenderHandler)
+    server.daemon_threads = True
+    server.directory = directory
+    server.pages = PageCache()
+    return server
@@ -0,0 +1,296 @@
+"""This file contains functionality to store results of conversions in an SQLite database shared by many processes."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from quickhtml import __version__
+
+# Statements creating the database. The total size of results is kept up to
+# date by triggers, so it never has to be summed over every result stored.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    result BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+CREATE TABLE IF NOT EXISTS total (size INTEGER NOT NULL);
+INSERT INTO total SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM total);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE total SET size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE total SET size = size - OLD.size;
+END;
+"""
+
+
+class SQLiteCache:
+    """
+    Store results of conversions in an SQLite database, so they outlive the
+    process that converted them, and can be reused by every process opening
+    the same database.
+
+    The cache follows the same protocol as ConversionCache, so it can be
+    given to convert(), or to set_default_cache(). Results are keyed by a
+    digest of the Markdown code, of shared reference-style link definitions,
+    if any, of the version of QuickHTML, and of options, so upgrading
+    QuickHTML, or changing options, never reuses stale results. The database
+    is opened in WAL mode, so any number of processes can read results while
+    one of them stores a result. The least recently used results are evicted
+    once the total size of results stored would exceed a maximum size.
+
+    Each thread of each process uses its own connection to the database, and
+    the cache can be pickled, e.g. to be sent to worker processes, which then
+    open their own connections. A database that stays locked for longer than
+    the timeout is treated as a miss, since converting again is always
+    possible.
+
+    E.g.:
+        cache = SQLiteCache("cache.sqlite3", max_size=256 * 1024 * 1024)
+        convert(string, cache=cache)    # Converts string.
+        convert(string, cache=cache)    # Returns stored result, in this or
+                                        # any other process.
+        cache.stats()["hit_rate"]       # Returns 0.5.
+
+    Args:
+        path (str): Path to database file, which is created if it does not
+            exist.
+        max_size (int, optional): Maximum total size of results stored, in
+            bytes. Defaults to 256 MiB.
+        options (dict, optional): Options results depend on, such as options
+            of the application using them, which must be serializable as
+            JSON. Defaults to None.
+        timeout (float, optional): Time to wait for a locked database, in
+            seconds. Defaults to 5.0.
+    """
+
+    # Minimum time between two updates of the time a result was last used, in
+    # seconds. Results read often are only written again once in a while, so
+    # reading them does not have to wait for other processes writing.
+    touch_interval = 1.0
+
+    def __init__(self, path, max_size=256 * 1024 * 1024, options=None,
+                 timeout=5.0):
+        self.path = path
+        self.max_size = max_size
+        self.options = options
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._prefix = json.dumps([__version__, options],
+                                  sort_keys=True).encode("utf-8")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # Connect right away, so an invalid path fails here, instead of being
+        # treated as a miss by every conversion.
+        self._connect()
+
+    def __getstate__(self):
+        return {"path": self.path, "max_size": self.max_size,
+                "options": self.options, "timeout": self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        """
+        Get the connection to the database of the current thread and
+        process, opening it if required.
+
+        Args:
+            None.
+
+        Returns:
+            sqlite3.Connection: Connection.
+        """
+        connection = getattr(self._local, "connection", None)
+
+        # A connection inherited by a forked process can not be used.
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                     isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+
+        # Results can always be converted again, so a result lost on a power
+        # failure is not worth syncing to disk on every write.
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(f"BEGIN IMMEDIATE;{SCHEMA}COMMIT;")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get_key(self, string, references=None):
+        """
+        Get the key a conversion result is stored under.
+
+        Args:
+            string (str | bytes): Markdown code, or Markdown code encoded as
+                UTF-8, which is stored under the same key.
+            references (ReferenceRegistry, optional): Reference-style link
+                definitions shared by many documents. Defaults to None.
+
+        Returns:
+            bytes: Digest of Markdown code, definitions, version of QuickHTML
+                and options.
+        """
+        if isinstance(string, str):
+            string = string.encode("utf-8", "surrogatepass")
+        digest = hashlib.blake2b(self._prefix, digest_size=20)
+        digest.update(string)
+        if references:
+            digest.update(references.digest())
+        return digest.digest()
+
+    def get(self, key):
+        """
+        Get a conversion result, marking it as recently used.
+
+        Args:
+            key (bytes): Key the result is stored under.
+
+        Returns:
+            str | None: HTML code, or None if no result is stored under key.
+        """
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT result, used FROM results WHERE key = ?",
+                (key,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+
+        # The result is returned even if it can not be marked as used, such
+        # as while another process holds the write lock for too long.
+        if row is not None:
+            now = time.time()
+            if now - row[1] >= self.touch_interval:
+                try:
+                    connection.execute(
+                        "UPDATE results SET used = ? WHERE key = ?",
+                        (now, key))
+                except sqlite3.OperationalError:
+                    pass
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0].decode("utf-8", "surrogatepass")
+
+    def put(self, key, result):
+        """
+        Store a conversion result, evicting least recently used results if
+        required.
+
+        Args:
+            key (bytes): Key to store result under.
+            result (str): HTML code.
+
+        Returns:
+            None.
+        """
+        result = result.encode("utf-8", "surrogatepass")
+        size = len(key) + len(result)
+        if size > self.max_size:
+            return
+
+        evicted = []
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                if connection.execute(
+                        "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)",
+                        (key, result, size, time.time())).rowcount == 0:
+                    return
+                excess = connection.execute(
+                    "SELECT size FROM total").fetchone()[0] - self.max_size
+                if excess > 0:
+                    for evicted_key, evicted_size in connection.execute(
+                            "SELECT key, size FROM results ORDER BY used"):
+                        evicted.append((evicted_key,))
+                        excess -= evicted_size
+                        if excess <= 0:
+                            break
+                    connection.executemany(
+                        "DELETE FROM results WHERE key = ?", evicted)
+        except sqlite3.OperationalError:
+            return
+
+        with self._lock:
+            self.evictions += len(evicted)
+
+    def clear(self):
+        """
+        Remove every result stored, and reset counters.
+
+        Args:
+            None.
+
+        Returns:
+            None.
+        """
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM results")
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def close(self):
+        """
+        Close the connection to the database of the current thread, which is
+        opened again if the cache is used afterwards.
+
+        Args:
+            None.
+
+        Returns:
+            None.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def stats(self):
+        """
+        Get counters describing how the cache has been used.
+
+        Hits, misses and evictions are counted for this cache object only,
+        while results stored are counted for every process using the
+        database.
+
+        Args:
+            None.
+
+        Returns:
+            dict[str, int | float]: Dictionary containing number of hits,
+                misses and evictions, ratio of hits to lookups, number of
+                results stored, and their total size.
+        """
+        connection = self._connect()
+        results, size = connection.execute(
+            "SELECT (SELECT count(*) FROM results), size FROM total"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "results": results,
+                "size": size,
+            }
@@ -0,0 +1,160 @@
+"""This file contains functionality to convert Markdown files again as they change."""
+
+import os
+import time
+
+from quickhtml.batch import ConversionError
+from quickhtml.build import (MARKDOWN_EXTENSION, build, get_output_path,
+                             write_output)
+from quickhtml.quickhtml import convert_file
+
+
+def scan_files(source):
+    """
+    Get the size and modification time of Markdown files in a directory,
+    recursively.
+
+    Directories are read with "os.scandir()", which returns file types along
+    with names, so only Markdown files are stat-ed, one directory at a time.
+    Files are found as find_files() finds them, so symbolic links to
+    directories are not followed, and symbolic links to files are included.
+
+    Args:
+        source (str): Directory to search in.
+
+    Returns:
+        dict[str, tuple[int, int]]: Dictionary mapping paths to Markdown files
+            to tuples containing their modification time, in nanoseconds, and
+            size.
+    """
+    files = {}
+    directories = [source]
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif (entry.name.endswith(MARKDOWN_EXTENSION)
+                          and not entry.is_dir()):
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    # The entry was removed while the directory was read.
+                    continue
+    return files
+
+
+def convert_changed(source, output, files, snapshot, on_error=None):
+    """
+    Convert Markdown files which were added or changed since a snapshot.
+
+    Args:
+        source (str): Source directory.
+        output (str): Output directory.
+        files (dict[str, tuple[int, int]]): Markdown files found, see
+            scan_files().
+        snapshot (dict[str, tuple[int, int]]): Markdown files found
+            previously, see scan_files().
+        on_error (Callable[[str, Exception], Any], optional): Function called
+            with the path to each file which could not be converted, such as
+            files which can not be decoded, and the exception raised.
+            Defaults to None, which skips them silently.
+
+    Returns:
+        list[str]: Paths to HTML files written.
+    """
+    written = []
+    for file, info in sorted(files.items()):
+        if snapshot.get(file) == info:
+            continue
+        try:
+            html = convert_file(file)
+        except FileNotFoundError:
+            # The file was removed after it was found, it will be handled on
+            # the next poll.
+            continue
+        except (OSError, ValueError) as e:
+            # The file is converted again once it changes.
+            if on_error is not None:
+                on_error(file, e)
+            continue
+        path = get_output_path(source, output, file)
+        write_output(path, html)
+        written.append(path)
+    return written
+
+
+def watch(source, output, interval=0.25, delay=0.1, workers=None,
+          on_error=None):
+    """
+    Convert Markdown files in a directory into HTML files in another one,
+    then convert them again whenever they change.
+
+    The directory is polled every interval. Once a change is found, it is
+    polled again every delay until nothing changes anymore, so a burst of
+    writes, such as an editor saving many files, is converted only once.
+    Only files added or changed are converted, and outputs of files removed
+    are removed as well. Files which can not be converted are skipped until
+    they change again.
+
+    E.g.:
+        for written, removed in watch("docs", "site"):
+            ...
+
+    Args:
+        source (str): Source directory.
+        output (str): Output directory.
+        interval (float, optional): Seconds between polls. Defaults to 0.25.
+        delay (float, optional): Seconds without changes to wait for before
+            converting files. Defaults to 0.1.
+        workers (int, optional): Number of worker processes for the first
+            build. Defaults to None, which uses the number of processors in
+            the machine.
+        on_error (Callable[[str, Exception], Any], optional): Function called
+            with the path to each file which could not be converted, and the
+            exception raised. Defaults to None, which skips them silently.
+
+    Yields:
+        tuple[list[str], list[str]]: Paths to HTML files written, and paths
+            to HTML files removed, for each burst of changes.
+    """
+    # Take a snapshot before building, so changes made during the build are
+    # not missed.
+    snapshot = scan_files(source)
+    try:
+        build(source, output, workers)
+    except ConversionError:
+        # Some file could not be decoded, so files are converted one at a
+        # time instead, which reports it and converts the others anyway.
+        convert_changed(source, output, snapshot, {}, on_error)
+
+    while True:
+        time.sleep(interval)
+        files = scan_files(source)
+        if files == snapshot:
+            continue
+
+        # Wait for writes to settle.
+        while True:
+            time.sleep(delay)
+            latest = scan_files(source)
+            if latest == files:
+                break
+            files = latest
+
+        written = convert_changed(source, output, files, snapshot, on_error)
+
+        removed = []
+        for file in sorted(snapshot.keys() - files.keys()):
+            path = get_output_path(source, output, file)
+            if os.path.isfile(path):
+                os.remove(path)
+                removed.append(path)
+
+        snapshot = files
+        yield written, removed
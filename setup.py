@@ -1,11 +1,16 @@
+import re
+
 import setuptools
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+with open("quickhtml/__init__.py", "r") as fh:
+    version = re.search(r'__version__ = "(.+?)"', fh.read())[1]
+
 setuptools.setup(
     name="quickhtml",
-    version="2.0.17",
+    version=version,
     author="ckc-dev",
     author_email="ckc-dev@pm.me",
     description="A simple Markdown to HTML preprocessor that doesn't require any third-party modules.",
@@ -18,5 +23,5 @@ setuptools.setup(
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
@@ -1,7 +1,23 @@
 """This file contains unit tests, sorted alphabetically."""
 
+import asyncio
+import http.client
 import importlib.util
+import io
+import json
+import locale
+import os
+import pickle
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 MODULE_FILE = Path(__file__).joinpath("../../quickhtml/quickhtml.py").resolve()
@@ -9,6 +25,176 @@ SPEC = importlib.util.spec_from_file_location("quickhtml", MODULE_FILE)
 QUICKHTML_MODULE = importlib.util.module_from_spec(SPEC)
 SPEC.loader.exec_module(QUICKHTML_MODULE)
 CONVERT = getattr(QUICKHTML_MODULE, "convert")
+CONVERT_BYTES = getattr(QUICKHTML_MODULE, "convert_bytes")
+CONVERT_FILE = getattr(QUICKHTML_MODULE, "convert_file")
+CONVERT_INTO = getattr(QUICKHTML_MODULE, "convert_into")
+CONVERSION_CACHE = getattr(QUICKHTML_MODULE, "ConversionCache")
+GET_LINE_FEATURES = getattr(QUICKHTML_MODULE, "get_line_features")
+LAZY_PATTERN = getattr(QUICKHTML_MODULE, "LazyPattern")
+SET_DEFAULT_CACHE = getattr(QUICKHTML_MODULE, "set_default_cache")
+SPLIT_INTO_PIECES = getattr(QUICKHTML_MODULE, "split_into_pieces")
+
+# Modules other than the main module are imported from the package itself.
+sys.path.insert(0, str(MODULE_FILE.parents[1]))
+from quickhtml import (aio, batch, bench, build, document,  # noqa: E402
+                       incremental, profiling, serve, sqlite_cache, watch)
+NESTED_TAGS = getattr(QUICKHTML_MODULE, "NESTED_TAGS")
+NESTING_STACK = getattr(QUICKHTML_MODULE, "NestingStack")
+REFERENCE_REGISTRY = getattr(QUICKHTML_MODULE, "ReferenceRegistry")
+STREAMING_CONVERTER = getattr(QUICKHTML_MODULE, "StreamingConverter")
+STAGE_TIMER = getattr(QUICKHTML_MODULE, "StageTimer")
+TRACING = getattr(QUICKHTML_MODULE, "tracing")
+
+
+class AsyncConverterTest(unittest.TestCase):
+    DOCUMENTS = ["# This is heading %d.\nThis is a paragraph." % i for i in range(20)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, "document.md")
+        with open(self.file, "w") as f:
+            f.write("\n".join(self.DOCUMENTS))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_aconvert(self):
+        async def main():
+            return await asyncio.gather(
+                *(aio.aconvert(document, cache=False) for document in self.DOCUMENTS))
+
+        self.assertEqual(asyncio.run(main()),
+                         [CONVERT(document) for document in self.DOCUMENTS])
+
+    def test_aconvert_file(self):
+        expected = CONVERT("\n".join(self.DOCUMENTS))
+        self.assertEqual(asyncio.run(aio.aconvert_file(self.file)), expected)
+        self.assertEqual(asyncio.run(aio.aconvert_file(self.file, memory_map=True)),
+                         expected)
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(2) as executor:
+            converter = aio.AsyncConverter(executor)
+            self.assertEqual(asyncio.run(converter.convert_file(self.file)),
+                             CONVERT("\n".join(self.DOCUMENTS)))
+
+    def test_concurrency(self):
+        running = []
+        maximum = []
+        lock = threading.Lock()
+
+        def convert(*args):
+            with lock:
+                running.append(None)
+                maximum.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+            return CONVERT(*args[:1])
+
+        async def main():
+            with ThreadPoolExecutor(8) as executor:
+                converter = aio.AsyncConverter(executor, concurrency=2)
+                with unittest.mock.patch.object(aio, "convert", convert):
+                    return await asyncio.gather(
+                        *(converter.convert(document) for document in self.DOCUMENTS))
+
+        self.assertEqual(len(asyncio.run(main())), len(self.DOCUMENTS))
+        self.assertEqual(max(maximum), 2)
+
+    def test_tracer(self):
+        timer = STAGE_TIMER()
+
+        async def main():
+            with profiling.quickhtml.tracing(timer):
+                return await aio.aconvert("# This is a heading.", cache=False)
+
+        self.assertEqual(asyncio.run(main()), "<h1>This is a heading.</h1>")
+        self.assertIn("headings", timer.totals)
+
+
+class BacktrackingTest(unittest.TestCase):
+    # Inputs that used to take time quadratic, or exponential, in their length.
+    DOCUMENTS = {
+        "open_brackets": "[" * 20000,
+        "unclosed_links": "[a](" * 5000,
+        "unclosed_images": "![a](" * 4000,
+        "link_text_whitespaces": "[" + " " * 20000 + "a](b)",
+        "link_titles": "[a](b" + " \"c" * 7000,
+        "image_titles": "![a](b" + " \"c" * 7000,
+        "stars": "*a " * 7000,
+        "double_stars": "**a " * 5000,
+        "underscores": "_a " * 7000,
+        "code_spans": "`a " * 7000,
+        "code_span_whitespaces": "`" + " " * 20000 + "a",
+        "quick_link_dots": "<http://" + "a." * 10000,
+        "quick_link_characters": "<http://" + "a" * 30 + " ",
+        "quick_links": "<http://a/" * 2000 + " >",
+        "heading_whitespaces": "# a" + " " * 20000 + "b",
+        "whitespace_lines": " \n" * 10000 + "x",
+        "blockquote_whitespaces": ">" + " " * 20000 + "a" + " " * 20000,
+        "reference_definition_titles": "[a]: b" + " \"c" * 7000,
+        "reference_definition_whitespaces": "[a]:" + " " * 20000 + "b \"c",
+        "reference_links": "[a][" * 5000 + "\n\n[a]: u",
+        "reference_definitions": "".join(f"[{i}]: u\n" for i in range(3000))
+        + "".join(f"[Link][{i}]" for i in range(3000)),
+        "paragraph_tags": "<a href=\"x\">" * 2000,
+        "heading_tags": "<h1>" * 5000,
+        "same_line_blockquotes": "> " * 20000 + "a",
+        "same_line_ordered_lists": "1. " * 20000 + "a",
+        "same_line_unordered_lists": "- " * 20000 + "a",
+    }
+
+    def test_linear_time(self):
+        for name, document in self.DOCUMENTS.items():
+            with self.subTest(name):
+                start = time.perf_counter()
+                CONVERT(document, cache=False)
+                self.assertLess(time.perf_counter() - start, 1)
+
+    def test_unchanged_output(self):
+        self.assertEqual(CONVERT("<http://" + "a" * 30 + " "),
+                         "<p><http://" + "a" * 30 + "</p>")
+        self.assertEqual(CONVERT("[ ](URL)"), '<a href="URL"> </a>')
+        self.assertEqual(CONVERT("[Link](URL) [Link](URL \"Title\")"),
+                         '<p><a href="URL">Link</a> <a href="URL" title="Title">Link</a></p>')
+        self.assertEqual(CONVERT("<http://a.b/c> <http://d"),
+                         '<p><a href="http://a.b/c">http://a.b/c</a> <http://d</p>')
+
+
+class BenchTest(unittest.TestCase):
+    def test_generate(self):
+        for name in bench.GENERATORS:
+            document = bench.generate(name, 0, 1024)
+            self.assertGreaterEqual(len(document), 1024)
+            self.assertEqual(document, bench.generate(name, 0, 1024))
+            self.assertNotEqual(document, bench.generate(name, 1, 1024))
+
+    def test_deep_nesting(self):
+        for depth in bench.DEEP_NESTING_DEPTHS:
+            lines = bench.generate(f"deep_nesting_{depth}", 0, 1).splitlines()
+            self.assertEqual(len(lines), depth * 2 - 1)
+            self.assertTrue(lines[depth - 1].startswith(
+                (">" * depth + " ", " " * (depth - 1) + "1. ",
+                 " " * (depth - 1) + "- ")))
+
+    def test_run(self):
+        results = bench.run(documents=2, size=256)
+        self.assertEqual(list(results), list(bench.GENERATORS))
+        for result in results.values():
+            self.assertEqual(result["documents"], 2)
+            self.assertGreater(result["mb_per_s"], 0)
+            self.assertGreater(result["us_per_line"], 0)
+            self.assertLessEqual(result["p50_ms"], result["max_ms"])
+
+    def test_compare(self):
+        baseline = {"links": {"mb_per_s": 1.0, "p90_ms": 10.0}}
+        self.assertEqual(bench.compare(
+            {"links": {"mb_per_s": 0.95, "p90_ms": 10.5}}, baseline), [])
+        self.assertEqual(len(bench.compare(
+            {"links": {"mb_per_s": 0.5, "p90_ms": 20.0}}, baseline)), 2)
+        self.assertEqual(bench.compare(
+            {"escapes": {"mb_per_s": 0.5, "p90_ms": 20.0}}, baseline), [])
 
 
 class BlockquoteTest(unittest.TestCase):
@@ -147,6 +333,114 @@ class BlockquoteTest(unittest.TestCase):
                          "<p>This > should > not > be > affected.</p>")
 
 
+class BuildTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, "source")
+        self.output = os.path.join(self.directory.name, "output")
+        for path, content in (("index.md", "# This is a heading."),
+                              ("guide/page.md", "This is a paragraph."),
+                              ("guide/notes.txt", "This is not Markdown.")):
+            path = os.path.join(self.source, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, path):
+        with open(os.path.join(self.output, path)) as f:
+            return f.read()
+
+    def test_build(self):
+        written = build.build(self.source, self.output, workers=1)
+        self.assertEqual(len(written), 2)
+        self.assertEqual(self.read("index.html"), "<h1>This is a heading.</h1>")
+        self.assertEqual(self.read("guide/page.html"),
+                         "<p>This is a paragraph.</p>")
+        self.assertFalse(os.path.exists(os.path.join(self.output, "guide/notes.html")))
+
+    def test_files(self):
+        files = [os.path.join(self.source, "guide/page.md")]
+        self.assertEqual(build.build(self.source, self.output, 1, files),
+                         [os.path.join(self.output, "guide/page.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.output, "index.html")))
+
+    def test_unchanged(self):
+        build.build(self.source, self.output, workers=1)
+        self.assertEqual(build.build(self.source, self.output, workers=1), [])
+
+        # Same content, different modification time.
+        path = os.path.join(self.source, "index.md")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(build.build(self.source, self.output, workers=1), [])
+
+        self.assertEqual(
+            len(build.build(self.source, self.output, workers=1, force=True)), 2)
+
+    def test_changed(self):
+        build.build(self.source, self.output, workers=1)
+        path = os.path.join(self.source, "index.md")
+        with open(path, "w") as f:
+            f.write("# This is a changed heading.")
+        self.assertEqual(build.build(self.source, self.output, workers=1),
+                         [os.path.join(self.output, "index.html")])
+        self.assertEqual(self.read("index.html"),
+                         "<h1>This is a changed heading.</h1>")
+
+        os.remove(os.path.join(self.output, "index.html"))
+        self.assertEqual(build.build(self.source, self.output, workers=1),
+                         [os.path.join(self.output, "index.html")])
+
+    def test_version_changed(self):
+        build.build(self.source, self.output, workers=1)
+        version = build.__version__
+        try:
+            build.__version__ = "0.0.0"
+            self.assertEqual(
+                len(build.build(self.source, self.output, workers=1)), 2)
+        finally:
+            build.__version__ = version
+
+    def test_removed(self):
+        build.build(self.source, self.output, workers=1)
+        os.remove(os.path.join(self.source, "index.md"))
+        build.build(self.source, self.output, workers=1)
+        self.assertFalse(os.path.exists(os.path.join(self.output, "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.output, "guide/page.html")))
+
+    def test_removed_outside_output(self):
+        build.build(self.source, self.output, workers=1)
+        outside = os.path.join(self.directory.name, "outside.html")
+        with open(outside, "w") as f:
+            f.write("This is not an output.")
+        with open(os.path.join(self.output, build.MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        for key, path in (("a.md", outside), ("b.md", "../outside.html"),
+                          ("c.md", "guide/../../outside.html")):
+            manifest["files"][key] = {"output": path}
+        manifest["files"]["d.md"] = {"output": build.MANIFEST_NAME}
+        with open(os.path.join(self.output, build.MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+
+        build.build(self.source, self.output, workers=1)
+        self.assertTrue(os.path.exists(outside))
+        self.assertTrue(os.path.exists(os.path.join(self.output, "index.html")))
+
+    def test_outside_source(self):
+        with self.assertRaises(build.PathError):
+            build.build(self.source, self.output, 1, [self.directory.name])
+        with self.assertRaises(ValueError):
+            build.get_output_path(self.source, self.output, "../page.md")
+
+        # Names starting with ".." are inside the source directory.
+        self.assertEqual(
+            build.get_output_path(self.source, self.output,
+                                  os.path.join(self.source, "..notes.md")),
+            os.path.join(self.output, "..notes.html"))
+
+
 class CodeBlockTest(unittest.TestCase):
     def test_code_block(self):
         self.assertEqual(CONVERT("    This is some text inside a code block."),
@@ -262,6 +556,403 @@ class CodeTest(unittest.TestCase):
                          "<p>This should not be affected.``</p>")
 
 
+class CommandLineTest(unittest.TestCase):
+    def run_quickhtml(self, *args, **kwargs):
+        return subprocess.run(
+            (sys.executable, "-m", "quickhtml") + args,
+            cwd=MODULE_FILE.parents[1], stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True, **kwargs)
+
+    def test_build_undecodable_file(self):
+        try:
+            b"\xff".decode(locale.getpreferredencoding(False))
+            self.skipTest("Preferred encoding decodes every byte.")
+        except UnicodeDecodeError:
+            pass
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source")
+            os.mkdir(source)
+            for name in ("a.md", "b.md", "c.md"):
+                with open(os.path.join(source, name), "w") as f:
+                    f.write("# Heading.\n" * 100)
+            with open(os.path.join(source, "bad.md"), "wb") as f:
+                f.write(b"\xff This is not decodable.")
+            for jobs in ("1", "2"):
+                output = self.run_quickhtml(
+                    "build", source, "-o", os.path.join(directory, "output"),
+                    "-j", jobs)
+                self.assertEqual(output.returncode, 1)
+                self.assertNotIn("Traceback", output.stderr)
+                self.assertNotIn("usage:", output.stderr)
+                self.assertIn(
+                    f"Could not convert \"{os.path.join(source, 'bad.md')}\"",
+                    output.stderr)
+
+    def test_build_files_from(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source")
+            os.mkdir(source)
+            with open(os.path.join(source, "index.md"), "w") as f:
+                f.write("# Heading.")
+            files = "\0".join((os.path.join(source, "index.md"),
+                               os.path.join(source, "missing.md")))
+            output = self.run_quickhtml(
+                "build", source, "-o", os.path.join(directory, "output"),
+                "-j", "1", "--files-from", "-", input=files)
+            self.assertEqual(output.returncode, 2)
+            self.assertNotIn("Traceback", output.stderr)
+            self.assertIn("missing.md\" is not a file.", output.stderr)
+            self.assertFalse(os.path.exists(os.path.join(directory, "output")))
+
+            output = self.run_quickhtml(
+                "build", source, "-o", os.path.join(directory, "output"),
+                "--files-from", os.path.join(directory, "missing.txt"))
+            self.assertEqual(output.returncode, 2)
+            self.assertNotIn("Traceback", output.stderr)
+
+    def test_stdin(self):
+        document = "# Heading.\n\nSee [link][1].\n\n[2]: Second URL.\n[Link][2]"
+        output = self.run_quickhtml("-", input=document)
+        self.assertEqual(output.returncode, 0)
+        self.assertEqual(output.stdout, CONVERT(document) + "\n")
+
+        # Definitions only apply to links after them.
+        document += "\n[1]: First URL."
+        output = self.run_quickhtml("-", input=document)
+        self.assertEqual(output.stdout,
+                         "<h1>Heading.</h1><p>See [link][1].</p>"
+                         "<a href=\"Second URL.\">Link</a>\n")
+        self.assertIn("First URL.", CONVERT(document))
+
+    def test_stdin_flushed(self):
+        process = subprocess.Popen(
+            (sys.executable, "-m", "quickhtml", "-"),
+            cwd=MODULE_FILE.parents[1], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE)
+        try:
+            process.stdin.write(b"# First heading.\n\nParagraph.\n")
+            process.stdin.flush()
+
+            # HTML of the heading is written while stdin is still open.
+            chunks = []
+            reader = threading.Thread(
+                target=lambda: chunks.append(process.stdout.read1(4096)))
+            reader.start()
+            reader.join(10)
+            self.assertEqual(chunks, [b"<h1>First heading.</h1>"])
+
+            process.stdin.write(b"# Second heading.\n")
+            process.stdin.close()
+            self.assertEqual(process.stdout.read(),
+                             b"<p>Paragraph.</p><h1>Second heading.</h1>\n")
+        finally:
+            process.stdin.close()
+            process.stdout.close()
+            process.wait(10)
+
+
+class ConversionCacheTest(unittest.TestCase):
+    def test_hit(self):
+        cache = CONVERSION_CACHE()
+        self.assertEqual(CONVERT("# This is a heading.", cache=cache),
+                         "<h1>This is a heading.</h1>")
+        self.assertEqual(CONVERT("# This is a heading.", cache=cache),
+                         "<h1>This is a heading.</h1>")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["results"]),
+                         (1, 1, 1))
+
+    def test_references(self):
+        cache = CONVERSION_CACHE()
+        self.assertEqual(CONVERT("[Link][1]\n[1]: First URL.", cache=cache),
+                         "<a href=\"First URL.\">Link</a>")
+        self.assertEqual(CONVERT("[Link][1]\n[1]: Second URL.", cache=cache),
+                         "<a href=\"Second URL.\">Link</a>")
+        self.assertEqual(cache.stats()["hits"], 0)
+
+        references = REFERENCE_REGISTRY([{"label": "1", "url": "Third URL."}])
+        self.assertEqual(CONVERT("[Link][1]", cache=cache, references=references),
+                         "<a href=\"Third URL.\">Link</a>")
+        references.add("2", "Fourth URL.")
+        self.assertEqual(CONVERT("[Link][2]", cache=cache, references=references),
+                         "<a href=\"Fourth URL.\">Link</a>")
+        self.assertEqual(CONVERT("[Link][1]", cache=cache),
+                         "<p>[Link][1]</p>")
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_eviction(self):
+        cache = CONVERSION_CACHE()
+        CONVERT("One.", cache=cache)
+        cache.max_size = cache.size * 2
+        CONVERT("Two.", cache=cache)
+        CONVERT("One.", cache=cache)
+        CONVERT("Six.", cache=cache)
+        stats = cache.stats()
+        self.assertEqual((stats["evictions"], stats["results"]), (1, 2))
+        self.assertLessEqual(stats["size"], cache.max_size)
+
+        # "Two." was the least recently used result, so it was evicted.
+        CONVERT("One.", cache=cache)
+        CONVERT("Two.", cache=cache)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+        cache.clear()
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "evictions": 0,
+                                         "results": 0, "size": 0})
+
+    def test_default_cache(self):
+        cache = CONVERSION_CACHE()
+        SET_DEFAULT_CACHE(cache)
+        try:
+            CONVERT("This is a paragraph.")
+            CONVERT("This is a paragraph.")
+            CONVERT("This is a paragraph.", cache=False)
+        finally:
+            SET_DEFAULT_CACHE(None)
+        CONVERT("This is a paragraph.")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class ConvertBytesTest(unittest.TestCase):
+    STRING = "# Heading.\n> Quote with ünïcödé and an emoji 🙂.\n\n- Item."
+
+    def test_encodings(self):
+        expected = CONVERT(self.STRING)
+        for encoding in ("utf-8", "UTF8", "utf-16", "latin-1", "cp1252"):
+            with self.subTest(encoding=encoding):
+                string = self.STRING.replace("🙂", "") if encoding in (
+                    "latin-1", "cp1252") else self.STRING
+                self.assertEqual(
+                    CONVERT_BYTES(string.encode(encoding), encoding),
+                    CONVERT(string).encode(encoding))
+        self.assertEqual(CONVERT_BYTES(self.STRING.encode()),
+                         expected.encode())
+
+    def test_buffers(self):
+        data = self.STRING.encode()
+        expected = CONVERT(self.STRING).encode()
+        self.assertEqual(CONVERT_BYTES(bytearray(data)), expected)
+        self.assertEqual(CONVERT_BYTES(memoryview(data)), expected)
+        self.assertEqual(CONVERT_BYTES(b""), b"")
+
+    def test_cache(self):
+        cache = CONVERSION_CACHE()
+        data = self.STRING.encode()
+        expected = CONVERT(self.STRING).encode()
+        self.assertEqual(CONVERT_BYTES(data, cache=cache), expected)
+        self.assertEqual(CONVERT_BYTES(memoryview(data), cache=cache),
+                         expected)
+
+        # Bytes and strings are stored under the same key.
+        self.assertEqual(CONVERT(self.STRING, cache=cache),
+                         expected.decode())
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["results"], 1)
+
+        # Cached results are reused without decoding bytes.
+        with unittest.mock.patch.object(QUICKHTML_MODULE, "convert") as mock:
+            self.assertEqual(CONVERT_BYTES(data, cache=cache), expected)
+        mock.assert_not_called()
+
+        CONVERT_BYTES(self.STRING.encode("utf-16"), "utf-16", cache=cache)
+        self.assertEqual(cache.stats()["results"], 1)
+
+    def test_convert_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for encoding in ("utf-8", "utf-16", "cp1252"):
+                string = self.STRING.replace("🙂", "") if encoding == (
+                    "cp1252") else self.STRING
+                file = os.path.join(directory, f"{encoding}.md")
+                with open(file, "w", encoding=encoding) as f:
+                    f.write(string)
+                for memory_map in (False, True):
+                    with self.subTest(encoding=encoding, memory_map=memory_map):
+                        self.assertEqual(
+                            CONVERT_FILE(file, memory_map, encoding=encoding),
+                            CONVERT(string))
+
+
+class ConvertManyTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = []
+        for i in range(20):
+            file = os.path.join(self.directory.name, f"{i}.md")
+            with open(file, "w") as f:
+                f.write(f"# This is heading {i}.\n" + "This is a paragraph.\n" * i)
+            self.files.append(file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected(self):
+        return [(file, batch.convert_file(file)) for file in self.files]
+
+    def test_ordered(self):
+        self.assertEqual(list(batch.convert_many(self.files, workers=2)),
+                         self.expected())
+
+    def test_unordered(self):
+        self.assertEqual(
+            sorted(batch.convert_many(self.files, workers=2, ordered=False)),
+            sorted(self.expected()))
+
+    def test_single_worker(self):
+        self.assertEqual(list(batch.convert_many(self.files, workers=1)),
+                         self.expected())
+
+    def test_workers(self):
+        with unittest.mock.patch.object(
+                batch, "ProcessPoolExecutor",
+                wraps=batch.ProcessPoolExecutor) as executor:
+            self.assertEqual(list(batch.convert_many(self.files[:3], 32)),
+                             self.expected()[:3])
+            executor.assert_called_once_with(3)
+            executor.reset_mock()
+
+            # A single file, or none, is converted without worker processes.
+            self.assertEqual(list(batch.convert_many(self.files[:1], 32)),
+                             self.expected()[:1])
+            self.assertEqual(list(batch.convert_many([], 32)), [])
+            executor.assert_not_called()
+
+    def test_schedule(self):
+        units = batch.schedule(self.files, 2)
+        self.assertEqual(sorted(index for unit in units for index, _ in unit),
+                         list(range(20)))
+        self.assertLess(len(units), 20)
+        self.assertEqual(units[0][0], (19, self.files[19]))
+
+
+class DocumentTest(unittest.TestCase):
+    DOCUMENT = """# Heading.
+
+This is a *paragraph*, with a [link](URL "Title.") and `code`.
+
+> This is a blockquote.
+
+- Item.
+- [Reference][1].
+
+    Code block.
+
+![Image](URL)
+
+[1]: Reference URL.
+"""
+
+    def test_same_as_convert(self):
+        self.assertEqual(document.render(document.parse(self.DOCUMENT)),
+                         CONVERT(self.DOCUMENT))
+        self.assertEqual(document.render(document.parse("")), "")
+
+    def test_tree(self):
+        tree = document.parse(self.DOCUMENT)
+        self.assertEqual(tree.children[:3], [
+            document.Heading(1, [document.Text("Heading.")]),
+            document.Paragraph([
+                document.Text("This is a "),
+                document.Emphasis([document.Text("paragraph")]),
+                document.Text(", with a "),
+                document.Link("URL", "Title.", [document.Text("link")]),
+                document.Text(" and "),
+                document.Code([document.Text("code")]),
+                document.Text("."),
+            ]),
+            document.Blockquote([document.Paragraph([
+                document.Text("This is a blockquote.")])]),
+        ])
+        self.assertEqual([(node.url, node.title) for node in tree.walk()
+                          if isinstance(node, document.Link)],
+                         [("URL", "Title."), ("Reference URL.", "")])
+        self.assertEqual(tree.children[-1], document.Image("URL", "Image"))
+        self.assertEqual(tree.references.get("1").url, "Reference URL.")
+
+    def test_code(self):
+        # HTML inside code is kept as text.
+        for string, text in (("`<a href=\"/evil\">t</a>`", '<a href="/evil">t</a>'),
+                             ("`<h1>x</h1>`", "<h1>x</h1>")):
+            tree = document.parse(string)
+            self.assertEqual(tree.children, [document.Paragraph([
+                document.Code([document.Text(text)])])])
+            self.assertEqual(document.render(tree), CONVERT(string))
+        self.assertEqual(document.parse("``a</code>b``").children,
+                         [document.Code([document.Text("a</code>b")])])
+        self.assertEqual(document.parse("    <em>Code.</em>").children, [
+            document.CodeBlock([document.Code([
+                document.Text("<em>Code.</em>")])])])
+
+    def test_inline_html(self):
+        # HTML written inside Markdown is kept as text, even when it looks
+        # like tags added by conversion.
+        string = "Some <strong>bold</strong> and **bold** text."
+        self.assertEqual(document.parse(string).children, [document.Paragraph([
+            document.Text("Some <strong>bold</strong> and "),
+            document.Strong([document.Text("bold")]),
+            document.Text(" text."),
+        ])])
+        self.assertEqual(document.parse("<h1>Heading.</h1>").children,
+                         [document.Text("<h1>Heading.</h1>")])
+        self.assertEqual(
+            document.parse("[Link <em>](URL) <a href=\"URL\">Link</a>").children,
+            [document.Paragraph([
+                document.Link("URL", "", [document.Text("Link <em>")]),
+                document.Text(" <a href=\"URL\">Link</a>")])])
+
+        # Quick links are still turned into links, and reference-style
+        # links containing "<" still find their definitions.
+        string = "<http://example.com> [a<b] <b>\n\n[a<b]: URL"
+        self.assertEqual(document.parse(string).children, [document.Paragraph([
+            document.Link("http://example.com", "",
+                          [document.Text("http://example.com")]),
+            document.Text(" "),
+            document.Link("URL", "", [document.Text("a<b")]),
+            document.Text("<b>"),
+        ])])
+        for string in ("<h1>Heading.</h1>\n<img src=\"URL\" alt=\"Image\">",
+                       "> <ol>\n> Quote.", "# Heading `<h1>`",
+                       "<http://example.com> `<http://example.com>`"):
+            self.assertEqual(document.render(document.parse(string)),
+                             CONVERT(string))
+
+        # It is also kept as text along with headings and code snippets, in
+        # definitions, and in documents containing the characters it is told
+        # apart with.
+        self.assertEqual(document.parse("# Title `x` <em>y</em>").children, [
+            document.Heading(1, [document.Text("Title "),
+                                 document.Code([document.Text("x")]),
+                                 document.Text(" <em>y</em>")])])
+        self.assertEqual(
+            document.parse("[Link][1]\n\n[1]: /x\"><em>y</em>z").children,
+            [document.Link("/x", "", [document.Text("<em>y</em>z\">Link")])])
+        string = "\ufdd0 <em>a</em> *b*"
+        self.assertEqual(document.parse(string).children, [document.Paragraph([
+            document.Text("\ufdd0 <em>a</em> "),
+            document.Emphasis([document.Text("b")])])])
+        string = "".join(document.HTML_MARKS) + " <em>a</em> *b*"
+        self.assertEqual(document.parse(string).children,
+                         [document.Text(CONVERT(string))])
+
+        # Lines converted differently once HTML is told apart are kept as
+        # text, along with tags added by conversion.
+        self.assertEqual(document.parse("# `<h1>`").children,
+                         [document.Text("<p><code><h1></code><h1></h1></p>")])
+
+    def test_improperly_nested_tags(self):
+        # Tags that are left open, or close nothing, are kept as text.
+        for string in ("*[a*](URL)", "<em>Text.", "Text.</p>", "<p>*Text</p>*"):
+            tree = document.parse(string)
+            self.assertEqual(document.render(tree), CONVERT(string))
+        self.assertEqual(document.parse("Text.</li>").children, [
+            document.Paragraph([document.Text("Text.</li>")])])
+
+    def test_render_twice(self):
+        tree = document.parse(self.DOCUMENT)
+        self.assertEqual(document.render(tree), document.render(tree))
+        self.assertEqual(document.render(tree.children[0]), "<h1>Heading.</h1>")
+
+
 class EmphasisTest(unittest.TestCase):
     def test_italic(self):
         self.assertEqual(CONVERT("*This is some italic text.*"),
@@ -1025,6 +1716,86 @@ class ImageTest(unittest.TestCase):
                          "<img src=\"Image path or URL.\" alt=\"This is an image.\" title=\"Image title.\"><img src=\"Another image path or URL.\" alt=\"This is another image.\" title=\"Another image title.\"><img src=\"Yet another image path or URL.\" alt=\"This is yet another image.\" title=\"Yet another image title.\">")
 
 
+class IncrementalDocumentTest(unittest.TestCase):
+    DOCUMENT = """This is a level 1 heading.
+==========================
+
+This is a paragraph.
+It has two lines.
+
+> This is a level 1 blockquote.
+>> This is a level 2 blockquote.
+
+    This is a code block.
+
+This is a paragraph with a [reference-style link][1].
+
+[1]: Link URL."""
+
+    def apply(self, html, changes):
+        for start, end, fragment in changes:
+            html = html[:start] + fragment + html[end:]
+        return html
+
+    def test_same_as_convert(self):
+        document = incremental.IncrementalDocument(self.DOCUMENT)
+        self.assertEqual(document.html, CONVERT(self.DOCUMENT))
+
+        edits = ((3, 4, "This is an edited paragraph."),
+                 (4, 5, ""),
+                 (3, 3, "    This is an inserted code block."),
+                 (0, 1, "This is an edited heading."),
+                 (1, 2, ""),
+                 (6, 7, "> This is an edited blockquote."),
+                 (10, 10, "* This is a list item.\n  * This is too."))
+        for start, end, string in edits:
+            old_html = document.html
+            html, changes = document.edit(start, end, string)
+            self.assertEqual(html, CONVERT(document.text))
+            self.assertEqual(self.apply(old_html, changes), html)
+
+    def test_changes_only_edited_block(self):
+        document = incremental.IncrementalDocument("# Heading.\n\nParagraph.")
+        self.assertEqual(document.edit(2, 3, "Edited paragraph."),
+                         ("<h1>Heading.</h1><p>Edited paragraph.</p>",
+                          [(17, 34, "<p>Edited paragraph.</p>")]))
+        self.assertEqual(document.edit(2, 3, "Edited paragraph."),
+                         ("<h1>Heading.</h1><p>Edited paragraph.</p>", []))
+
+    def test_reference_definition_change(self):
+        document = incremental.IncrementalDocument(self.DOCUMENT)
+        html, changes = document.edit(13, 14, "[1]: Another link URL.")
+        self.assertIn("href=\"Another link URL.\"", html)
+        self.assertEqual(html, CONVERT(document.text))
+        self.assertEqual(changes[0][:2], (0, len(CONVERT(self.DOCUMENT))))
+
+
+class LazyPatternTest(unittest.TestCase):
+    def test_compiled_on_first_use(self):
+        pattern = LAZY_PATTERN(r"""
+            a+  # Match between 1 and ∞ "a".""", re.VERBOSE)
+        self.assertIsNone(pattern._compiled)
+        self.assertEqual(pattern.sub("b", "caaat"), "cbt")
+        self.assertIsInstance(pattern.compile(), re.Pattern)
+        self.assertEqual(pattern.flags, pattern.compile().flags)
+        self.assertEqual(pattern.fullmatch("aa")[0], "aa")
+        self.assertIsNone(pattern.match("b"))
+        with self.assertRaises(AttributeError):
+            pattern.missing
+
+    def test_module_patterns(self):
+        patterns = [value for name, value in vars(QUICKHTML_MODULE).items()
+                    if name.startswith("REGEX_")
+                    and isinstance(value, LAZY_PATTERN)]
+        self.assertGreater(len(patterns), 20)
+
+    def test_pickle(self):
+        pattern = pickle.loads(pickle.dumps(document.REGEX_TAG))
+        self.assertEqual(pattern.pattern, document.REGEX_TAG.pattern)
+        self.assertEqual(pattern.findall("<p>a</p>"),
+                         document.REGEX_TAG.findall("<p>a</p>"))
+
+
 class LineBreakTest(unittest.TestCase):
     def test_blockquote(self):
         self.assertEqual(CONVERT(">Here's a line break inside a blockquote.  "),
@@ -1122,6 +1893,47 @@ class LineBreakTest(unittest.TestCase):
                          "<p>This should be a paragraph with no line breaks.</p>")
 
 
+class LineFeaturesTest(unittest.TestCase):
+    def feature(self, name):
+        return getattr(QUICKHTML_MODULE, f"FEATURE_{name}")
+
+    def test_prose(self):
+        self.assertEqual(GET_LINE_FEATURES(""), 0)
+        self.assertEqual(GET_LINE_FEATURES(
+            "This is a line of prose, with some punctuation; is it?"), 0)
+
+    def test_features(self):
+        for line, names in (
+                ("# Heading.", ("HEADING",)),
+                ("Some `code`.", ("CODE",)),
+                ("Some *emphasis* and __bold__.", ("EMPHASIS",)),
+                ("A [link](URL).", ("LINK",)),
+                ("An ![image](URL).", ("IMAGE", "LINK")),
+                ("  > Quote.", ("NESTED_TAG",)),
+                ("12. Item.", ("NESTED_TAG",)),
+                ("٣. Item.", ("NESTED_TAG",)),
+                ("+ Item.", ("NESTED_TAG",)),
+                ("- Item.", ("HORIZONTAL_RULE", "NESTED_TAG")),
+                ("***", ("HORIZONTAL_RULE", "NESTED_TAG", "EMPHASIS")),
+                ("\t___", ("HORIZONTAL_RULE", "EMPHASIS")),
+                ("Not - a # list.", ("HEADING",))):
+            with self.subTest(line):
+                expected = 0
+                for name in names:
+                    expected |= self.feature(name)
+                self.assertEqual(GET_LINE_FEATURES(line), expected)
+
+    def test_skipped_stages(self):
+        # Stages skipped for lines without their features still see the
+        # characters that tags and reference-style links add.
+        references = REFERENCE_REGISTRY([{"label": "1", "url": "a\\*b"}])
+        self.assertEqual(CONVERT("A [link][1].", references=references),
+                         "<p>A <a href=\"a*b\">link</a>.</p>")
+        self.assertEqual(CONVERT("Text.\n***\nText."),
+                         "<p>Text.</p><hr><p>Text.</p>")
+        self.assertEqual(CONVERT("A \\# sign."), "<p>A # sign.</p>")
+
+
 class LinkTest(unittest.TestCase):
     def test_empty_link(self):
         self.assertEqual(CONVERT("[]()"), "<p>[]()</p>")
@@ -1153,6 +1965,14 @@ class LinkTest(unittest.TestCase):
         self.assertEqual(CONVERT("This is a [     link     ](     Link URL.     \"This is a title.\"     ) inside a paragraph."),
                          "<p>This is a <a href=\"Link URL.\" title=\"This is a title.\">link</a> inside a paragraph.</p>")
 
+    def test_many_links(self):
+        self.assertEqual(
+            CONVERT(" ".join(f"[Link {i}.](URL {i}.)" for i in range(100))),
+            "<p>" + " ".join(f"<a href=\"URL {i}.\">Link {i}.</a>"
+                             for i in range(100)) + "</p>")
+        self.assertEqual(CONVERT("[Link with \\\\ backslash.](URL.)"),
+                         "<a href=\"URL.\">Link with \\ backslash.</a>")
+
     def test_multiple(self):
         self.assertEqual(CONVERT("[This is a link.](Link URL.)[This is another link.](Another link URL.)"),
                          "<a href=\"Link URL.\">This is a link.</a><a href=\"Another link URL.\">This is another link.</a>")
@@ -1372,6 +2192,117 @@ class LinkTest(unittest.TestCase):
         """), "<p><a href=\"Link URL.\" title=\"Link title.\">This is a link.</a> <a href=\"Another link URL.\" title=\"Another link title.\">This is another link.</a> <a href=\"Yet another link URL.\" title=\"Yet another link title.\">Yet another link.</a></p>")
 
 
+class MemoryMapTest(unittest.TestCase):
+    STRINGS = (
+        "See [a].\n\n[a]:\n  http://x\n",
+        "[a]: http://x\n  \"Title\"",
+        "a\r\nb\r\n===\r\n",
+        "a\rb\r---",
+        "Title\n=====\n---",
+        "",
+        "\n \n",
+    )
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, "document.md")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_same_as_read(self, string, encoding="utf-8"):
+        with open(self.file, "w", encoding=encoding, newline="") as f:
+            f.write(string)
+        with open(self.file, encoding=encoding) as f:
+            expected = CONVERT(f.read())
+        self.assertEqual(CONVERT_FILE(self.file, encoding=encoding), expected)
+        self.assertEqual(
+            CONVERT_FILE(self.file, memory_map=True, encoding=encoding),
+            expected)
+
+    def test_same_as_read(self):
+        for string in self.STRINGS:
+            for encoding in ("utf-8", "utf-16"):
+                with self.subTest(string=string, encoding=encoding):
+                    self.assert_same_as_read(string, encoding)
+
+    def test_pieces(self):
+        # Split documents before every line possible.
+        with unittest.mock.patch.object(
+                SPLIT_INTO_PIECES, "__defaults__", (0,)):
+            for string in self.STRINGS:
+                with self.subTest(string=string):
+                    self.assert_same_as_read(string * 20)
+            self.assert_same_as_read("".join(
+                f"Paragraph {i}.\nSee [{i}].\n\n[{i}]: /{i}\n  \"{i}\"\n\n"
+                f"Heading {i}\n---\n" for i in range(50)))
+            self.assert_same_as_read("".join(
+                f"- Item [{i}].\n  - [Link {i}](/{i})\n[{i}]\n\n[{i}]: /{i}\n"
+                f"- --\n  ==\n" for i in range(50)))
+
+    def test_split_into_pieces(self):
+        lines = "".join(
+            f"Line {i}.\nMore {i}.\n[{i}]: /{i}\n\n"
+            for i in range(100)).splitlines(True)
+        pieces = list(SPLIT_INTO_PIECES(lines, 100))
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(pieces), "".join(lines))
+        for piece in pieces[1:]:
+            self.assertTrue(piece.startswith("More "))
+
+        # Lists and lines of links are split too.
+        for line in ("- Item {}.\n", "[Link {}](/{})\n", "[{}] [{}]\n"):
+            lines = [line.format(i, i) for i in range(1000)]
+            pieces = list(SPLIT_INTO_PIECES(lines, 100))
+            self.assertGreater(len(pieces), 10)
+            self.assertEqual("".join(pieces), "".join(lines))
+        self.assertEqual(len(list(SPLIT_INTO_PIECES(
+            [f"[{i}]: /{i}\n" for i in range(1000)], 100))), 1)
+
+
+class NestingStackTest(unittest.TestCase):
+    def test_stack(self):
+        blockquote, ordered_list, _ = NESTED_TAGS
+        stack = NESTING_STACK([(blockquote, 3), (ordered_list, 1)])
+        stack.push(blockquote, 5)
+        self.assertEqual((stack.last_tag, stack.last_level, stack.minimum_level),
+                         (blockquote, 5, 1))
+        self.assertEqual(stack.close_above(1), "</blockquote>")
+        self.assertEqual(list(stack), [(blockquote, 3), (ordered_list, 1)])
+        self.assertEqual(stack.close_all(), "</ol></blockquote>")
+        self.assertFalse(stack)
+        self.assertEqual((stack.last_tag, stack.last_level, stack.minimum_level),
+                         (None, 0, None))
+
+    def test_deep_nesting(self):
+        levels = list(range(1, 501)) + list(range(499, 0, -1))
+        self.assertEqual(
+            CONVERT("\n".join(">" * level + " a" for level in levels)),
+            "<blockquote><p>a</p>" * 500 + "</blockquote><p>a</p>" * 499
+            + "</blockquote>")
+        self.assertEqual(
+            CONVERT("\n".join(" " * (level - 1) + "- a" for level in levels)),
+            "<ul><li>a</li>" * 500 + "</ul><li>a</li>" * 499 + "</ul>")
+
+    def test_same_line_nesting(self):
+        self.assertEqual(CONVERT("> - 1. a"),
+                         "<blockquote><ul><li><ol><li>a</li></ol></li></ul></blockquote>")
+        self.assertEqual(CONVERT("- > > a"),
+                         "<ul><li><blockquote><blockquote><p>a</p></blockquote></blockquote></li></ul>")
+        self.assertEqual(CONVERT("> >"), "<blockquote><p> ></p></blockquote>")
+        self.assertEqual(CONVERT("- >"), "<ul><li>></li></ul>")
+
+        # Nesting deeper than the recursion limit.
+        self.assertEqual(CONVERT("- " * 5000 + "a"),
+                         "<ul><li>" * 5000 + "a" + "</li></ul>" * 5000)
+
+    def test_malformed_indentation(self):
+        # Tags are always closed in the reverse order they were opened, even
+        # when indentation goes back to a level no tag was opened at.
+        self.assertEqual(CONVERT("  - a\n>>>> b\n>>>>> c\n1. d\n      1. e\n  - f"),
+                         "<ul><li>a</li><blockquote><p>b</p><blockquote><p>c</p></blockquote><ol><li>d</li><ol><li>e</li></ol></ol><ul><li>f</li></ul></blockquote></ul>")
+
+
 class OrderedListTest(unittest.TestCase):
     def test_empty_ordered_list(self):
         self.assertEqual(CONVERT("1."), "<p>1.</p>")
@@ -1573,6 +2504,490 @@ paragraph.
                          "<p>This is a multiline paragraph.<br>It has a line break.</p>")
 
 
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = []
+        for name, content in (("a.md", "# This is a heading.\n\nThis is a paragraph."),
+                              ("b.md", "This is a [link](URL \"Title\").\n\n"
+                                      "This is a [link](URL).")):
+            self.files.append(os.path.join(self.directory.name, name))
+            with open(self.files[-1], "w") as f:
+                f.write(content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_profile_files(self):
+        report = profiling.profile_files(self.files, top=2)
+        patterns = {pattern.name: pattern for pattern in report["patterns"]}
+        self.assertGreater(patterns["REGEX_HEADING"].matches, 0)
+        self.assertGreater(patterns["REGEX_LINK"].matches, 0)
+        self.assertGreater(patterns["REGEX_LINK__WITHOUT_TITLE"].matches, 0)
+        self.assertEqual(patterns["REGEX_QUICK_EMAIL"].matches, 0)
+        tries = (patterns["REGEX_LINK"].tries
+                 + patterns["REGEX_LINK__WITHOUT_TITLE"].tries)
+        self.assertGreaterEqual(tries, 2)
+
+        # Lines starting with none of "*", "-" or "_" are never tried.
+        self.assertEqual(patterns["REGEX_HORIZONTAL_RULE"].tries, 0)
+        self.assertIn("check_paragraph <h[1-6]>.+<\\/h[1-6]>", patterns)
+        self.assertEqual(sorted(file for _, file, _ in report["documents"]),
+                         self.files)
+        self.assertEqual(len(report["lines"]), 2)
+        self.assertIn("REGEX_HEADING", profiling.format_report(report))
+
+    def test_patterns_restored(self):
+        with profiling.profile_patterns():
+            self.assertIsInstance(profiling.quickhtml.REGEX_BOLD,
+                                  profiling.ProfiledPattern)
+        self.assertNotIsInstance(profiling.quickhtml.REGEX_BOLD,
+                                 profiling.ProfiledPattern)
+        for tag in profiling.quickhtml.NESTED_TAGS:
+            self.assertNotIsInstance(tag.regex, profiling.ProfiledPattern)
+
+
+class ReferenceRegistryTest(unittest.TestCase):
+    def test_first_definition_kept(self):
+        references = REFERENCE_REGISTRY()
+        references.add("1", "First URL.", "First title.")
+        references.add("1", "Second URL.")
+        self.assertEqual(references.get("1").url, "First URL.")
+        self.assertEqual(references.get("1").title, "First title.")
+        self.assertIsNone(references.get("2"))
+        self.assertEqual(len(references), 1)
+        self.assertEqual(CONVERT("[Link][1]\n[1]: First URL.\n[1]: Second URL."),
+                         "<a href=\"First URL.\">Link</a>")
+
+    def test_shared(self):
+        site = REFERENCE_REGISTRY([{"label": "home", "url": "/"}])
+        self.assertEqual(CONVERT("[Home][home] [Link][1]\n\n[1]: URL", references=site),
+                         "<p><a href=\"/\">Home</a> <a href=\"URL\">Link</a></p>")
+        self.assertEqual(CONVERT("[Home][home]\n\n[home]: Other URL", references=site),
+                         "<a href=\"/\">Home</a>")
+        self.assertEqual(CONVERT("[Link][1]", references=site), "<p>[Link][1]</p>")
+        self.assertEqual([reference.label for reference in site], ["home"])
+
+        converter = STREAMING_CONVERTER(site)
+        self.assertEqual(converter.feed("[2]: URL\n[Link][2] [Home][home]\n") + converter.close(),
+                         "<p><a href=\"URL\">Link</a> <a href=\"/\">Home</a></p>")
+        self.assertNotIn("2", site)
+
+    def test_digest(self):
+        first = REFERENCE_REGISTRY([{"label": "1", "url": "URL"}])
+        second = REFERENCE_REGISTRY([{"label": "1", "url": "URL"}])
+        self.assertEqual(first.digest(), second.digest())
+        self.assertEqual(first, second)
+        second.add("2", "URL")
+        self.assertNotEqual(first.digest(), second.digest())
+        self.assertNotEqual(first, second)
+
+        child = REFERENCE_REGISTRY(parent=first)
+        digest = child.digest()
+        first.add("3", "URL")
+        self.assertNotEqual(child.digest(), digest)
+
+    def test_undefined_labels(self):
+        self.assertEqual(CONVERT("[Undefined][2] [Link][1]\n\n[1]: URL"),
+                         "<p>[Undefined][2] <a href=\"URL\">Link</a></p>")
+        self.assertEqual(CONVERT("[\\1][1]\n\n[1]: URL"),
+                         "<a href=\"URL\">1</a>")
+
+
+class ServeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.write("index.md", "# This is a heading.")
+        self.write("guide/page.md", "This is a paragraph.")
+        self.server = serve.make_server(self.directory.name, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.01})
+        self.thread.start()
+        self.log = unittest.mock.patch.object(serve.RenderHandler, "log_message")
+        self.log.start()
+
+    def tearDown(self):
+        self.log.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.directory.cleanup()
+
+    def write(self, path, content):
+        path = os.path.join(self.directory.name, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def request(self, path, headers=None):
+        connection = http.client.HTTPConnection(*self.server.server_address[:2])
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_paths(self):
+        self.assertEqual(serve.get_markdown_path("docs", "/"),
+                         os.path.realpath("docs/index.md"))
+        self.assertEqual(serve.get_markdown_path("docs", "/guide/page.html"),
+                         os.path.realpath("docs/guide/page.md"))
+        self.assertEqual(serve.get_markdown_path("docs", "/guide%2Fpage"),
+                         os.path.realpath("docs/guide/page.md"))
+        self.assertIsNone(serve.get_markdown_path("docs", "/../secret.md"))
+
+    def test_get(self):
+        response, body = self.request("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<h1>This is a heading.</h1>")
+        self.assertEqual(response.getheader("Content-Type"),
+                         "text/html; charset=utf-8")
+        self.assertEqual(self.request("/guide/page.html")[1],
+                         b"<p>This is a paragraph.</p>")
+        self.assertEqual(self.request("/missing.html")[0].status, 404)
+        self.assertEqual(self.request("/../unit_tests.py")[0].status, 404)
+
+    def test_not_modified(self):
+        etag = self.request("/")[0].getheader("ETag")
+        self.assertTrue(etag.startswith('"'))
+        response, body = self.request("/", {"If-None-Match": f'"other", {etag}'})
+        self.assertEqual((response.status, body), (304, b""))
+        self.assertEqual(response.getheader("ETag"), etag)
+
+        # Writing the same content again keeps the tag, while changing it does
+        # not.
+        self.write("index.md", "# This is a heading.")
+        self.assertEqual(self.request("/", {"If-None-Match": etag})[0].status,
+                         304)
+        self.write("index.md", "# This is an edited heading.")
+        response, body = self.request("/", {"If-None-Match": etag})
+        self.assertEqual((response.status, body),
+                         (200, b"<h1>This is an edited heading.</h1>"))
+        self.assertNotEqual(response.getheader("ETag"), etag)
+
+    def test_chunked(self):
+        document = "This is a paragraph.\n\n" * (serve.CHUNK_SIZE // 10)
+        self.write("large.md", document)
+        response, body = self.request("/large.html")
+        self.assertEqual(response.getheader("Transfer-Encoding"), "chunked")
+        self.assertEqual(body.decode(), CONVERT(document))
+
+        # Pages already converted are sent as a whole.
+        response, body = self.request("/large.html")
+        self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+        self.assertEqual(body.decode(), CONVERT(document))
+
+
+class SinkTest(unittest.TestCase):
+    DOCUMENT = "# This is a heading.\nThis is a paragraph.  \n> This is a blockquote."
+
+    def test_list(self):
+        output = []
+        CONVERT_INTO(self.DOCUMENT, output)
+        self.assertGreater(len(output), 1)
+        self.assertEqual("".join(output), CONVERT(self.DOCUMENT))
+
+    def test_write(self):
+        output = io.StringIO()
+        CONVERT_INTO(self.DOCUMENT, output)
+        self.assertEqual(output.getvalue(), CONVERT(self.DOCUMENT))
+
+    def test_callable(self):
+        output = []
+        CONVERT_INTO(self.DOCUMENT, lambda string: output.append(string))
+        self.assertEqual("".join(output), CONVERT(self.DOCUMENT))
+
+    def test_streaming_converter(self):
+        output = []
+        converter = STREAMING_CONVERTER(sink=output)
+        self.assertEqual(converter.feed(self.DOCUMENT), "")
+        self.assertEqual(converter.close(), "")
+        self.assertEqual("".join(output), CONVERT(self.DOCUMENT))
+
+    def test_empty(self):
+        output = []
+        CONVERT_INTO("   ", output)
+        self.assertEqual(output, [])
+
+
+class SQLiteCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite3")
+        self.cache = sqlite_cache.SQLiteCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_hit(self):
+        self.assertEqual(CONVERT("# This is a heading.", cache=self.cache),
+                         "<h1>This is a heading.</h1>")
+        self.assertEqual(CONVERT("# This is a heading.", cache=self.cache),
+                         "<h1>This is a heading.</h1>")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["results"]),
+                         (1, 1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(
+            connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        connection.close()
+
+    def test_shared(self):
+        CONVERT("This is a paragraph.", cache=self.cache)
+
+        # Another process opening the database reuses results, unless
+        # options, or the version of QuickHTML, are different.
+        other = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(CONVERT("This is a paragraph.", cache=other),
+                         "<p>This is a paragraph.</p>")
+        self.assertEqual(other.stats()["hits"], 1)
+        other.close()
+
+        other = sqlite_cache.SQLiteCache(self.path, options={"theme": "dark"})
+        CONVERT("This is a paragraph.", cache=other)
+        self.assertEqual(other.stats()["hits"], 0)
+        self.assertEqual(other.stats()["results"], 2)
+        other.close()
+
+        key = self.cache.get_key("This is a paragraph.")
+        with unittest.mock.patch.object(sqlite_cache, "__version__", "0.0.0"):
+            other = sqlite_cache.SQLiteCache(self.path)
+        self.assertNotEqual(other.get_key("This is a paragraph."), key)
+        other.close()
+
+    def test_locked(self):
+        CONVERT("This is a paragraph.", cache=self.cache)
+        cache = sqlite_cache.SQLiteCache(self.path, timeout=0)
+        cache.touch_interval = 0
+
+        # Results are still read while another connection holds the write
+        # lock, even though they can not be marked as used.
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.assertEqual(CONVERT("This is a paragraph.", cache=cache),
+                             "<p>This is a paragraph.</p>")
+            self.assertEqual(cache.stats()["hits"], 1)
+        finally:
+            connection.execute("ROLLBACK")
+            connection.close()
+            cache.close()
+
+    def test_references(self):
+        references = REFERENCE_REGISTRY([{"label": "1", "url": "First URL."}])
+        self.assertEqual(CONVERT("[Link][1]", cache=self.cache,
+                                 references=references),
+                         "<a href=\"First URL.\">Link</a>")
+        references.add("2", "Second URL.")
+        self.assertEqual(CONVERT("[Link][1]", cache=self.cache,
+                                 references=references),
+                         "<a href=\"First URL.\">Link</a>")
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_eviction(self):
+        CONVERT("One.", cache=self.cache)
+        self.cache.max_size = self.cache.stats()["size"] * 2
+        self.cache.touch_interval = 0
+        CONVERT("Two.", cache=self.cache)
+        CONVERT("One.", cache=self.cache)
+        CONVERT("Six.", cache=self.cache)
+        stats = self.cache.stats()
+        self.assertEqual((stats["evictions"], stats["results"]), (1, 2))
+        self.assertLessEqual(stats["size"], self.cache.max_size)
+
+        # "Two." was the least recently used result, so it was evicted.
+        CONVERT("One.", cache=self.cache)
+        CONVERT("Two.", cache=self.cache)
+        self.assertEqual(self.cache.stats()["hits"], 2)
+
+        self.cache.clear()
+        self.assertEqual(self.cache.stats(), {
+            "hits": 0, "misses": 0, "evictions": 0, "hit_rate": 0.0,
+            "results": 0, "size": 0})
+
+
+class StartupTest(unittest.TestCase):
+    # Maximum time importing QuickHTML may take, in milliseconds. It took over
+    # 100 ms when every regular expression was compiled, and every module
+    # imported, on import.
+    IMPORT_BUDGET_MS = 60
+
+    # Modules that take longer to import than QuickHTML itself, and that
+    # converting a string from the terminal does not need.
+    SLOW_MODULES = ("argparse", "asyncio", "concurrent.futures", "http.server",
+                    "multiprocessing", "sqlite3")
+
+    def run_python(self, *args):
+        output = subprocess.run(
+            (sys.executable, "-X", "importtime") + args, check=True,
+            cwd=MODULE_FILE.parents[1], stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True)
+        imported = {}
+        for line in output.stderr.splitlines():
+            if line.startswith("import time:"):
+                _, cumulative, name = line[len("import time:"):].split("|")
+                if cumulative.strip().isdigit():
+                    imported[name.strip()] = int(cumulative) / 1000
+        return output.stdout, imported
+
+    def test_import_budget(self):
+        import_times = [self.run_python("-c", "import quickhtml")[1][
+            "quickhtml"] for _ in range(3)]
+        self.assertLess(min(import_times), self.IMPORT_BUDGET_MS)
+
+    def test_imports(self):
+        stdout, imported = self.run_python(
+            "-m", "quickhtml", "# This is a heading.")
+        self.assertEqual(stdout, "<h1>This is a heading.</h1>\n")
+        for module in self.SLOW_MODULES:
+            self.assertNotIn(module, imported)
+
+        stdout, imported = self.run_python("-c", (
+            "import quickhtml, quickhtml.quickhtml as q; "
+            "print(sum(v._compiled is not None for v in vars(q).values() "
+            "if isinstance(v, q.LazyPattern)))"))
+        self.assertEqual(stdout, "0\n")
+
+    def test_lazy_imports(self):
+        stdout, imported = self.run_python("-c", (
+            "import quickhtml; "
+            "print(quickhtml.SQLiteCache.__module__, "
+            "'Document' in dir(quickhtml))"))
+        self.assertEqual(stdout, "quickhtml.sqlite_cache True\n")
+        self.assertIn("sqlite3", imported)
+        self.assertNotIn("asyncio", imported)
+
+
+class StreamingConverterTest(unittest.TestCase):
+    DOCUMENT = """
+This is a level 1 heading.
+==========================
+
+This is a paragraph with **bold** text and a [link](URL "Title.").  
+It has a line break.
+
+> This is a level 1 blockquote.
+>> This is a level 2 blockquote.
+
+1. This is a level 1 ordered list item.
+  - This is a level 2 unordered list item.
+
+    This is a code block.
+    It has two lines.
+
+[This is a reference-style link.][1]
+
+[1]: Link URL. "This is a title."
+"""
+
+    def feed(self, string, chunk_size, references=None):
+        converter = STREAMING_CONVERTER(references)
+        output = [converter.feed(string[i:i + chunk_size])
+                  for i in range(0, len(string), chunk_size)]
+        return "".join(output) + converter.close()
+
+    def test_same_as_convert(self):
+        document = self.DOCUMENT.replace(
+            "[1]: Link URL. \"This is a title.\"\n", "")
+        for chunk_size in (1, 2, 7, 64, len(document)):
+            self.assertEqual(self.feed(document, chunk_size), CONVERT(document))
+
+    def test_alternative_headings(self):
+        # Every "=" underline is handled before any "-" underline.
+        for document in ("Title\n=====\n---\n\nText.",
+                         "Title\n---\n==\nText.", "A\n\nB\n--\n  \n==\n",
+                         "  \n==\n--\n-- \n=="):
+            for chunk_size in (1, 3, len(document)):
+                self.assertEqual(self.feed(document, chunk_size),
+                                 CONVERT(document))
+
+    def test_carriage_return(self):
+        document = self.DOCUMENT.replace("\n", "\r\n")
+        self.assertEqual(self.feed(document, 1),
+                         self.feed(self.DOCUMENT, 1))
+
+    def test_output_before_close(self):
+        converter = STREAMING_CONVERTER()
+        self.assertEqual(converter.feed("# This is a "), "")
+        self.assertEqual(converter.feed("heading.\nThis "), "")
+        self.assertEqual(converter.feed("is a paragraph.\n"),
+                         "<h1>This is a heading.</h1>")
+        self.assertEqual(converter.feed("\n"), "")
+        self.assertEqual(converter.feed("This is another paragraph.\n"),
+                         "<p>This is a paragraph.</p>")
+        self.assertEqual(converter.close(),
+                         "<p>This is another paragraph.</p>")
+
+    def test_references(self):
+        self.assertEqual(self.feed("[1]: URL\n[Link][1]", 3),
+                         "<a href=\"URL\">Link</a>")
+        self.assertEqual(self.feed("[Link][1]\n\nText.\n[1]: URL", 3),
+                         "<p>[Link][1]</p><p>Text.</p>")
+        self.assertEqual(self.feed(self.DOCUMENT, 5, [
+            {"label": "1", "url": "Link URL.", "title": "This is a title."}
+        ]), CONVERT(self.DOCUMENT))
+
+    def test_empty(self):
+        self.assertEqual(self.feed("", 1), "")
+        self.assertEqual(self.feed("   \n\n  ", 1), "")
+
+
+class TracingTest(unittest.TestCase):
+    class Recorder:
+        def __init__(self):
+            self.events = []
+
+        def start(self, stage):
+            self.events.append(("start", stage))
+
+        def end(self, stage):
+            self.events.append(("end", stage))
+
+    def test_stages(self):
+        recorder = self.Recorder()
+        self.assertEqual(CONVERT("# This is a heading.", cache=False,
+                                 tracer=recorder),
+                         "<h1>This is a heading.</h1>")
+        stages = [stage for event, stage in recorder.events if event == "start"]
+        self.assertEqual(stages[:8], [
+            "references", "alternative_headings", "horizontal_rules",
+            "code_blocks", "headings", "code_spans", "inline_emphasis",
+            "inline_images"])
+        self.assertEqual(stages[8:14], [
+            "inline_links", "inline_reference_links", "inline_quick_links",
+            "nested_tags", "paragraphs", "escapes"])
+
+        # Every stage started is ended before the next one starts.
+        for index in range(0, len(recorder.events), 2):
+            self.assertEqual(recorder.events[index][0], "start")
+            self.assertEqual(recorder.events[index + 1],
+                             ("end", recorder.events[index][1]))
+
+    def test_tracing(self):
+        timer = STAGE_TIMER()
+        with TRACING(timer) as tracer:
+            self.assertIs(tracer, timer)
+            CONVERT("This is a paragraph.\nIt has two lines.", cache=False)
+        self.assertEqual(timer.totals["references"][0], 1)
+        self.assertEqual(timer.totals["horizontal_rules"][0], 3)
+        self.assertGreaterEqual(timer.totals["escapes"][1], 0)
+
+        # Tracer is no longer installed after the block.
+        CONVERT("This is a paragraph.", cache=False)
+        self.assertEqual(timer.totals["references"][0], 1)
+
+    def test_streaming_converter(self):
+        timer = STAGE_TIMER()
+        with TRACING(timer):
+            converter = STREAMING_CONVERTER()
+        converter.feed("This is a paragraph.\n")
+        converter.close()
+        self.assertEqual(timer.totals["references"][0], 1)
+        self.assertEqual(timer.totals["headings"][0], 2)
+
+
 class UnorderedListTest(unittest.TestCase):
     def test_empty_unordered_list(self):
         self.assertEqual(CONVERT("-"), "<p>-</p>")
@@ -1734,5 +3149,114 @@ class UnorderedListTest(unittest.TestCase):
                          "<p>This - should - not - be - affected.</p>")
 
 
+class WatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, "source")
+        self.output = os.path.join(self.directory.name, "output")
+        self.write("index.md", "# This is a heading.")
+        self.write("guide/page.md", "This is a paragraph.")
+        self.write("guide/notes.txt", "This is not Markdown.")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, path, content):
+        path = os.path.join(self.source, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def read(self, path):
+        with open(os.path.join(self.output, path)) as f:
+            return f.read()
+
+    def test_scan_files(self):
+        self.assertEqual(sorted(watch.scan_files(self.source)),
+                         [os.path.join(self.source, "guide", "page.md"),
+                          os.path.join(self.source, "index.md")])
+
+    def test_symbolic_links(self):
+        try:
+            os.symlink(os.pardir, os.path.join(self.source, "guide", "loop"))
+            os.symlink(os.path.join(self.source, "guide"),
+                       os.path.join(self.source, "linked.md"))
+            os.symlink(os.path.join(self.source, "index.md"),
+                       os.path.join(self.source, "guide", "index.md"))
+        except (OSError, NotImplementedError):
+            self.skipTest("Symbolic links can not be created.")
+
+        # Files are found as build() finds them, without following links to
+        # directories.
+        self.assertEqual(sorted(watch.scan_files(self.source)),
+                         build.find_files(self.source))
+        self.assertEqual(sorted(watch.scan_files(self.source)),
+                         [os.path.join(self.source, "guide", "index.md"),
+                          os.path.join(self.source, "guide", "page.md"),
+                          os.path.join(self.source, "index.md")])
+
+    def test_watch(self):
+        watcher = watch.watch(self.source, self.output, 0.01, 0.05, workers=1)
+
+        def change():
+            self.write("guide/page.md", "This is an edited paragraph.")
+            self.write("guide/new.md", "This is a new paragraph.")
+            os.remove(os.path.join(self.source, "index.md"))
+
+        # Change files only after the first build started.
+        timer = threading.Timer(0.2, change)
+        timer.start()
+        written, removed = next(watcher)
+        timer.join()
+        watcher.close()
+
+        self.assertEqual(sorted(written),
+                         [os.path.join(self.output, "guide", "new.html"),
+                          os.path.join(self.output, "guide", "page.html")])
+        self.assertEqual(removed, [os.path.join(self.output, "index.html")])
+        self.assertEqual(self.read("guide/page.html"),
+                         "<p>This is an edited paragraph.</p>")
+        self.assertEqual(self.read("guide/new.html"),
+                         "<p>This is a new paragraph.</p>")
+        self.assertFalse(os.path.exists(os.path.join(self.output, "index.html")))
+
+    def test_undecodable_file(self):
+        try:
+            b"\xff".decode(locale.getpreferredencoding(False))
+            self.skipTest("Preferred encoding decodes every byte.")
+        except UnicodeDecodeError:
+            pass
+        with open(os.path.join(self.source, "bad.md"), "wb") as f:
+            f.write(b"\xff This is not decodable.")
+        errors = []
+        watcher = watch.watch(self.source, self.output, 0.01, 0.05, workers=1,
+                              on_error=lambda *args: errors.append(args))
+
+        def change():
+            self.write("guide/page.md", "This is an edited paragraph.")
+            with open(os.path.join(self.source, "bad.md"), "ab") as f:
+                f.write(b"\xff")
+
+        timer = threading.Timer(0.2, change)
+        timer.start()
+        written, _ = next(watcher)
+        timer.join()
+
+        # The file is reported on the first build, and again once changed,
+        # and other files are still converted.
+        self.assertEqual(self.read("index.html"), "<h1>This is a heading.</h1>")
+        self.assertEqual(written, [os.path.join(self.output, "guide", "page.html")])
+        self.assertEqual([file for file, _ in errors],
+                         [os.path.join(self.source, "bad.md")] * 2)
+        self.assertIsInstance(errors[0][1], UnicodeDecodeError)
+
+        self.write("bad.md", "This is decodable.")
+        written, _ = next(watcher)
+        watcher.close()
+        self.assertEqual(written, [os.path.join(self.output, "bad.html")])
+        self.assertEqual(len(errors), 2)
+
+
+
 if __name__ == '__main__':
     unittest.main()